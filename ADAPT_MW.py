@@ -5,7 +5,13 @@ import pyqtgraph as pg
 from pyqtgraph.dockarea import DockArea, Dock
 import json
 import os
-from helper_classes import FifoWatcher
+import threading
+from helper_classes import FifoWatcher, ShmFrameWatcher, FrameWorker, FrameClock, IngestStatsWidget
+from channel_map import ChannelMap, SchemaTranslator
+from fifo_protocol import Frame
+from label_raster import LabelRaster
+from colormaps import ColorLUT, ColorScale, SCALE_MODES
+from detector_data import DetectorDataModel
 
 # Load sensor geometry config.
 with open("sensor_config.json", "r") as f:
@@ -36,6 +42,7 @@ if GAP == 1:
     OVERALL_WIDTH = int(OVERALL_SCALE * PIXEL_SIZE*num_wls_pixels + GAP*(num_wls_pixels-1))
     PIXEL_SIZE = int(OVERALL_WIDTH/(num_wls_pixels*frac+num_wls_pixels-frac))
     PIXEL_SIZE = round(OVERALL_WIDTH/((frac+1)*(num_wls_pixels-1)))
+RENDER_MODES = ('items', 'raster')
 
 
 def get_overall_width():
@@ -60,266 +67,374 @@ def calculate_total_data_points():
     print('Total number of pixels:', num_icc_layers * num_pixels_per_layer)
     return num_icc_layers * num_pixels_per_layer
 
-def generate_creation_order(num_pixels_per_row, offset=0, top_first=False):
-    """
-    Returns pixel indices in top-row-first-then-bottom order,
-    assuming 'pixel number' order is bottom0, top0, bottom1, top1, etc.
-    """
-    row1 = list(range(offset, offset + num_pixels_per_row))
-    row2 = list(range(offset + num_pixels_per_row, offset + 2 * num_pixels_per_row))
-    if top_first:
-        return [val for pair in zip(row1, row2) for val in pair]
-    else:
-        return [val for pair in zip(row2, row1) for val in pair]
-    
-def generate_odd_even_list(length, offset=0, even_first=False):
-    """
-    Generates a list of numbers with odd values first and then even values,
-    or the reverse if even_first is True.
-
-    Args:
-        length (int): The total number of values to generate.
-        offset (int): The starting value for the sequence.
-        even_first (bool): If True, places even values first, then odd values.
-
-    Returns:
-        list: A reordered list of numbers.
-    """
-    # Generate the sequence of numbers
-    numbers = list(range(offset, offset + length))
-    
-    # Separate odd and even values
-    odd_values = [n for n in numbers if n % 2 != 0]
-    even_values = [n for n in numbers if n % 2 == 0]
-    
-    # Determine the order
-    if even_first:
-        return even_values + odd_values
-    else:
-        return odd_values + even_values
+def channel_map():
+    """The ChannelMap for the loaded sensor_config (built once, then cached)."""
+    return ChannelMap.for_config(sensor_config)
 
 def generateDataMap():
-    num_icc_layers = sensor_config["icc"]["num_layers"]
-    num_hodo_pixels_per_layer = sensor_config["hodo_front"]["num_cols"] * sensor_config["hodo_front"]["num_rows"]
-    num_wls_pixels_per_layer = sensor_config["wls_front"]["num_cols"]
-    num_csi_pixels = 2
-    num_tail_pixels = sensor_config["tail_counters"]["num_cols"] * sensor_config["tail_counters"]["num_rows"]
-    num_hodo_pixels = num_hodo_pixels_per_layer * 2
-    num_wls_pixels = num_wls_pixels_per_layer * 2
-    num_pixels_per_layer = num_hodo_pixels + num_wls_pixels + num_csi_pixels + num_tail_pixels
-    data_map = {}
-    for layer in range(num_icc_layers):
-
-        data_map[layer] = {}
-
-        base = layer * num_pixels_per_layer
-        hodo_offset1 = base
-        hodo_offset2 = hodo_offset1 + num_hodo_pixels_per_layer
-        wls_offset1 = hodo_offset2 + num_hodo_pixels_per_layer
-        csi_offset = wls_offset1 + num_wls_pixels_per_layer
-        wls_offset2 = csi_offset + num_csi_pixels
-        tail_offset = wls_offset2 + num_wls_pixels_per_layer
-        ending_offset = tail_offset + num_tail_pixels
-
-        for rotated in range(2): #0 = not rotated, 1 = rotated
-            data_map[layer][rotated] = {}
-            if rotated == 0:
-                #data_map[layer][rotated]['hodo_front'] = generate_creation_order(sensor_config["hodo_front"]["num_cols"], offset=hodo_offset1, top_first=True)
-                data_map[layer][rotated]['hodo_front'] = generate_odd_even_list(num_hodo_pixels_per_layer, offset=hodo_offset1)
-                #data_map[layer][rotated]['hodo_front'] = list(range(hodo_offset1, hodo_offset2))
-                data_map[layer][rotated]['hodo_side'] = generate_odd_even_list(num_hodo_pixels_per_layer, offset=hodo_offset2)[-2:] # TODO: check if flipped and correct
-                data_map[layer][rotated]['wls_side'] = list(range(wls_offset1, csi_offset))[-1]
-                data_map[layer][rotated]['csi'] = [list(range(csi_offset, wls_offset2))[0]] # list of two and select first for non-rotated orientation
-                data_map[layer][rotated]['wls_front'] = [list(range(wls_offset2, tail_offset))]
-                data_map[layer][rotated]['tail'] = list(range(tail_offset, ending_offset))
-            else:
-                #data_map[layer][rotated]['hodo_side'] = generate_creation_order(sensor_config["hodo_front"]["num_cols"], offset=hodo_offset1, top_first=True)[:2] # TODO: check if flipped and correct
-                #data_map[layer][rotated]['hodo_front'] = generate_creation_order(sensor_config["hodo_front"]["num_cols"], offset=hodo_offset2, top_first=False)
-                data_map[layer][rotated]['hodo_side'] = generate_odd_even_list(num_hodo_pixels_per_layer, offset=hodo_offset1)[-2:]
-                data_map[layer][rotated]['hodo_front'] = generate_odd_even_list(num_hodo_pixels_per_layer, offset=hodo_offset2)
-                data_map[layer][rotated]['wls_front'] = list(range(wls_offset1, csi_offset))
-                data_map[layer][rotated]['csi'] = [list(range(csi_offset, wls_offset2))[1]] # list of two and select second for rotated orientation
-                data_map[layer][rotated]['wls_side'] = [list(range(wls_offset2, tail_offset))[0]]
-                data_map[layer][rotated]['tail'] = list(range(tail_offset, ending_offset))
-
-    return data_map
-
-def create_reverse_data_map(data_map):
+    """Nested-dict form of the channel map: {layer: {rotated: {component: [pixel, ...]}}}."""
+    return channel_map().data_map()
+
+def create_reverse_data_map(data_map=None):
     """
     Creates a reverse mapping from absolute pixel index to (layer, rotated, component, relative_index).
+    Where a pixel appears in both orientations the rotated entry wins, as before.
     """
+    cmap = channel_map()
     reverse_map = {}
-    for layer, rotated_data in data_map.items():
-        for rotated, component_data in rotated_data.items():
-            for component, pixel_indices in component_data.items():
-                # Handle cases where pixel_indices is a list of lists (like wls_front in non-rotated)
-                flat_indices = []
-                if any(isinstance(i, list) for i in pixel_indices):
-                    for sublist in pixel_indices:
-                        flat_indices.extend(sublist)
-                else:
-                    flat_indices = pixel_indices
-
-                if isinstance(flat_indices, list):
-                    for i, abs_idx in enumerate(flat_indices):
-                        reverse_map[abs_idx] = (layer, rotated, component, i)
-                else: # for single values
-                    reverse_map[flat_indices] = (layer, rotated, component, 0)
+    for rotated in (0, 1):
+        for pixel in np.flatnonzero(cmap.component_of[rotated] >= 0):
+            reverse_map[int(pixel)] = cmap.lookup(pixel, rotated)
     return reverse_map
 
-def translate_colleague_schema(colleague_data, total_pixels, data_map):
+def translate_colleague_schema(colleague_data, total_pixels=None, data_map=None, out=None):
     """
-    Translates data from the colleague's schema to the application's flat intensity list.
+    Translates data from the colleague's schema to the application's flat intensity array.
 
-    This function assumes the colleague's 'axis' field ('x' or 'y') corresponds
-    to the non-rotated and rotated views, respectively. It also assumes the 'ids'
-    are enumerated across the primary components of that view (hodoscope, then WLS fibers).
+    The 'axis' field ('x' or 'y') selects the non-rotated or rotated view and the
+    'ids' are enumerated across the primary components of that view (hodoscope,
+    then WLS fibers). The work is done by the shared SchemaTranslator, which
+    scatters every layer of the message in one vectorized step; total_pixels and
+    data_map are accepted for compatibility and no longer needed.
 
     Args:
         colleague_data (dict): The data from the colleague, following their proposed schema.
-        total_pixels (int): The total number of pixels in the detector.
-        data_map (dict): The data map generated by generateDataMap.
+        out (np.ndarray, optional): A float32 array of channel_map().total_pixels to fill and
+            reuse between calls; without it a new array is allocated.
 
     Returns:
-        list: A flat list of intensities ready for setDetectorData.
+        np.ndarray: The float32 intensity array (`out` if given) ready for setDetectorData.
     """
-    intensities = [0] * total_pixels
+    if out is None:
+        out = np.empty(channel_map().total_pixels, dtype=np.float32)
+    return schema_translator().translate(colleague_data, out=out)
 
-    for layer_data in colleague_data.get("layers", []):
-        layer_idx = layer_data.get("layer")
-        axis = layer_data.get("axis")
-        ids = layer_data.get("ids", [])
-        values = layer_data.get("values", [])
+def schema_translator():
+    """SchemaTranslator for the loaded sensor_config. Its frame buffer is reused between calls."""
+    global _schema_translator
+    if _schema_translator is None or _schema_translator.channel_map is not channel_map():
+        _schema_translator = SchemaTranslator(channel_map())
+    return _schema_translator
 
-        if layer_idx is None or axis is None or layer_idx not in data_map:
-            continue
+_schema_translator = None
 
-        # Map 'x'/'y' axis to rotated (0/1)
-        rotated = 0 if axis == 'x' else 1
+def mixedDataIndicies():
+    """Hardware channel order -> display order (see ChannelMap.display_order)."""
+    return channel_map().display_order.tolist()
 
-        if rotated not in data_map[layer_idx]:
-            continue
 
-        view_data = data_map[layer_idx][rotated]
-        
-        # The colleague's IDs are relative to the main components in that view.
-        # For 'x' (rotated=0), this is hodo_front and wls_front.
-        # For 'y' (rotated=1), this is also hodo_front and wls_front keys,
-        # which map to the side hodoscope and side WLS fibers.
-        hodo_pixels = view_data.get('hodo_front', [])
-        wls_pixels = view_data.get('wls_front', [])
-
-        # wls_front for rotated=0 is a list within a list
-        if rotated == 0 and wls_pixels and isinstance(wls_pixels[0], list):
-            wls_pixels = wls_pixels[0]
-
-        for rel_id, value in zip(ids, values):
-            if rel_id < len(hodo_pixels):
-                # ID is in the hodoscope range
-                abs_idx = hodo_pixels[rel_id]
-                intensities[abs_idx] = value
-            else:
-                # ID is in the WLS fiber range, adjust index
-                wls_rel_id = rel_id - len(hodo_pixels)
-                if wls_rel_id < len(wls_pixels):
-                    abs_idx = wls_pixels[wls_rel_id]
-                    intensities[abs_idx] = value
+_time_axes = {}
 
-    return intensities
+def time_axis(n_samples):
+    """The shared, read-only time axis for waveforms of n_samples."""
+    t = _time_axes.get(n_samples)
+    if t is None:
+        t = _time_axes[n_samples] = np.linspace(0, 2, n_samples)
+        t.setflags(write=False)
+    return t
 
-def mixedDataIndicies():
 
-    num_icc_layers = sensor_config["icc"]["num_layers"]
-    num_hodo_pixels_per_layer = sensor_config["hodo_front"]["num_cols"] * sensor_config["hodo_front"]["num_rows"]
-    num_wls_pixels_per_layer = sensor_config["wls_front"]["num_cols"]
-    num_csi_pixels = 2
-    num_tail_pixels = sensor_config["tail_counters"]["num_cols"] * sensor_config["tail_counters"]["num_rows"]
-    num_hodo_pixels = num_hodo_pixels_per_layer * 2
-    num_wls_pixels = num_wls_pixels_per_layer * 2
-    num_pixels_per_layer = num_hodo_pixels + num_wls_pixels + num_csi_pixels + num_tail_pixels
-    index_map = []
-    for layer in range(num_icc_layers):
-        
-        base = layer * num_pixels_per_layer
-        hodo_offset1 = base
-        hodo_offset2 = hodo_offset1 + num_hodo_pixels_per_layer
-        wls_offset1 = hodo_offset2 + num_hodo_pixels_per_layer
-        csi_offset = wls_offset1 + num_wls_pixels_per_layer
-        wls_offset2 = csi_offset + num_csi_pixels
-        tail_offset = wls_offset2 + num_wls_pixels_per_layer
-        ending_offset = tail_offset + num_tail_pixels
-                
-        index_map += generate_creation_order(sensor_config["hodo_front"]["num_cols"], offset=hodo_offset1, top_first=True)
-        index_map += generate_creation_order(sensor_config["hodo_front"]["num_cols"], offset=hodo_offset2, top_first=True)
-        index_map += list(range(wls_offset1, csi_offset))
-        index_map += list(range(csi_offset, wls_offset2)) # list of two and select first for non-rotated orientation
-        index_map += list(range(wls_offset2, tail_offset))
-        index_map += list(range(tail_offset, ending_offset))
-
-    #print(len(index_map))
-    return index_map
+class DetectorFrame:
+    """
+    A decoded detector frame, ready to paint: one waveform row per channel in
+    a contiguous (channels, samples) float32 matrix, the shared time axis,
+    the per-channel intensity vector and color bins. `stats` is the
+    ChannelStats of the source it came from, for paint latency. Frames
+    normally come from a FramePool and are refilled in place; release()
+    hands one back once the frame model has copied it.
+    """
+    __slots__ = ('t', 'waveforms', 'intensities', 'bins', 'scratch', 'seq', 'timestamp', 'stats', 'images', 'pool')
+
+    def __init__(self, n_channels, n_samples, pool=None):
+        self.t = time_axis(n_samples)
+        self.waveforms = np.zeros((n_channels, n_samples), dtype=np.float32)
+        self.intensities = np.zeros(n_channels, dtype=np.float32)
+        # Color bins from the frame model's ColorScale, computed on the worker.
+        self.bins = np.zeros(n_channels, dtype=np.intp)
+        self.scratch = np.empty(n_channels, dtype=np.float32)  # per-channel work space for the builder
+        self.pool = pool
+        self.reset()
+
+    def reset(self):
+        self.seq = None
+        self.timestamp = None
+        self.stats = None
+        # (QImage, changed rows) for raster-mode views, keyed by LabelRaster, if the worker made them.
+        self.images = None
+
+    def release(self):
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class FramePool:
+    """
+    Preallocated DetectorFrames for the frame worker. acquire() hands out a
+    free frame with the requested sample count and only allocates when all
+    frames are in flight or the sample count changed; at most `size` frames
+    are kept for reuse. Thread-safe: the worker acquires, the GUI releases.
+    """
+
+    def __init__(self, n_channels, size=4):
+        self.n_channels = n_channels
+        self.size = size
+        self.allocated = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self, n_samples):
+        with self._lock:
+            for i, frame in enumerate(self._free):
+                if frame.waveforms.shape[1] == n_samples:
+                    del self._free[i]
+                    frame.reset()
+                    return frame
+            self.allocated += 1
+        return DetectorFrame(self.n_channels, n_samples, pool=self)
+
+    def release(self, frame):
+        with self._lock:
+            if len(self._free) < self.size and frame not in self._free:
+                self._free.append(frame)
+
+
+def build_detector_frame(data, total_points, rng=None, order=None, pool=None):
+    """
+    Turn a raw FIFO/shared-memory payload into a DetectorFrame. Runs on the
+    FrameWorker thread, so it must not touch any widgets. The frame is taken
+    from `pool` (or allocated) and filled in place.
+
+    A 2D (pixels, samples) array with at least `total_points` rows is used as
+    one waveform per pixel; if the source sends hardware channel order,
+    `order` (ChannelMap.display_order) puts the rows in display order.
+    Anything else (a CSV line or a 1D array) is the test pattern: the same
+    waveform scaled by a random factor per pixel.
+    """
+    if pool is None:
+        pool = FramePool(total_points, size=0)
+    if isinstance(data, np.ndarray) and data.ndim == 2 and data.shape[0] >= total_points:
+        frame = pool.acquire(data.shape[1])
+        # Copy out of the (reusable) receive buffer before it gets overwritten.
+        if order is None:
+            np.copyto(frame.waveforms, data[:total_points])
+        elif data.dtype == frame.waveforms.dtype:
+            np.take(data, order[:total_points], axis=0, out=frame.waveforms)
+        else:
+            frame.waveforms[...] = data[order[:total_points]]
+    else:
+        if isinstance(data, np.ndarray):
+            # Typed or binary channel: the watcher already hands us an ndarray.
+            float_values = np.asarray(data, dtype=np.float32).ravel()
+        else:
+            # Line protocol: a comma-separated list of numbers.
+            float_values = np.array(data.strip().split(','), dtype=np.float32)
+        if rng is None:
+            rng = np.random.default_rng()
+        frame = pool.acquire(len(float_values))
+        # Random factors in [0.5, 2.0) per pixel, drawn straight into the frame's scratch row.
+        factors = rng.random(dtype=np.float32, out=frame.scratch)
+        factors *= 1.5
+        factors += 0.5
+        np.multiply(factors[:, None], float_values[None, :], out=frame.waveforms)
+    frame.seq = getattr(data, 'seq', None)
+    frame.timestamp = getattr(data, 'timestamp', None)
+    frame.waveforms.mean(axis=1, out=frame.intensities)
+    return frame
+
+
+def rgba_to_qimage(rgba):
+    """Wrap an (h, w, 4) uint8 RGBA array as a QImage without copying (the array rides along)."""
+    height, width = rgba.shape[:2]
+    image = QtGui.QImage(rgba.data, width, height, width * 4, QtGui.QImage.Format.Format_RGBA8888)
+    image.ndarray = rgba  # QImage doesn't own the buffer; keep it alive with the image.
+    return image
 
 
 # New class for time series plotting
 class TimeSeriesPlotWidget(pg.PlotWidget):
+    """One channel's waveform, drawn by a single PlotDataItem that lives as long as the widget."""
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setLabel("bottom", "Time (µs)")
         self.setLabel("left", "Voltage")
-    
+        self.curve = self.plot(pen=pg.mkPen('w', width=2))
+        self.idx = None
+        self.color = None
+
     def display_time_series(self, time_series, idx, color=None):  # new color parameter
-        self.clear()
+        # Only the data changes from frame to frame; pen and title are set when they change.
         t, data = time_series
-        pen_color = color if color is not None else 'w'
-        self.plot(t, data, pen=pg.mkPen(pen_color, width=2))
-        self.setTitle(f"Time Series for Selected Pixel {idx + 1}")
-
-class PixelRect(QtWidgets.QGraphicsRectItem):
-    def __init__(self, rect, time_series, intensity, min_intensity, max_intensity, click_callback, idx):
-        super().__init__(rect)
-        self.time_series = time_series
-        self.click_callback = click_callback
-        self.idx = idx
-        # Normalize intensity value for color mapping (blue low, red high)
-        norm = (intensity - min_intensity) / (max_intensity - min_intensity + 1e-6)
-        r = int(255 * norm)
-        b = int(255 * (1 - norm))
-        color = QtGui.QColor(r, 0, b)
-        self.setBrush(QtGui.QBrush(color))
-        # Enable mouse events
-        self.setFlag(QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, True)
-    
-    def mousePressEvent(self, event: QtGui.QMouseEvent) -> None:
-        self.click_callback(self.time_series, self.idx)
-        super().mousePressEvent(event)
-
-class PixelCircle(QtWidgets.QGraphicsEllipseItem):
-    def __init__(self, rect, time_series, intensity, min_intensity, max_intensity, click_callback, idx):
-        super().__init__(rect)
-        self.time_series = time_series
+        if color != self.color:
+            self.color = color
+            self.curve.setPen(pg.mkPen(color if color is not None else 'w', width=2))
+        if idx != self.idx:
+            self.idx = idx
+            self.setTitle(f"Time Series for Selected Pixel {idx + 1}")
+        self.curve.setData(t, data)
+
+class DetectorLayerItem(QtWidgets.QGraphicsItem):
+    """
+    Every channel of one ICCLayerView drawn by a single QGraphicsItem.
+
+    Shapes are added with add_pixel while the layout is built and then frozen
+    by finalize() into arrays: rects (n, 4) as x, y, w, h in item coordinates,
+    ellipse (n,) flags and channels (n,) absolute pixel indices. bins holds
+    one color bin per shape into the item's ColorLUT, whose prebuilt brushes
+    are used for painting. A frame update compares the new bins with the
+    previous ones and invalidates only the shapes whose bin changed;
+    paint() then redraws just the shapes inside the exposed rect.
+    changed_fraction is the share of shapes that changed in the last update.
+    Clicks are resolved with a vectorized hit test over the geometry arrays
+    and reported as click_callback(channel).
+
+    In raster mode (use_raster) the item paints a prebuilt QImage of the
+    whole layout instead of the shapes and picks through the LabelRaster.
+    """
+    OUTLINE = QtGui.QPen(QtGui.QColor('black'), 1)
+    MAX_DIRTY_RECTS = 16  # more changed shapes than this are invalidated as one bounding rect
+    PEN_MARGIN = 2
+
+    def __init__(self, click_callback, lut=None, parent=None):
+        super().__init__(parent)
         self.click_callback = click_callback
-        self.idx = idx
-        norm = (intensity - min_intensity) / (max_intensity - min_intensity + 1e-6)
-        r = int(255 * norm)
-        b = int(255 * (1 - norm))
-        color = QtGui.QColor(r, 0, b)
-        self.setBrush(QtGui.QBrush(color))
-        self.setFlag(QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, True)
-    
-    def mousePressEvent(self, event: QtGui.QMouseEvent) -> None:
-        self.click_callback(self.time_series, self.idx)
-        super().mousePressEvent(event)
+        self.lut = lut if lut is not None else ColorLUT.get()
+        self._pending = []
+        self.rects = np.zeros((0, 4))
+        self.ellipse = np.zeros(0, dtype=bool)
+        self.channels = np.zeros(0, dtype=np.int32)
+        self.bins = np.zeros(0, dtype=np.intp)
+        self.shape_of = {}  # channel -> index of its shape
+        self.highlights = {}  # channel -> QPen
+        self._qrects = []
+        self._bounds = QtCore.QRectF()
+        self.raster = None
+        self.image = None
+        self.changed_fraction = 0.0
+        # Hands paint() the exposed rect, so partial updates only redraw what changed.
+        self.setFlag(QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption, True)
+
+    def add_pixel(self, x, y, width, height, channel, ellipse=False):
+        self._pending.append((x, y, width, height, channel, ellipse))
+
+    def finalize(self):
+        self.prepareGeometryChange()
+        self.rects = np.array([shape[:4] for shape in self._pending], dtype=np.float64).reshape(-1, 4)
+        self.channels = np.array([shape[4] for shape in self._pending], dtype=np.int32)
+        self.ellipse = np.array([shape[5] for shape in self._pending], dtype=bool)
+        self.bins = np.zeros(len(self._pending), dtype=np.intp)
+        self.shape_of = {int(channel): i for i, channel in enumerate(self.channels)}
+        self._qrects = [QtCore.QRectF(*rect) for rect in self.rects.tolist()]
+        self._bounds = QtCore.QRectF()
+        for rect in self._qrects:
+            self._bounds = self._bounds.united(rect)
+        # Leave room for the widest highlight pen.
+        self._bounds.adjust(-self.PEN_MARGIN, -self.PEN_MARGIN, self.PEN_MARGIN, self.PEN_MARGIN)
+        self._pending = []
+
+    def use_raster(self, raster):
+        self.raster = raster
+
+    def set_image(self, image, rows=None):
+        """Show a colorized image of the layout (raster mode); `rows` are the image rows that changed."""
+        self.image = image
+        if rows is None:
+            self.update()
+        elif len(rows):
+            x0, y0 = self.raster.origin
+            self.update(QtCore.QRectF(x0, y0 + rows[0], self.raster.shape[1], rows[-1] - rows[0] + 1))
+
+    def set_bins(self, bins):
+        """Replace the per-shape color bin array (in shape order), repainting only changed shapes."""
+        bins = np.asarray(bins, dtype=np.intp)
+        changed = np.flatnonzero(bins != self.bins)
+        self.changed_fraction = len(changed) / len(bins) if len(bins) else 0.0
+        self.bins = bins
+        if len(changed) > self.MAX_DIRTY_RECTS:
+            self.update(self._rect_around(changed))
+        else:
+            for shape in changed:
+                self.update(self._rect_around([shape]))
+
+    def _rect_around(self, shapes):
+        x0, y0, w, h = self.rects[shapes].T
+        left, top = x0.min() - self.PEN_MARGIN, y0.min() - self.PEN_MARGIN
+        return QtCore.QRectF(left, top, (x0 + w).max() + self.PEN_MARGIN - left,
+                             (y0 + h).max() + self.PEN_MARGIN - top)
+
+    def set_highlight(self, channel, pen=None):
+        if channel not in self.shape_of:
+            return
+        if pen is None:
+            self.highlights.pop(channel, None)
+        else:
+            self.highlights[channel] = pen
+        self.update()
+
+    def pixel_at(self, x, y):
+        """Channel of the topmost shape containing (x, y), or None."""
+        if self.raster is not None:
+            return self.raster.pick(x, y)
+        x0, y0, w, h = self.rects.T
+        hit = (x >= x0) & (x < x0 + w) & (y >= y0) & (y < y0 + h)
+        dx = (x - (x0 + w / 2)) / (w / 2)
+        dy = (y - (y0 + h / 2)) / (h / 2)
+        hit &= ~self.ellipse | (dx * dx + dy * dy <= 1)
+        shapes = np.flatnonzero(hit)
+        return int(self.channels[shapes[-1]]) if shapes.size else None
+
+    def boundingRect(self):
+        return self._bounds
+
+    def paint(self, painter, option, widget=None):
+        if self.raster is not None:
+            if self.image is not None:
+                painter.drawImage(QtCore.QPointF(*self.raster.origin), self.image)
+        else:
+            self._paint_shapes(painter, option.exposedRect)
+        painter.setBrush(QtCore.Qt.BrushStyle.NoBrush)
+        for channel, pen in self.highlights.items():
+            shape = self.shape_of[channel]
+            painter.setPen(pen)
+            if self.ellipse[shape]:
+                painter.drawEllipse(self._qrects[shape])
+            else:
+                painter.drawRect(self._qrects[shape])
+
+    def _paint_shapes(self, painter, exposed):
+        painter.setPen(self.OUTLINE)
+        brushes = self.lut.brushes
+        x0, y0, w, h = self.rects.T
+        m = self.PEN_MARGIN
+        visible = np.flatnonzero((x0 - m < exposed.right()) & (x0 + w + m > exposed.left()) &
+                                 (y0 - m < exposed.bottom()) & (y0 + h + m > exposed.top()))
+        for shape in visible.tolist():
+            painter.setBrush(brushes[self.bins[shape]])
+            if self.ellipse[shape]:
+                painter.drawEllipse(self._qrects[shape])
+            else:
+                painter.drawRect(self._qrects[shape])
+
+    def mousePressEvent(self, event):
+        pos = event.pos()
+        channel = self.pixel_at(pos.x(), pos.y())
+        if channel is None:
+            event.ignore()
+            return
+        self.click_callback(channel)
 
 # New widget encapsulating the geometry and its functionality.
 class ICCLayerView(QtWidgets.QWidget):
     # New signal to communicate a pixel click with its time series data
     timeSeriesClicked = QtCore.pyqtSignal(object, int)
     
-    def __init__(self, parent=None, internal_gap=GAP, rotate=False, layer=0):  # Added layer parameter
+    def __init__(self, parent=None, internal_gap=GAP, rotate=False, layer=0, render_mode='items', model=None):  # Added layer parameter
         super().__init__(parent)
         self.internal_gap = internal_gap
+        self.render_mode = render_mode  # 'items': vector shapes, 'raster': colorized label image
         self.rotate = rotate   # Store rotate flag
         self.layer = layer  # store layer number for mapping
+        self.channel_map = channel_map()
         layout = QtWidgets.QVBoxLayout(self)
         
         # Create GraphicsView and scene for the detector model only.
@@ -330,60 +445,52 @@ class ICCLayerView(QtWidgets.QWidget):
         layout.addWidget(self.view)
         
         self.selected_pixel_idx = None
-        self.sensor_data = []
-        self.pixel_items = {}  # NEW: map pixel index to its QGraphicsItem
-        # Initialize display with all intensities 0.
-        self.initializeDisplay()  # new function call in __init__
-
-    # New method to initialize the display with zero intensities.
-    def initializeDisplay(self):
-        total_points = calculate_total_data_points()
-        t = np.linspace(0, 2, 100) # dummy time axis
-        dummy_waveform = np.zeros(100)
-        sensor_data = [(t, dummy_waveform)] * total_points
-        intensities = [0] * total_points
-        self.setDetectorData(sensor_data, intensities)
-
-    # Remove or leave generate_test_data_and_build_layout unused.
-    # New external data setter is used to update the detector model.
-    def setDetectorData(self, sensor_data, intensities):
-        self.sensor_data = sensor_data
-        min_intensity = min(intensities) if intensities else 0
-        max_intensity = max(intensities) if intensities else 0
-        # If pixel items already exist, just update them to preserve highlights
-        if self.pixel_items:
-            self.update_pixels(intensities, min_intensity, max_intensity)
+        self.layer_item = None  # DetectorLayerItem drawing every channel of this view
+        self.raster = None  # LabelRaster of the layout in raster mode
+        # Shared frame model; the view only hears about frames that touch its own channels.
+        self.model = model if model is not None else DetectorDataModel(self.channel_map.total_pixels)
+        self._build_layout()
+        self.model.subscribe(self.layer_item.channels, self.on_model_changed)
+
+    def on_model_changed(self, model):
+        if self.raster is not None:
+            image, rows = model.images.get(self.raster, (None, None))
+            if image is None:
+                image = rgba_to_qimage(self.raster.colorize(model.bins, model.lut.rgba))
+            self.layer_item.set_image(image, rows)
         else:
-            self._build_layout(intensities, min_intensity, max_intensity)
-    
-    def update_pixels(self, intensities, min_intensity, max_intensity):
-        for idx, pixel in self.pixel_items.items():
-            if idx < len(intensities) and idx < len(self.sensor_data):
-                intensity = intensities[idx]
-                pixel.time_series = self.sensor_data[idx]
-                norm = (intensity - min_intensity) / (max_intensity - min_intensity + 1e-6)
-                r = int(255 * norm)
-                b = int(255 * (1 - norm))
-                color = QtGui.QColor(r, 0, b)
-                pixel.setBrush(QtGui.QBrush(color))
-
-    def _build_layout(self, intensities, min_intensity, max_intensity):
+            self.update_pixels(model.bins)
+
+    def update_pixels(self, bins):
+        # The model already normalized every channel to a color bin; gather this view's shapes.
+        self.layer_item.set_bins(bins[self.layer_item.channels])
+
+    def _build_layout(self):
         self.scene.clear()
+        self.layer_item = DetectorLayerItem(self.on_pixel_clicked, lut=self.model.lut)
         if self.rotate:
             # When rotated, use side first then hodo front view logic
-            y_bottom = self.build_hodo_side_layer(0, intensities, min_intensity, max_intensity)  # side layer
-            y_bottom = self.build_hodo_front_layer(y_bottom + GAP, intensities, min_intensity, max_intensity)
-            y_bottom = self.build_wls_front_layer(y_bottom + GAP, intensities, min_intensity, max_intensity)
-            y_bottom = self.build_csi_layer(y_bottom + GAP, intensities, min_intensity, max_intensity)
-            y_bottom = self.build_wls_side_layer(y_bottom + GAP, intensities, min_intensity, max_intensity)
+            y_bottom = self.build_hodo_side_layer(0)  # side layer
+            y_bottom = self.build_hodo_front_layer(y_bottom + GAP)
+            y_bottom = self.build_wls_front_layer(y_bottom + GAP)
+            y_bottom = self.build_csi_layer(y_bottom + GAP)
+            y_bottom = self.build_wls_side_layer(y_bottom + GAP)
         else:
             # Regular: hodo front then side, then side_wls then csi then hodo front wls
-            y_bottom = self.build_hodo_front_layer(0, intensities, min_intensity, max_intensity)
-            y_bottom = self.build_hodo_side_layer(y_bottom + GAP, intensities, min_intensity, max_intensity)
-            y_bottom = self.build_wls_side_layer(y_bottom + GAP, intensities, min_intensity, max_intensity)
-            y_bottom = self.build_csi_layer(y_bottom + GAP, intensities, min_intensity, max_intensity)
-            y_bottom = self.build_wls_front_layer(y_bottom + GAP, intensities, min_intensity, max_intensity)
-        final_height = self.build_tail_counters(intensities, y_bottom + GAP, min_intensity, max_intensity)
+            y_bottom = self.build_hodo_front_layer(0)
+            y_bottom = self.build_hodo_side_layer(y_bottom + GAP)
+            y_bottom = self.build_wls_side_layer(y_bottom + GAP)
+            y_bottom = self.build_csi_layer(y_bottom + GAP)
+            y_bottom = self.build_wls_front_layer(y_bottom + GAP)
+        final_height = self.build_tail_counters(y_bottom + GAP)
+        self.layer_item.finalize()
+        if self.render_mode == 'raster':
+            bounds = self.layer_item.boundingRect()
+            self.raster = LabelRaster(self.layer_item.rects, self.layer_item.ellipse, self.layer_item.channels,
+                                      self.channel_map.total_pixels, origin=(bounds.left(), bounds.top()))
+            self.layer_item.use_raster(self.raster)
+        # Added last so it sits above the CsI border decoration.
+        self.scene.addItem(self.layer_item)
         self.view.setMinimumHeight(final_height)
         return final_height
     
@@ -414,7 +521,7 @@ class ICCLayerView(QtWidgets.QWidget):
     #             self.pixel_items[mapped_idx] = pixel
     #     return y_offset + 2 * radius + adaptive_size
     
-    def build_hodo_front_layer(self, y_offset, intensities, min_intensity, max_intensity):
+    def build_hodo_front_layer(self, y_offset):
         overall_width = OVERALL_WIDTH
         num_cols = sensor_config["hodo_front"]["num_cols"]  # was sensor_config["front"]
         num_rows = sensor_config["hodo_front"]["num_rows"]    # was sensor_config["front"]
@@ -424,8 +531,8 @@ class ICCLayerView(QtWidgets.QWidget):
         radius = (GAP + OVERALL_WIDTH - GAP*num_cols)/(2*num_cols + 1)
         print(f"Calculated radius: {radius}")
         print(f"GAP: {GAP}")
-        # Use mapping from generateDataMap.
-        mapping = generateDataMap()[self.layer][0 if not self.rotate else 1]['hodo_front']
+        # Use mapping from the channel map.
+        mapping = self.channel_map.gather(self.layer, self.rotate, 'hodo_front')
         #print(f"Mapping for layer {self.layer} (rotate={self.rotate}): {mapping}")
         #print(f"Number of elements in mapping: {len(mapping)}")
         for row in range(num_rows):
@@ -434,18 +541,13 @@ class ICCLayerView(QtWidgets.QWidget):
                 y = y_offset if row == 0 else y_offset + 2 * radius
                 # get mapped index from the ordered list.
                 #print(row * num_cols + col)
-                mapped_idx = mapping[row * num_cols + col]
+                mapped_idx = int(mapping[row * num_cols + col])
                 #print(f"Mapped index: {mapped_idx}")
                 #mapped_idx = row * num_cols + col
-                rect = QtCore.QRectF(0, 0, 2*radius, 2*radius)
-                pixel = PixelCircle(rect, self.sensor_data[mapped_idx], intensities[mapped_idx],
-                                    min_intensity, max_intensity, self.on_pixel_clicked, mapped_idx)
-                pixel.setPos(x, y)
-                self.scene.addItem(pixel)
-                self.pixel_items[mapped_idx] = pixel
+                self.layer_item.add_pixel(x, y, 2*radius, 2*radius, mapped_idx, ellipse=True)
         return y_offset + 2 * round(radius) + adaptive_size
 
-    def build_hodo_side_layer(self, y_offset, intensities, min_intensity, max_intensity):
+    def build_hodo_side_layer(self, y_offset):
         overall_width = OVERALL_WIDTH
         # Use same number of columns as hodo_front for width consistency.
         num_cols = sensor_config["hodo_front"]["num_cols"]
@@ -453,55 +555,34 @@ class ICCLayerView(QtWidgets.QWidget):
         bottom_height = adaptive_size
         top_height = int(0.634 * bottom_height)
         new_gap = int(GAP / 5)
-        mapping = generateDataMap()[self.layer][0 if not self.rotate else 1]['hodo_side']
+        mapping = self.channel_map.gather(self.layer, self.rotate, 'hodo_side')
         # Assume mapping order: [top, bottom] for nonrotated and vice versa for rotated.
-        sensor_idx_top = mapping[0]
-        intensity = intensities[sensor_idx_top]
-        rect = QtCore.QRectF(0, 0, overall_width, top_height)
-        pixel = PixelRect(rect, self.sensor_data[sensor_idx_top], intensity,
-                          min_intensity, max_intensity, self.on_pixel_clicked, sensor_idx_top)
-        pixel.setPos(0, y_offset)
-        self.scene.addItem(pixel)
-        self.pixel_items[sensor_idx_top] = pixel
+        sensor_idx_top = int(mapping[0])
+        self.layer_item.add_pixel(0, y_offset, overall_width, top_height, sensor_idx_top)
         # Bottom row uses top index + 1
-        sensor_idx_bottom = mapping[1]
-        intensity = intensities[sensor_idx_bottom]
-        rect = QtCore.QRectF(0, 0, overall_width, bottom_height)
-        pixel = PixelRect(rect, self.sensor_data[sensor_idx_bottom], intensity,
-                          min_intensity, max_intensity, self.on_pixel_clicked, sensor_idx_bottom)
-        pixel.setPos(0, y_offset + top_height + new_gap)
-        self.scene.addItem(pixel)
-        self.pixel_items[sensor_idx_bottom] = pixel
+        sensor_idx_bottom = int(mapping[1])
+        self.layer_item.add_pixel(0, y_offset + top_height + new_gap, overall_width, bottom_height,
+                                  sensor_idx_bottom)
         return y_offset + top_height + new_gap + bottom_height
 
-    def build_wls_side_layer(self, y_offset, intensities, min_intensity, max_intensity):
+    def build_wls_side_layer(self, y_offset):
         overall_width = OVERALL_WIDTH
         # Use same number of columns as wls_front for width consistency.
         num_cols = sensor_config["wls_front"]["num_cols"]
         adaptive_size = int((overall_width - (num_cols - 1) * self.internal_gap) / num_cols)
         height = adaptive_size
-        mapping = generateDataMap()[self.layer][0 if not self.rotate else 1]['wls_side']
-        # Ensure mapping is a list.
-        if not isinstance(mapping, list):
-            mapping = [mapping]
-        sensor_idx = mapping[0]
-        intensity = intensities[sensor_idx]
-        rect = QtCore.QRectF(0, 0, overall_width, height)
-        pixel = PixelRect(rect, self.sensor_data[sensor_idx], intensity,
-                          min_intensity, max_intensity, self.on_pixel_clicked, sensor_idx)
-        pixel.setPos(0, y_offset)
-        self.scene.addItem(pixel)
-        self.pixel_items[sensor_idx] = pixel
+        mapping = self.channel_map.gather(self.layer, self.rotate, 'wls_side')
+        sensor_idx = int(mapping[0])
+        self.layer_item.add_pixel(0, y_offset, overall_width, height, sensor_idx)
         return y_offset + height
 
-    def build_csi_layer(self, y_offset, intensities, min_intensity, max_intensity):
+    def build_csi_layer(self, y_offset):
         overall_width = OVERALL_WIDTH
         num_cols = sensor_config["csi"]["num_cols"]
         adaptive_size = int((overall_width - (num_cols - 1) * self.internal_gap) / num_cols)
         height = adaptive_size
-        mapping = generateDataMap()[self.layer][0 if not self.rotate else 1]['csi']
-        sensor_idx = mapping[0]
-        intensity = intensities[sensor_idx]
+        mapping = self.channel_map.gather(self.layer, self.rotate, 'csi')
+        sensor_idx = int(mapping[0])
         border_rect = QtCore.QRectF(0, 0, overall_width, height)
         #print(overall_width)
         border_item = QtWidgets.QGraphicsRectItem(border_rect)
@@ -511,12 +592,7 @@ class ICCLayerView(QtWidgets.QWidget):
         constant_inset = 10
         inner_width = overall_width - 2 * constant_inset
         inner_height = height - 2 * constant_inset
-        inner_rect = QtCore.QRectF(0, 0, inner_width, inner_height)
-        pixel = PixelRect(inner_rect, self.sensor_data[sensor_idx], intensity,
-                          min_intensity, max_intensity, self.on_pixel_clicked, sensor_idx)
-        pixel.setPos(constant_inset, y_offset + constant_inset)
-        self.scene.addItem(pixel)
-        self.pixel_items[sensor_idx] = pixel
+        self.layer_item.add_pixel(constant_inset, y_offset + constant_inset, inner_width, inner_height, sensor_idx)
         return y_offset + height
 
     #def build_wls_front_layer(self, y_offset, intensities, min_intensity, max_intensity):
@@ -537,86 +613,73 @@ class ICCLayerView(QtWidgets.QWidget):
     #        self.pixel_items[mapped_idx] = pixel
     #    return y_offset + adaptive_size
     
-    def build_wls_front_layer(self, y_offset, intensities, min_intensity, max_intensity):
+    def build_wls_front_layer(self, y_offset):
         overall_width = OVERALL_WIDTH
         num_cols = sensor_config["wls_front"]["num_cols"]
-        mapping = generateDataMap()[self.layer][0 if not self.rotate else 1]['wls_front']
+        mapping = self.channel_map.gather(self.layer, self.rotate, 'wls_front')
         adaptive_size = int((overall_width - (num_cols - 1) * self.internal_gap) / num_cols)
         #print('BEEP')
         #print(adaptive_size)
         #print(PIXEL_SIZE)
-        # mapping may be nested – use inner list if needed.
-        mapping_list = mapping[0] if isinstance(mapping[0], list) else mapping
         for col in range(num_cols):
             x = col * (PIXEL_SIZE + self.internal_gap)
             #print(x)
-            mapped_idx = mapping_list[col]
-            rect = QtCore.QRectF(0, 0, PIXEL_SIZE, PIXEL_SIZE)
-            pixel = PixelRect(rect, self.sensor_data[mapped_idx], intensities[mapped_idx],
-                                min_intensity, max_intensity, self.on_pixel_clicked, mapped_idx)
-            pixel.setPos(x, y_offset)
-            self.scene.addItem(pixel)
-            self.pixel_items[mapped_idx] = pixel
+            mapped_idx = int(mapping[col])
+            self.layer_item.add_pixel(x, y_offset, PIXEL_SIZE, PIXEL_SIZE, mapped_idx)
         return y_offset + adaptive_size
 
 
-    def build_tail_counters(self, intensities, y_offset, min_intensity, max_intensity):
+    def build_tail_counters(self, y_offset):
         overall_width = OVERALL_WIDTH
         num_cols = sensor_config["tail_counters"]["num_cols"]
         num_rows = sensor_config["tail_counters"]["num_rows"]
         tail_width = int((overall_width - (num_cols - 1) * self.internal_gap) / num_cols)
         height = PIXEL_SIZE // num_rows
-        mapping = generateDataMap()[self.layer][0 if not self.rotate else 1]['tail']
+        mapping = self.channel_map.gather(self.layer, self.rotate, 'tail')
         count = 0
         for col in range(num_cols):
             for row in range(num_rows):
                 x = col * (tail_width + self.internal_gap)
                 y = y_offset + row * (height + self.internal_gap)
-                sensor_idx = mapping[count]
-                intensity = intensities[sensor_idx]
-                rect = QtCore.QRectF(0, 0, tail_width, height)
-                pixel = PixelRect(rect, self.sensor_data[sensor_idx], intensity,
-                                  min_intensity, max_intensity, self.on_pixel_clicked, sensor_idx)
-                pixel.setPos(x, y)
-                self.scene.addItem(pixel)
-                self.pixel_items[sensor_idx] = pixel
+                sensor_idx = int(mapping[count])
+                self.layer_item.add_pixel(x, y, tail_width, height, sensor_idx)
                 count += 1
         return y_offset + num_rows * height + self.internal_gap
 
     # New methods to highlight and clear a pixel border.
     def highlight_pixel(self, idx, color):
-        if idx in self.pixel_items:
-            self.pixel_items[idx].setPen(QtGui.QPen(QtGui.QColor(color), 3))
+        if self.layer_item is not None:
+            self.layer_item.set_highlight(idx, QtGui.QPen(QtGui.QColor(color), 3))
     def clear_highlight(self, idx):
-        if idx in self.pixel_items:
-            # Remove border (set no pen)
-            self.pixel_items[idx].setPen(QtGui.QPen(QtCore.Qt.PenStyle.NoPen))
+        if self.layer_item is not None:
+            self.layer_item.set_highlight(idx, None)
 
     # New callback method that emits a signal instead of plotting directly.
-    def on_pixel_clicked(self, time_series, idx):
+    def on_pixel_clicked(self, idx):
         self.selected_pixel_idx = idx
-        self.timeSeriesClicked.emit(time_series, idx)
+        self.timeSeriesClicked.emit(self.model.time_series(idx), idx)
 
 # NEW: New widget that shows both regular and rotated (rotated 90°) detector views.
 class DetectorDualViewWidget(QtWidgets.QWidget):
     timeSeriesClicked = QtCore.pyqtSignal(object, int)   # unified signal
     
-    def __init__(self, parent=None, internal_gap=GAP, layer=0):  # added layer
+    def __init__(self, parent=None, internal_gap=GAP, layer=0, render_mode='items', model=None):  # added layer
         super().__init__(parent)
         layout = QtWidgets.QHBoxLayout(self)
         # Regular (non-rotated) view:
-        self.regular_view = ICCLayerView(internal_gap=internal_gap, rotate=False, layer=layer)
+        self.regular_view = ICCLayerView(internal_gap=internal_gap, rotate=False, layer=layer,
+                                         render_mode=render_mode, model=model)
         # Rotated view represents detector rotated 90°
-        self.rotated_view = ICCLayerView(internal_gap=internal_gap, rotate=True, layer=layer)
+        self.rotated_view = ICCLayerView(internal_gap=internal_gap, rotate=True, layer=layer,
+                                         render_mode=render_mode, model=self.regular_view.model)
         layout.addWidget(self.regular_view)
         layout.addWidget(self.rotated_view)
         # Connect both child signals to our unified signal
         self.regular_view.timeSeriesClicked.connect(self.timeSeriesClicked.emit)
         self.rotated_view.timeSeriesClicked.connect(self.timeSeriesClicked.emit)
     
-    def setDetectorData(self, sensor_data, intensities):
-        self.regular_view.setDetectorData(sensor_data, intensities)
-        self.rotated_view.setDetectorData(sensor_data, intensities)
+    def views(self):
+        return [self.regular_view, self.rotated_view]
         
     def highlight_pixel(self, idx, color):
         self.regular_view.highlight_pixel(idx, color)
@@ -631,33 +694,42 @@ class TimeSeriesDock(Dock):
     def __init__(self, title, pixel_index, *args, **kwargs):
         super().__init__(title, *args, **kwargs)
         self.pixel_index = pixel_index
+        self.color = None
+        self.plot_widget = None
         self.highlight_clear_callback = None
         self.remove_from_grid_callback = None  # New callback for grid cleanup
-    
-    def closeEvent(self, event):
+        # The title bar's close button calls Dock.close(), which emits sigClosed
+        # but never sends the widget a closeEvent.
+        self.sigClosed.connect(self.on_closed)
+
+    def on_closed(self, dock):
         if self.highlight_clear_callback:
             self.highlight_clear_callback(self.pixel_index)
         if self.remove_from_grid_callback:
             self.remove_from_grid_callback(self)
-        super().closeEvent(event)
 
 # NEW: New widget that shows four stacked DetectorDualViewWidget layers.
 class DetectorMultiLayerWidget(QtWidgets.QWidget):
     timeSeriesClicked = QtCore.pyqtSignal(object, int)
     
-    def __init__(self, parent=None, internal_gap=GAP):
+    def __init__(self, parent=None, internal_gap=GAP, render_mode='items', model=None):
         super().__init__(parent)
         layout = QtWidgets.QVBoxLayout(self)
+        self.model = model if model is not None else DetectorDataModel(channel_map().total_pixels)
         self.layers = []
         for i in range(4):
-            layer_widget = DetectorDualViewWidget(layer=i, internal_gap=internal_gap)
+            layer_widget = DetectorDualViewWidget(layer=i, internal_gap=internal_gap, render_mode=render_mode,
+                                                  model=self.model)
             layout.addWidget(layer_widget)
             layer_widget.timeSeriesClicked.connect(self.timeSeriesClicked.emit)
             self.layers.append(layer_widget)
     
-    def setDetectorData(self, sensor_data, intensities):
-        for layer in self.layers:
-            layer.setDetectorData(sensor_data, intensities)
+    def views(self):
+        return [view for layer in self.layers for view in layer.views()]
+
+    def rasters(self):
+        """LabelRasters of the raster-mode views, in views() order (empty in items mode)."""
+        return [view.raster for view in self.views() if view.raster is not None]
     
     def highlight_pixel(self, idx, color):
         for layer in self.layers:
@@ -669,7 +741,7 @@ class DetectorMultiLayerWidget(QtWidgets.QWidget):
 
 # MainWindow now simply wraps ICCLayerView for easy embedding.
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    def __init__(self, render_mode='items', colormap='blue-red', color_scale='frame', color_limits=(0.0, 1.0)):
         super().__init__()
         self.setWindowTitle("Experimental System Layout Testbed")
         self.last_time_series = None  # store last selected pixel's time series
@@ -682,7 +754,12 @@ class MainWindow(QtWidgets.QMainWindow):
         main_layout = QtWidgets.QVBoxLayout(central_widget)
         left_panel = QtWidgets.QWidget()
         left_layout = QtWidgets.QVBoxLayout(left_panel)
-        self.detector_model = DetectorMultiLayerWidget(internal_gap=1)
+        # One frame model for every view and dock; views redraw only when their channels change.
+        lut = ColorLUT.get(colormap)
+        self.frame_model = DetectorDataModel(channel_map().total_pixels, lut=lut,
+                                             scale=ColorScale(color_scale, *color_limits, n_bins=len(lut)))
+        self.detector_model = DetectorMultiLayerWidget(internal_gap=1, render_mode=render_mode,
+                                                       model=self.frame_model)
         left_layout.addWidget(self.detector_model)
         
         buttons_layout = QtWidgets.QHBoxLayout()
@@ -710,42 +787,130 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ts_dock_count = 0
         self.last_dock = None  # Track the last added dock for simple vertical layout
         self.docks_in_order = []
+        self.ts_docks = {}  # channel -> open TimeSeriesDocks pinning it, refreshed once per render tick
 
         # Connect unified signal from DetectorMultiLayerWidget.
         self.detector_model.timeSeriesClicked.connect(self.on_pixel_selected)
-        # Initialize display from one of the child widgets.
-        self.detector_model.layers[0].regular_view.initializeDisplay()
+
+        # Background stage that turns raw payloads into DetectorFrames.
+        self.total_points = calculate_total_data_points()
+        self.rng = np.random.default_rng()
+        # Label rasters are immutable once built, so the worker can colorize them.
+        self.rasters = self.detector_model.rasters()
+        # Frames are refilled in place; the model copies each into its own waveform matrix.
+        self.frame_pool = FramePool(self.total_points)
+        self.frame_worker = FrameWorker(self.build_frame, parent=self)
+        # Sources marked "channel_order": "hardware" in fifo_config.json are
+        # reordered into display order with one np.take per frame.
+        self.frame_orders = {name: channel_map().display_order for name, entry in fifo_config.items()
+                             if entry.get('channel_order') == 'hardware'}
+        self.frame_worker.frame_ready.connect(self.on_frame_ready)
+        self.frame_worker.start()
+        # Finished frames are only stored on arrival; the shared frame clock paints the latest one.
+        self.pending_frame = None
+        self.frame_render = FrameClock.instance().register(self.render_frame, name='detector')
 
         # Path to the array FIFO for lat/lon errors
-        array_fifo_path = fifo_config['array']['path']
-        self.array_fifo_watcher = FifoWatcher(array_fifo_path, poll_interval=fifo_config['array']['poll_interval'])
+        self.array_fifo_watcher = FifoWatcher.from_config(fifo_config['array'])
         self.array_fifo_watcher.data_received.connect(self.handle_array_fifo_data)
         self.array_fifo_watcher.start()
 
+        # Optional CSV frames from the hardware test stand (hardware/sim_fifo_writer.py),
+        # parsed to (pixels, samples) arrays by the watcher.
+        self.sim_fifo_watcher = None
+        if 'sim_array' in fifo_config:
+            self.sim_fifo_watcher = FifoWatcher.from_config(fifo_config['sim_array'], name='sim_array')
+            self.sim_fifo_watcher.data_received.connect(self.handle_sim_fifo_data)
+            self.sim_fifo_watcher.start()
+
+        # Optional shared-memory frame source (see shm_ring / hardware/sim_fifo_writer.py)
+        self.shm_frame_watcher = None
+        if 'detector_shm' in fifo_config:
+            self.shm_frame_watcher = ShmFrameWatcher.from_config(fifo_config['detector_shm'], parent=self)
+            self.shm_frame_watcher.data_received.connect(self.handle_shm_frame)
+            self.shm_frame_watcher.start()
+
+        # Ingest health dock
+        self.ingest_stats = IngestStatsWidget()
+        self.ingest_stats.add_source('array', self.array_fifo_watcher)
+        if self.sim_fifo_watcher is not None:
+            self.ingest_stats.add_source('sim_array', self.sim_fifo_watcher)
+        if self.shm_frame_watcher is not None:
+            self.ingest_stats.add_source('detector_shm', self.shm_frame_watcher)
+        self.ingest_stats_dock = QtWidgets.QDockWidget("Ingest stats", self)
+        self.ingest_stats_dock.setWidget(self.ingest_stats)
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.BottomDockWidgetArea, self.ingest_stats_dock)
+
+        # Share of channels repainted per frame (see DetectorDataModel.changed_fraction)
+        self.repaint_label = QtWidgets.QLabel("Changed pixels: -")
+        self.statusBar().addPermanentWidget(self.repaint_label)
+
     def handle_array_fifo_data(self, data):
-        try:
-            # The data from the fifo is a string, so we need to parse it.
-            # It will be a comma-separated list of numbers.
-            str_values = data.strip().split(',')
-            float_values = np.array([float(v) for v in str_values])
-            t = np.linspace(0, 2, len(float_values)) # Create time axis
-            total_points = calculate_total_data_points()
-            sensor_data = []
-            intensities = []
-            rng = np.random.default_rng()
-            
-            for i in range(total_points):
-                factor = rng.uniform(0.5, 2.0)
-                this_sensor_data = float_values * factor
-                sensor_data.append((t, this_sensor_data)) # Append tuple with time axis
-                intensities.append(np.mean(this_sensor_data))
+        # Decoding and intensity computation happen on the worker thread;
+        # on_frame_ready only paints the finished frame.
+        self.frame_worker.submit((self.array_fifo_watcher.stats, self.frame_orders.get('array'), data))
 
-            self.detector_model.setDetectorData(sensor_data, intensities)
-            self.updateDockPlots()
+    def handle_sim_fifo_data(self, frame):
+        self.frame_worker.submit((self.sim_fifo_watcher.stats, self.frame_orders.get('sim_array'), frame))
 
-        except Exception as e:
-            print(f"Error handling array data: {e}")
-            pass
+    def handle_shm_frame(self, frame):
+        self.frame_worker.submit((self.shm_frame_watcher.stats, self.frame_orders.get('detector_shm'), frame))
+
+    def build_frame(self, item):
+        # Runs on the FrameWorker thread.
+        stats, order, raw = item
+        try:
+            frame = build_detector_frame(raw, self.total_points, self.rng, order, self.frame_pool)
+        except ValueError:
+            stats.parse_failed()
+            raise
+        finally:
+            # The payload has been copied into the pooled frame; its receive buffer can be reused.
+            if isinstance(raw, Frame):
+                raw.release()
+        if getattr(raw, '_ring_gen', None) is not None and not self.shm_frame_watcher.is_valid(raw):
+            # A zero-copy shared-memory frame that the writer lapped while we copied it.
+            frame.release()
+            return None
+        frame.stats = stats
+        # The scale is only ever applied here, so its rolling state stays on this thread.
+        self.frame_model.scale.bins(frame.intensities, out=frame.bins)
+        if self.rasters:
+            # Only the scanlines of changed channels are recolored; unchanged views get no image.
+            rgba = self.frame_model.lut.rgba
+            frame.images = {}
+            for raster in self.rasters:
+                image, rows = raster.recolor(frame.bins, rgba)
+                if len(rows):
+                    frame.images[raster] = (rgba_to_qimage(image), rows)
+        return frame
+
+    def on_frame_ready(self, frame):
+        pending = self.pending_frame
+        if pending is not None and pending.images and frame.images is not None:
+            # The skipped frame's raster rows still have to be repainted along with this one's.
+            for raster, (image, rows) in pending.images.items():
+                if raster in frame.images:
+                    frame.images[raster] = (frame.images[raster][0], np.union1d(rows, frame.images[raster][1]))
+                else:
+                    frame.images[raster] = (image, rows)
+        if pending is not None:
+            pending.release()
+        self.pending_frame = frame
+        self.frame_render.mark_dirty()
+
+    def render_frame(self):
+        frame, self.pending_frame = self.pending_frame, None
+        if frame is None:
+            return
+        self.frame_model.update(frame.t, frame.waveforms, frame.intensities, frame.images, frame.bins)
+        self.repaint_label.setText(f"Changed pixels: {100 * self.frame_model.changed_fraction:.1f}%")
+        self.updateDockPlots()
+        if frame.stats is not None:
+            frame.stats.painted(frame)
+        # The model has its own copy now, so the worker can refill this frame; it must not
+        # be touched after this, since acquire() resets it on the worker thread.
+        frame.release()
 
     def on_pixel_selected(self, time_series, idx):
         self.last_time_series = (time_series, idx)
@@ -766,8 +931,10 @@ class MainWindow(QtWidgets.QMainWindow):
         new_dock.remove_from_grid_callback = self.remove_dock_from_grid
 
         plot_widget = TimeSeriesPlotWidget()
-        plot_widget.display_time_series(time_series, idx, color)
+        plot_widget.display_time_series(self.frame_model.time_series(idx), idx, color)
+        new_dock.plot_widget = plot_widget
         new_dock.addWidget(plot_widget)
+        self.ts_docks.setdefault(idx, []).append(new_dock)
 
         if self.use_simple_layout:
             self.addDockVertically(new_dock)
@@ -814,6 +981,14 @@ class MainWindow(QtWidgets.QMainWindow):
 
     # Modify the remove method to handle both layout modes
     def remove_dock_from_grid(self, dock):
+        docks = self.ts_docks.get(dock.pixel_index, [])
+        if dock in docks:
+            docks.remove(dock)
+        if docks:
+            # Another dock still pins this channel; its highlight was just cleared with this one.
+            self.detector_model.highlight_pixel(dock.pixel_index, docks[-1].color)
+        else:
+            self.ts_docks.pop(dock.pixel_index, None)
         if self.use_simple_layout:
             if dock in self.docks_in_order:
                 self.docks_in_order.remove(dock)
@@ -827,37 +1002,64 @@ class MainWindow(QtWidgets.QMainWindow):
                     col.remove(dock)
                     # If a column becomes empty, we could try to clean it up,
                     # but for now, we'll leave it.
+                    self.ts_dock_count -= 1
                     break
-            self.ts_dock_count -= 1
 
     def updateDockPlots(self):
-        new_sensor_data = self.detector_model.layers[0].regular_view.sensor_data
-        docks = self.ts_dock_area.findChildren(Dock)
-        for dock in docks:
-            if hasattr(dock, "pixel_index") and hasattr(dock, "color"):
-                idx = dock.pixel_index
-                color = dock.color
-                if idx < len(new_sensor_data):
-                    widgets = dock.widgets  # use the widgets list property
-                    if widgets:
-                        widgets[0].display_time_series(new_sensor_data[idx], idx, color)
-                    self.detector_model.highlight_pixel(idx, color) # Re-apply highlight
+        # Point every open dock's curve at its channel's row of the new frame, then repaint the
+        # dock window once. Highlights are kept by the layer items and need no refresh.
+        if not self.ts_docks or not self.ts_window.isVisible():
+            return
+        self.ts_window.setUpdatesEnabled(False)
+        try:
+            for idx, docks in self.ts_docks.items():
+                if idx < self.frame_model.n_channels:
+                    time_series = self.frame_model.time_series(idx)
+                    for dock in docks:
+                        dock.plot_widget.display_time_series(time_series, idx, dock.color)
+        finally:
+            self.ts_window.setUpdatesEnabled(True)
 
     # Add a closeEvent handler to close the dock window when main window closes
     def closeEvent(self, event):
         # Close the dock area window if it exists
         if hasattr(self, "ts_window") and self.ts_window is not None:
             self.ts_window.close()
+        self.frame_worker.stop()
+        FrameClock.instance().unregister(self.frame_render)
         
         # Proceed with the normal close event
         super().closeEvent(event)
 
 
 def main():
-    app = QtWidgets.QApplication(sys.argv)
-    win = MainWindow()
+    import argparse
+    parser = argparse.ArgumentParser(description="ADAPT detector array viewer.")
+    parser.add_argument('--record', metavar='DIR', default=None,
+                        help="Tee all FIFO traffic into a timestamped capture file in DIR")
+    parser.add_argument('--render', choices=RENDER_MODES, default='items',
+                        help="Draw the layer views as vector shapes or as colorized label images")
+    parser.add_argument('--colormap', default='blue-red',
+                        help="Detector colormap: blue-red or any pg.colormap name (viridis, cividis, ...)")
+    parser.add_argument('--color-scale', choices=SCALE_MODES, default='frame',
+                        help="Color scaling: fixed limits, per-frame min/max, or rolling percentiles")
+    parser.add_argument('--color-limits', type=float, nargs=2, default=(0.0, 1.0), metavar=('VMIN', 'VMAX'),
+                        help="Limits for --color-scale fixed")
+    parser.add_argument('--fps', type=float, default=30, help="Target repaint rate of the frame clock")
+    args, qt_args = parser.parse_known_args()
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    recorder = None
+    if args.record:
+        from fifo_recorder import start_recording
+        recorder = start_recording(args.record)
+    FrameClock.instance().set_fps(args.fps)
+    win = MainWindow(render_mode=args.render, colormap=args.colormap, color_scale=args.color_scale,
+                     color_limits=args.color_limits)
     win.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    if recorder is not None:
+        recorder.close()
+    sys.exit(exit_code)
     
 if __name__ == '__main__':
     main()
\ No newline at end of file
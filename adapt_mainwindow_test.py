@@ -1,11 +1,16 @@
 import sys
 import json
-from PyQt6.QtWidgets import QApplication, QMainWindow
-from PyQt6.QtCore import QTimer
+import functools
+from PyQt6.QtWidgets import QApplication, QMainWindow, QDockWidget
+from PyQt6.QtCore import QTimer, Qt
 import random
 from ADAPT_MainWindow import Ui_MainWindow
 from custom_widgets import SignalRotatingArrowWidget, ScrollingRatePlotWidget
-from helper_classes import FifoWatcher
+from helper_classes import FifoWatcher, FrameClock, IngestStatsWidget
+from fifo_ingest import FifoMultiplexer
+from rate_history import RateHistory
+from history_store import HistoryStore, scalar_columns
+from log_console import LogConsole, RotatingLog
 import os
 import math
 import numpy as np
@@ -69,8 +74,11 @@ def precompute_circle_track2(radius=23, num_steps=100):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, history=None, log=None, log_lines=5000):
         super().__init__()
+        # Every scalar channel is appended to the on-disk history, which rate plots and
+        # readouts start from, so a restart shows the whole past.
+        self.history = history
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
         
@@ -81,19 +89,28 @@ class MainWindow(QMainWindow):
         # Use config for FIFO watcher setup
         self.fifo1_path = fifo_config['float1']['path']
         self.fifo2_path = fifo_config['float2']['path']
-        self.fifo1_watcher = FifoWatcher(self.fifo1_path, poll_interval=fifo_config['float1']['poll_interval'])
-        self.fifo2_watcher = FifoWatcher(self.fifo2_path, poll_interval=fifo_config['float2']['poll_interval'])
+        self.fifo1_watcher = FifoWatcher.from_config(fifo_config['float1'])
+        self.fifo2_watcher = FifoWatcher.from_config(fifo_config['float2'])
         self.fifo1_watcher.data_received.connect(self.handle_pointing_data)
         self.fifo1_watcher.data_received.connect(self.handle_fifo1_data)
         self.fifo2_watcher.data_received.connect(self.handle_fifo2_data)
         self.fifo1_watcher.start()
         self.fifo2_watcher.start()
-        self.last_float1 = None
-        self.last_float2 = None
+        self.last_float1 = self.history_value('float1')
+        self.last_float2 = self.history_value('float2')
+        self.pointing_angle = None
+        self.position_changed = set()  # stats of the float channels with a value not yet painted
+
+        # Ingest handlers only store state; these render on the shared frame clock.
+        clock = FrameClock.instance()
+        self.pointing_render = clock.register(self.render_pointing, name='pointing')
+        self.position_render = clock.register(self.render_position, name='position')
+        self.rate_render = clock.register(self.render_rate, name='rate')
+        if self.last_float1 is not None and self.last_float2 is not None:
+            self.position_render.mark_dirty()  # show the last recorded position right away
 
         # Path to the array FIFO for lat/lon errors
-        array_fifo_path = fifo_config['array']['path']
-        self.array_fifo_watcher = FifoWatcher(array_fifo_path, poll_interval=fifo_config['array']['poll_interval'])
+        self.array_fifo_watcher = FifoWatcher.from_config(fifo_config['array'])
         #self.array_fifo_watcher.data_received.connect(self.handle_array_fifo_data)
         self.array_fifo_watcher.start()
 
@@ -104,22 +121,22 @@ class MainWindow(QMainWindow):
         # For now, just keep it as an attribute
 
         # Path to the FIFO (int1.fifo)
-        int1_fifo_path = fifo_config['int1']['path']
-        self.int1_fifo_watcher = FifoWatcher(int1_fifo_path, poll_interval=fifo_config['int1']['poll_interval'])
+        self.int1_fifo_watcher = FifoWatcher.from_config(fifo_config['int1'])
         self.int1_fifo_watcher.data_received.connect(self.handle_rate_data)
         self.int1_fifo_watcher.start()
 
         self.array_size1 = 20000
-        self.data1 = np.zeros(self.array_size1)
-        now = time()
-        now_sub_one = now - 1
-        self.times1 = np.linspace(now_sub_one, now, self.array_size1)
+        self.rate1 = RateHistory(recent=self.array_size1, store=self.history_for('int1'), column='int1')
         self.ui.default_plot_widget.setLabel('left', 'Rate')
         self.ui.default_plot_widget.setLabel('bottom', 'Time')
         self.ui.default_plot_widget.showGrid(x=True, y=True)
         self.ui.default_plot_widget.addLegend()
         self.ui.default_plot_widget.setAxisItems({'bottom': pg.DateAxisItem()})
-        self.curve = self.ui.default_plot_widget.plot(self.times1, self.data1, pen='y', name='Raw Rate')
+        self.curve = self.ui.default_plot_widget.plot(pen='y', name='Raw Rate')
+        # The plot follows the last 20 s until the user zooms or pans; the auto-range button
+        # then shows the whole history.
+        self.rate_follow = True
+        self.ui.default_plot_widget.getViewBox().sigRangeChangedManually.connect(self.on_rate_view_changed)
         self.int1_fifo_watcher.data_received.connect(self.handle_rate_data1)
 
         # Connect array_viewer_button to launch the array viewer window
@@ -129,31 +146,86 @@ class MainWindow(QMainWindow):
 
         # Add watcher for string.fifo and log to log_text_box
         if 'string' in fifo_config:
-            self.string_fifo_watcher = FifoWatcher(fifo_config['string']['path'], poll_interval=fifo_config['string']['poll_interval'])
+            self.string_fifo_watcher = FifoWatcher.from_config(fifo_config['string'])
+            # Lines are shown once per frame tick; the full log goes to disk when `log` is given.
+            self.log_console = LogConsole(self.ui.log_text_box, max_blocks=log_lines, log=log,
+                                          stats=self.string_fifo_watcher.stats)
             self.string_fifo_watcher.data_received.connect(self.handle_string_fifo_data)
             self.string_fifo_watcher.start()
 
+        self.history_watchers = []
+        if self.history is not None:
+            self.connect_history()
+
+        # Ingest health for every FIFO channel
+        self.ingest_stats = IngestStatsWidget()
+        self.ingest_stats.add_source('float1', self.fifo1_watcher)
+        self.ingest_stats.add_source('float2', self.fifo2_watcher)
+        self.ingest_stats.add_source('array', self.array_fifo_watcher)
+        self.ingest_stats.add_source('int1', self.int1_fifo_watcher)
+        if 'string' in fifo_config:
+            self.ingest_stats.add_source('string', self.string_fifo_watcher)
+        self.ingest_stats_dock = QDockWidget("Ingest stats", self)
+        self.ingest_stats_dock.setWidget(self.ingest_stats)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.ingest_stats_dock)
+
+
+    def history_for(self, name):
+        """The history store if it records channel `name`, else None."""
+        if self.history is not None and name in self.history.columns:
+            return self.history
+        return None
+
+    def history_value(self, name):
+        """The newest recorded value of a channel, for the readouts at startup."""
+        history = self.history_for(name)
+        last = history.last(name) if history is not None else None
+        return last[1] if last is not None else None
+
+    def connect_history(self):
+        watchers = {'float1': self.fifo1_watcher, 'float2': self.fifo2_watcher, 'int1': self.int1_fifo_watcher}
+        for name in self.history.columns:
+            watcher = watchers.get(name)
+            if watcher is None and name in fifo_config:
+                # Channels nothing else displays (int2, housekeeping) still go to the history.
+                watcher = FifoWatcher.from_config(fifo_config[name])
+                watcher.start()
+                self.history_watchers.append(watcher)
+            if watcher is not None:
+                # Tapped before the delivery policy, so conflated channels are recorded in full.
+                watcher.add_tap(functools.partial(self.record_history, name))
+
+    def record_history(self, name, value):
+        # Runs on the FIFO ingest thread (see FifoWatcher.add_tap).
+        self.history.append(time(), **{name: value})
 
-    def handle_pointing_data(self, data):
-        try:
-            angle = float(data)
-            self.ui.pointing_widget.set_angle(angle)
-        except Exception:
-            pass
+    # The watchers decode each channel to the type declared in fifo_config.json,
+    # so the handlers below receive floats/ints/arrays rather than strings.
 
-    def handle_fifo1_data(self, data):
-        try:
-            self.last_float1 = float(data)
-            self.update_sexagesimal_lines()
-        except Exception:
-            pass
+    def handle_pointing_data(self, angle):
+        self.pointing_angle = angle
+        self.pointing_render.mark_dirty()
 
-    def handle_fifo2_data(self, data):
-        try:
-            self.last_float2 = float(data)
-            self.update_sexagesimal_lines()
-        except Exception:
-            pass
+    def render_pointing(self):
+        if self.pointing_angle is not None:
+            self.ui.pointing_widget.set_angle(self.pointing_angle)
+
+    def handle_fifo1_data(self, value):
+        self.last_float1 = value
+        self.position_changed.add(self.fifo1_watcher.stats)
+        self.position_render.mark_dirty()
+
+    def handle_fifo2_data(self, value):
+        self.last_float2 = value
+        self.position_changed.add(self.fifo2_watcher.stats)
+        self.position_render.mark_dirty()
+
+    def render_position(self):
+        self.update_sexagesimal_lines()
+        # Paint latency only for the channels that brought a new value since the last tick.
+        for stats in self.position_changed:
+            stats.painted()
+        self.position_changed.clear()
 
     def update_sexagesimal_lines(self):
         if self.last_float1 is not None and self.last_float2 is not None:
@@ -170,80 +242,69 @@ class MainWindow(QMainWindow):
             self.ui.ins_line_1.setText(lat_sex)
             self.ui.ins_line_2.setText(lon_sex)
 
-    def handle_fifo_data(self, data):
-        try:
-            angle = float(data)
-            self.ui.pointing_widget.set_angle(angle)
-        except Exception:
-            pass
+    def handle_fifo_data(self, angle):
+        self.ui.pointing_widget.set_angle(angle)
     
-    def handle_array_fifo_data(self, data):
-        try:
-            # Parse the comma-separated array data
-            values = [float(x.strip()) for x in data.split(',')]
-            if len(values) >= 2:
-                # Scale the random values to +/- 5 degrees
-                lat_error = (values[0] / 1000) * 5  # Scale from +/-1000 to +/-5
-                lon_error = (values[1] / 1000) * 5  # Scale from +/-1000 to +/-5
-                
-                # Get the current point in the circle
-                base_lon, base_lat = self.circle_track[self.current_track_index]
-                
-                # Add jitter
-                jittered_lon = base_lon + lon_error
-                jittered_lat = base_lat + lat_error
-                
-                # Add the point to the map
-                self.ui.tracker_widget.add_point(jittered_lon, jittered_lat)
-                
-                # Move to the next point in the circle
-                self.current_track_index = (self.current_track_index + 1) % len(self.circle_track)
-        except Exception as e:
-            print(f"Error handling array FIFO data: {e}")
-            pass
+    def handle_array_fifo_data(self, values):
+        if len(values) >= 2:
+            # Scale the random values to +/- 5 degrees
+            lat_error = (values[0] / 1000) * 5  # Scale from +/-1000 to +/-5
+            lon_error = (values[1] / 1000) * 5  # Scale from +/-1000 to +/-5
+            
+            # Get the current point in the circle
+            base_lon, base_lat = self.circle_track[self.current_track_index]
+            
+            # Add jitter
+            jittered_lon = base_lon + lon_error
+            jittered_lat = base_lat + lat_error
+            
+            # Add the point to the map
+            self.ui.tracker_widget.add_point(jittered_lon, jittered_lat)
+            
+            # Move to the next point in the circle
+            self.current_track_index = (self.current_track_index + 1) % len(self.circle_track)
+            self.array_fifo_watcher.stats.painted(values)
         
-    def handle_rate_data(self, data):
-        try:
-            value = float(data)
-            # Optionally, you could use the current timestamp for x, but the widget uses a fixed x axis
-            current_time = time()
-            self.rate_plot_widget.update_plot(current_time, value)
-            print(f"Rate data received: {value}")
-        except Exception as e:
-            print(f"Error handling rate data: {e}")
-            pass
-
-    def handle_rate_data1(self, data):
-        try:
-            value = float(data)
-            current_time = time()
-            self.data1 = np.roll(self.data1, -1)
-            self.times1 = np.roll(self.times1, -1)
-            self.times1[-1] = current_time
-            self.data1[-1] = data
-            self.curve.setData(x=self.times1, y=self.data1)
+    def handle_rate_data(self, value):
+        # Optionally, you could use the current timestamp for x, but the widget uses a fixed x axis
+        current_time = time()
+        self.rate_plot_widget.update_plot(current_time, value)
+
+    def handle_rate_data1(self, value):
+        self.rate1.append(time(), value)
+        self.rate_render.mark_dirty()
+
+    def render_rate(self):
+        last = self.rate1.last()
+        if last is None:
+            return
+        current_time, value = last
+        view = self.ui.default_plot_widget.getViewBox()
+        if self.rate_follow:
+            t_min, t_max = current_time-20, current_time
+        elif view.autoRangeEnabled()[0]:
+            t_min, t_max = -np.inf, np.inf
+        else:
+            t_min, t_max = view.viewRange()[0]
+        times, values = self.rate1.visible(t_min, t_max, 2 * max(int(view.width()), 1))
+        self.curve.setData(x=times, y=values)
+        if self.rate_follow:
             self.ui.default_plot_widget.setXRange(current_time-20, current_time)
-            # Update legend to show latest value
-            legend = self.ui.default_plot_widget.legend
-            if legend is not None:
-                # Remove all legend items and re-add with updated label
-                legend.clear()
-                self.curve.setName(f'Raw Rate: {value:.2f}')
-                legend.addItem(self.curve, self.curve.name())
-            print(f"Rate data received: {value}")
-        except Exception as e:
-            print(f"Error handling rate data: {e}")
-            pass
+        # Update the legend label in place to show the latest value
+        legend = self.ui.default_plot_widget.legend
+        if legend is not None:
+            label = legend.getLabel(self.curve)
+            if label is not None:
+                label.setText(f'Raw Rate: {value:.2f}')
+        self.int1_fifo_watcher.stats.painted()
         
+    def on_rate_view_changed(self, *args):
+        self.rate_follow = False
+        self.rate_render.mark_dirty()
+
     def handle_string_fifo_data(self, data):
-        # Append the string data to the log_text_box
-        current = self.ui.log_text_box.toPlainText()
-        if current:
-            self.ui.log_text_box.setPlainText(current + '\n' + data)
-        else:
-            self.ui.log_text_box.setPlainText(data)
-        # Scroll to bottom
-        self.ui.log_text_box.verticalScrollBar().setValue(self.ui.log_text_box.verticalScrollBar().maximum())
+        # Queue the string data for the log_text_box
+        self.log_console.write(data)
 
     def launch_array_viewer(self):
         if self.array_viewer_window is None or not self.array_viewer_window.isVisible():
@@ -254,7 +315,32 @@ class MainWindow(QMainWindow):
             self.array_viewer_window.activateWindow()
         
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = MainWindow()
+    import argparse
+    parser = argparse.ArgumentParser(description="ADAPT main window.")
+    parser.add_argument('--record', metavar='DIR', default=None,
+                        help="Tee all FIFO traffic into a timestamped capture file in DIR")
+    parser.add_argument('--fps', type=float, default=30, help="Target repaint rate of the frame clock")
+    parser.add_argument('--history', metavar='DIR', default=None,
+                        help="Record every scalar channel into an on-disk history in DIR, and plot its past")
+    parser.add_argument('--log-dir', metavar='DIR', default=None,
+                        help="Keep the full string log in rotating files in DIR, for search and scroll-back")
+    parser.add_argument('--log-lines', type=int, default=5000,
+                        help="Lines kept in the log console; older ones are only on disk")
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
+    FrameClock.instance().set_fps(args.fps)
+    recorder = None
+    if args.record:
+        from fifo_recorder import start_recording
+        recorder = start_recording(args.record)
+    history = HistoryStore(args.history, scalar_columns(fifo_config)) if args.history else None
+    log = RotatingLog(args.log_dir, prefix='string') if args.log_dir else None
+    window = MainWindow(history=history, log=log, log_lines=args.log_lines)
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    FifoMultiplexer.shared().stop()  # no more ingest callbacks into the recorder or the history
+    if recorder is not None:
+        recorder.close()
+    if history is not None:
+        history.close()
+    sys.exit(exit_code)
@@ -0,0 +1,80 @@
+"""
+Compare ways of turning one legacy CSV detector frame (hardware/sim_fifo_writer
+format, 2304 pixels x 10 samples = 23,040 values) into a float32 array:
+
+  list comprehension - [float(v) for v in line.split(',')], the old handler
+  np.array(split)    - the str split used by build_detector_frame
+  CsvDecoder         - readinto-style bytes in, one vectorized parse per line
+
+Each is run on the writer's old full-precision text (str(float), ~18
+characters per value) and on the same values printed with float32 round-trip
+precision ('%.9g', what the writer sends now), since digit conversion
+dominates the cost.
+"""
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fifo_protocol import CsvDecoder
+
+N_PIXELS = 12 * 6 * 32
+N_SAMPLES = 10
+
+
+def make_line(fmt=str):
+    # The text sim_fifo_writer.write_data_to_fifo produced before it switched to '%.9g' (for fmt=str).
+    data = [np.random.rand(N_SAMPLES).tolist() for _ in range(N_PIXELS)]
+    return (','.join(fmt(x) for arr in data for x in arr) + '\n').encode()
+
+
+def parse_list(raw):
+    line = raw.decode()
+    return np.array([float(v) for v in line.strip().split(',')], dtype=np.float32)
+
+
+def parse_split(raw):
+    return np.array(raw.decode().strip().split(','), dtype=np.float32)
+
+
+def make_csv_parser():
+    decoder = CsvDecoder(np.float32, (N_PIXELS, N_SAMPLES))
+
+    def parse(raw):
+        # Feed the bytes the way the ingest loop does: into the decoder's own buffer.
+        pos = 0
+        arrays = ()
+        while pos < len(raw):
+            buf = decoder.next_buffer()
+            n = min(len(buf), len(raw) - pos)
+            buf[:n] = raw[pos:pos + n]
+            pos += n
+            arrays = decoder.advance(n) or arrays
+        return arrays[0]
+    return parse
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark CSV frame decoding.")
+    parser.add_argument('--repeat', type=int, default=20, help='Lines decoded per method')
+    args = parser.parse_args()
+
+    methods = [('list comprehension', parse_list), ('np.array(split)', parse_split),
+               ('CsvDecoder', make_csv_parser())]
+    for label, fmt in (('str()', str), ("'%.9g'", lambda x: '%.9g' % x)):
+        raw = make_line(fmt)
+        reference = parse_list(raw)
+        print(f"{label} line: {reference.size} values, {len(raw) / 1e3:.0f} kB")
+        baseline = None
+        for name, parse in methods:
+            result = parse(raw)
+            assert np.array_equal(result.ravel(), reference), name
+            seconds = min(timeit.repeat(lambda: parse(raw), number=1, repeat=args.repeat))
+            baseline = baseline or seconds
+            print(f"{name:>20}: {seconds * 1e3:8.2f} ms/line  ({baseline / seconds:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
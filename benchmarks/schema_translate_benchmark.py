@@ -0,0 +1,92 @@
+"""
+Compare the old per-id translate_colleague_schema loop with
+channel_map.SchemaTranslator on messages in the colleague's per-layer schema:
+
+  full  - every layer, both axes, every hodoscope and WLS id present
+  sparse - a few hits in a few layers, as sent at trigger rate
+
+The old function is reproduced here (with the nested dict map it was given)
+so the benchmark doesn't need Qt to import ADAPT_MW.
+"""
+import os
+import sys
+import json
+import timeit
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from channel_map import ChannelMap, SchemaTranslator
+
+
+def legacy_translate(colleague_data, total_pixels, data_map):
+    intensities = [0] * total_pixels
+    for layer_data in colleague_data.get("layers", []):
+        layer_idx = layer_data.get("layer")
+        axis = layer_data.get("axis")
+        ids = layer_data.get("ids", [])
+        values = layer_data.get("values", [])
+        if layer_idx is None or axis is None or layer_idx not in data_map:
+            continue
+        rotated = 0 if axis == 'x' else 1
+        if rotated not in data_map[layer_idx]:
+            continue
+        view_data = data_map[layer_idx][rotated]
+        hodo_pixels = view_data.get('hodo_front', [])
+        wls_pixels = view_data.get('wls_front', [])
+        if rotated == 0 and wls_pixels and isinstance(wls_pixels[0], list):
+            wls_pixels = wls_pixels[0]
+        for rel_id, value in zip(ids, values):
+            if rel_id < len(hodo_pixels):
+                intensities[hodo_pixels[rel_id]] = value
+            else:
+                wls_rel_id = rel_id - len(hodo_pixels)
+                if wls_rel_id < len(wls_pixels):
+                    intensities[wls_pixels[wls_rel_id]] = value
+    return intensities
+
+
+def make_message(cmap, rng, hits_per_layer=None, layers=None):
+    message = {"layers": []}
+    for layer in (range(cmap.num_layers) if layers is None else layers):
+        for axis, rotated in SchemaTranslator.AXES.items():
+            n_ids = int((cmap.axis_lut[layer, rotated] >= 0).sum())
+            ids = np.arange(n_ids) if hits_per_layer is None else rng.choice(n_ids, hits_per_layer, replace=False)
+            message["layers"].append({"layer": layer, "axis": axis, "ids": ids.tolist(),
+                                      "values": rng.random(len(ids)).tolist()})
+    return message
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark colleague-schema translation.")
+    parser.add_argument('--repeat', type=int, default=200, help='Messages translated per method')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'sensor_config.json')) as f:
+        cmap = ChannelMap(json.load(f))
+    data_map = cmap.data_map()
+    translator = SchemaTranslator(cmap)
+    out = np.empty(cmap.total_pixels, dtype=np.float32)  # the caller's frame, reused
+    rng = np.random.default_rng(0)
+    sparse_layers = range(0, cmap.num_layers, 2)
+    messages = [('full occupancy', make_message(cmap, rng)),
+                (f'sparse ({len(sparse_layers)} layers x 4 hits)',
+                 make_message(cmap, rng, hits_per_layer=4, layers=sparse_layers))]
+
+    for label, message in messages:
+        n_hits = sum(len(layer["ids"]) for layer in message["layers"])
+        # The views take a float32 array, so the legacy list is timed with its conversion.
+        legacy = lambda: np.asarray(legacy_translate(message, cmap.total_pixels, data_map), dtype=np.float32)
+        assert np.array_equal(translator.translate(message), legacy()), label
+        print(f"{label}: {n_hits} hits in {len(message['layers'])} layer entries")
+        baseline = None
+        for name, translate in (('legacy loop', legacy),
+                                ('SchemaTranslator', lambda: translator.translate(message, out=out))):
+            seconds = min(timeit.repeat(translate, number=1, repeat=args.repeat))
+            baseline = baseline or seconds
+            print(f"{name:>20}: {seconds * 1e6:8.1f} us/message  ({baseline / seconds:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+import json
+import hashlib
+import numpy as np
+
+COMPONENTS = ('hodo_front', 'hodo_side', 'wls_front', 'wls_side', 'csi', 'tail')
+NUM_CSI_PIXELS = 2
+
+
+def _odd_even(length, offset):
+    """Indices offset..offset+length-1 with the odd ones first, then the even ones."""
+    numbers = np.arange(offset, offset + length, dtype=np.int32)
+    return np.concatenate((numbers[numbers % 2 == 1], numbers[numbers % 2 == 0]))
+
+
+def _interleave_rows(num_cols, offset):
+    """Two rows of num_cols pixels in column order: top0, bottom0, top1, bottom1, ..."""
+    rows = np.arange(offset, offset + 2 * num_cols, dtype=np.int32).reshape(2, num_cols)
+    return rows.T.ravel()
+
+
+class ChannelMap:
+    """
+    Mapping between absolute pixel (channel) indices and the detector
+    components drawn by the layer views, built once per sensor_config.
+
+    indices[(layer, rotated, component)] is a contiguous read-only int32
+    gather array of absolute pixel indices in drawing order, so a view can
+    pull its values with intensities[indices]. The dense reverse tables
+    component_of / position_of[rotated, pixel] give the component code
+    (index into COMPONENTS, -1 if the pixel isn't drawn in that orientation)
+    and the position within that component; layer_of[pixel] gives the layer.
+    display_order reorders a frame in hardware channel order into display
+    order with a single np.take (see ADAPT_MW.build_detector_frame).
+
+    axis_lut[layer, rotated, id] maps the relative ids of the per-layer
+    readout schema (hodoscope front pixels, then WLS front fibers of that
+    orientation) to absolute pixel indices, padded with -1.
+    """
+    _cache = {}
+
+    @classmethod
+    def for_config(cls, sensor_config):
+        """Shared map for this sensor_config content (keyed by its hash)."""
+        key = hashlib.sha1(json.dumps(sensor_config, sort_keys=True).encode('utf-8')).hexdigest()
+        channel_map = cls._cache.get(key)
+        if channel_map is None:
+            channel_map = cls._cache[key] = cls(sensor_config)
+        return channel_map
+
+    def __init__(self, sensor_config):
+        self.num_layers = sensor_config["icc"]["num_layers"]
+        hodo_cols = sensor_config["hodo_front"]["num_cols"]
+        hodo = hodo_cols * sensor_config["hodo_front"]["num_rows"]
+        wls = sensor_config["wls_front"]["num_cols"]
+        tail = sensor_config["tail_counters"]["num_cols"] * sensor_config["tail_counters"]["num_rows"]
+        self.pixels_per_layer = 2 * hodo + 2 * wls + NUM_CSI_PIXELS + tail
+        self.total_pixels = self.num_layers * self.pixels_per_layer
+
+        self.indices = {}
+        display_order = []
+        for layer in range(self.num_layers):
+            hodo_offset1 = layer * self.pixels_per_layer
+            hodo_offset2 = hodo_offset1 + hodo
+            wls_offset1 = hodo_offset2 + hodo
+            csi_offset = wls_offset1 + wls
+            wls_offset2 = csi_offset + NUM_CSI_PIXELS
+            tail_offset = wls_offset2 + wls
+            ending_offset = tail_offset + tail
+            tail_range = np.arange(tail_offset, ending_offset, dtype=np.int32)
+            views = {
+                0: {
+                    'hodo_front': _odd_even(hodo, hodo_offset1),
+                    'hodo_side': _odd_even(hodo, hodo_offset2)[-2:],  # TODO: check if flipped and correct
+                    'wls_side': np.array([csi_offset - 1], dtype=np.int32),
+                    'csi': np.array([csi_offset], dtype=np.int32),  # first CsI pixel for the non-rotated view
+                    'wls_front': np.arange(wls_offset2, tail_offset, dtype=np.int32),
+                    'tail': tail_range,
+                },
+                1: {
+                    'hodo_side': _odd_even(hodo, hodo_offset1)[-2:],
+                    'hodo_front': _odd_even(hodo, hodo_offset2),
+                    'wls_front': np.arange(wls_offset1, csi_offset, dtype=np.int32),
+                    'csi': np.array([csi_offset + 1], dtype=np.int32),  # second CsI pixel when rotated
+                    'wls_side': np.array([wls_offset2], dtype=np.int32),
+                    'tail': tail_range,
+                },
+            }
+            for rotated, components in views.items():
+                for component, gather in components.items():
+                    gather = np.ascontiguousarray(gather, dtype=np.int32)
+                    gather.setflags(write=False)
+                    self.indices[(layer, rotated, component)] = gather
+            display_order += [_interleave_rows(hodo_cols, hodo_offset1), _interleave_rows(hodo_cols, hodo_offset2),
+                              np.arange(wls_offset1, ending_offset, dtype=np.int32)]
+        self.display_order = np.concatenate(display_order)
+        self.display_order.setflags(write=False)
+
+        axis_luts = {key[:2]: np.concatenate((self.indices[key[:2] + ('hodo_front',)],
+                                              self.indices[key[:2] + ('wls_front',)]))
+                     for key in self.indices}
+        self.axis_lut = np.full((self.num_layers, 2, max(len(lut) for lut in axis_luts.values())), -1,
+                                dtype=np.int32)
+        for (layer, rotated), lut in axis_luts.items():
+            self.axis_lut[layer, rotated, :len(lut)] = lut
+        self.axis_lut.setflags(write=False)
+
+        self.layer_of = (np.arange(self.total_pixels) // self.pixels_per_layer).astype(np.int32)
+        self.component_of = np.full((2, self.total_pixels), -1, dtype=np.int8)
+        self.position_of = np.full((2, self.total_pixels), -1, dtype=np.int32)
+        for (layer, rotated, component), gather in self.indices.items():
+            self.component_of[rotated, gather] = COMPONENTS.index(component)
+            self.position_of[rotated, gather] = np.arange(len(gather), dtype=np.int32)
+
+    def gather(self, layer, rotated, component):
+        return self.indices[(layer, int(rotated), component)]
+
+    def lookup(self, pixel, rotated):
+        """(layer, rotated, component, position) of an absolute pixel index, or None."""
+        code = self.component_of[int(rotated), pixel]
+        if code < 0:
+            return None
+        return int(self.layer_of[pixel]), int(rotated), COMPONENTS[code], int(self.position_of[int(rotated), pixel])
+
+    def data_map(self):
+        """The map as nested dicts of lists: {layer: {rotated: {component: [pixel, ...]}}}."""
+        data_map = {}
+        for (layer, rotated, component), gather in self.indices.items():
+            data_map.setdefault(layer, {}).setdefault(rotated, {})[component] = gather.tolist()
+        return data_map
+
+
+class SchemaTranslator:
+    """
+    Scatters readout messages in the per-layer schema
+        {"layers": [{"layer": 0, "axis": "x", "ids": [...], "values": [...]}, ...]}
+    into a flat float32 intensity frame. 'x' is the non-rotated view and 'y'
+    the rotated one; ids count hodoscope pixels first, then WLS fibers.
+    Each layer entry is converted straight into preallocated id/value/offset
+    buffers (the offset of every (layer, axis) row of ChannelMap.axis_lut is
+    built once), and the whole message is then resolved with one gather and
+    written with one fancy-index assignment into `out` or a frame that is
+    reused between calls; ids outside the layer's range are ignored.
+    """
+    AXES = {'x': 0, 'y': 1}
+
+    def __init__(self, channel_map):
+        self.channel_map = channel_map
+        self.lut = channel_map.axis_lut
+        self.frame = np.zeros(channel_map.total_pixels, dtype=np.float32)
+        width = self.lut.shape[2]
+        # axis_lut flattened, plus a final -1 slot that out-of-range ids are pointed at.
+        self._flat_lut = np.append(self.lut.ravel(), -1).astype(np.intp)
+        self._row_offsets = {(layer, axis): (layer * 2 + rotated) * width
+                             for layer in range(self.lut.shape[0]) for axis, rotated in self.AXES.items()}
+        self._reserve(self.lut.shape[0] * 2 * width)
+
+    def _reserve(self, n):
+        self._ids = np.empty(n, dtype=np.intp)
+        self._offsets = np.empty(n, dtype=np.intp)
+        self._values = np.empty(n, dtype=np.float32)
+
+    def translate(self, message, out=None, clear=True):
+        """Frame for one message. Without `out` the translator's own buffer is returned (and reused)."""
+        n_hits = 0
+        for layer_data in message.get("layers", ()):
+            offset = self._row_offsets.get((layer_data.get("layer"), layer_data.get("axis")))
+            if offset is None:
+                continue
+            ids = layer_data.get("ids", ())
+            values = layer_data.get("values", ())
+            n = min(len(ids), len(values))
+            end = n_hits + n
+            if end > len(self._ids):
+                kept = (self._ids[:n_hits].copy(), self._offsets[:n_hits].copy(), self._values[:n_hits].copy())
+                self._reserve(2 * end)
+                self._ids[:n_hits], self._offsets[:n_hits], self._values[:n_hits] = kept
+            self._ids[n_hits:end] = ids if len(ids) == n else ids[:n]
+            self._values[n_hits:end] = values if len(values) == n else values[:n]
+            self._offsets[n_hits:end] = offset
+            n_hits = end
+        frame = self._target(out, clear)
+        if not n_hits:
+            return frame
+        ids, values = self._ids[:n_hits], self._values[:n_hits]
+        slots = np.add(self._offsets[:n_hits], ids, out=self._offsets[:n_hits])
+        outside = (ids < 0) | (ids >= self.lut.shape[2])
+        if outside.any():
+            slots[outside] = len(self._flat_lut) - 1
+        pixels = self._flat_lut[slots]
+        valid = pixels >= 0
+        if valid.all():
+            frame[pixels] = values
+        else:
+            frame[pixels[valid]] = values[valid]
+        return frame
+
+    def scatter(self, layers, rotated, ids, values, out=None, clear=True):
+        """Batch form: parallel arrays with one entry per hit (rotated: 0 = 'x', 1 = 'y')."""
+        frame = self._target(out, clear)
+        ids = np.asarray(ids, dtype=np.intp)
+        in_range = (ids >= 0) & (ids < self.lut.shape[2])
+        pixels = np.full(ids.shape, -1, dtype=np.intp)
+        pixels[in_range] = self.lut[np.asarray(layers)[in_range], np.asarray(rotated)[in_range], ids[in_range]]
+        valid = pixels >= 0
+        frame[pixels[valid]] = np.asarray(values, dtype=np.float32)[valid]
+        return frame
+
+    def _target(self, out, clear):
+        frame = self.frame if out is None else out
+        if clear:
+            frame.fill(0)
+        return frame
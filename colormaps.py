@@ -0,0 +1,102 @@
+import numpy as np
+
+N_BINS = 256
+SCALE_MODES = ('fixed', 'frame', 'percentile')
+
+
+def _blue_red(n_bins):
+    # The original layer-view ramp: blue for low, red for high.
+    ramp = np.linspace(0, 255, n_bins).astype(np.uint8)
+    return np.stack((ramp, np.zeros(n_bins, np.uint8), 255 - ramp, np.full(n_bins, 255, np.uint8)), axis=1)
+
+
+class ColorLUT:
+    """
+    Lookup tables for one colormap with n_bins colors, built once and shared.
+
+    rgba is an (n_bins, 4) uint8 table (for images), argb the same colors
+    packed as 0xAARRGGBB uint32 (for QColor.fromRgba) and brushes a list of
+    ready-made QBrush objects (for items and ScatterPlotItem.setBrush), so a
+    color bin vector turns into colors with one index operation. Get tables
+    with ColorLUT.get(name): 'blue-red' is the detector views' ramp, anything
+    else is looked up with pg.colormap.get (e.g. 'viridis', 'cividis').
+    """
+    _cache = {}
+
+    @classmethod
+    def get(cls, name='blue-red', n_bins=N_BINS):
+        lut = cls._cache.get((name, n_bins))
+        if lut is None:
+            if name == 'blue-red':
+                rgba = _blue_red(n_bins)
+            else:
+                import pyqtgraph as pg
+                rgba = pg.colormap.get(name).getLookupTable(0, 1, nPts=n_bins, alpha=True)
+            lut = cls._cache[(name, n_bins)] = cls(name, rgba)
+        return lut
+
+    def __init__(self, name, rgba):
+        self.name = name
+        self.rgba = np.ascontiguousarray(rgba, dtype=np.uint8)
+        self.rgba.setflags(write=False)
+        r, g, b, a = (self.rgba[:, i].astype(np.uint32) for i in range(4))
+        self.argb = (a << 24) | (r << 16) | (g << 8) | b
+        self.argb.setflags(write=False)
+        self._brushes = None
+
+    def __len__(self):
+        return len(self.rgba)
+
+    @property
+    def brushes(self):
+        # Built on first use, on the GUI thread, so the tables can be made without Qt.
+        if self._brushes is None:
+            from pyqtgraph.Qt import QtGui
+            self._brushes = [QtGui.QBrush(QtGui.QColor.fromRgba(int(argb))) for argb in self.argb]
+        return self._brushes
+
+
+class ColorScale:
+    """
+    Maps a whole intensity vector to color bins in one NumPy expression.
+
+    mode 'fixed' uses vmin/vmax as given, 'frame' the min/max of each frame
+    (what the layer views always did) and 'percentile' the given low/high
+    percentiles of each frame averaged over the last `window` frames, so a
+    single hot channel or one noisy frame doesn't wash out the display.
+    vmin/vmax hold the limits used for the latest call.
+    """
+
+    def __init__(self, mode='frame', vmin=0.0, vmax=1.0, n_bins=N_BINS, percentiles=(1, 99), window=50):
+        if mode not in SCALE_MODES:
+            raise ValueError(f"Unknown color scale mode {mode!r}; expected one of {SCALE_MODES}")
+        self.mode = mode
+        self.vmin = float(vmin)
+        self.vmax = float(vmax)
+        self.n_bins = n_bins
+        self.percentiles = percentiles
+        self._history = np.zeros((max(1, window), 2))
+        self._filled = 0
+        self._next = 0
+
+    def limits(self, intensities):
+        """Update and return (vmin, vmax) for this frame."""
+        if self.mode == 'frame' and len(intensities):
+            self.vmin, self.vmax = float(intensities.min()), float(intensities.max())
+        elif self.mode == 'percentile' and len(intensities):
+            self._history[self._next] = np.percentile(intensities, self.percentiles)
+            self._next = (self._next + 1) % len(self._history)
+            self._filled = min(self._filled + 1, len(self._history))
+            self.vmin, self.vmax = self._history[:self._filled].mean(axis=0)
+        return self.vmin, self.vmax
+
+    def bins(self, intensities, out=None):
+        """Color bin (0..n_bins-1) of every entry of `intensities`."""
+        intensities = np.asarray(intensities, dtype=np.float32)
+        vmin, vmax = self.limits(intensities)
+        levels = (intensities - vmin) * ((self.n_bins - 1) / (vmax - vmin + 1e-6))
+        np.clip(levels, 0, self.n_bins - 1, out=levels)
+        if out is None:
+            return levels.astype(np.intp)
+        out[...] = levels
+        return out
@@ -2,7 +2,7 @@ import sys
 import math
 from PyQt6.QtWidgets import QApplication, QLabel, QWidget, QVBoxLayout, QMainWindow, QHBoxLayout
 from PyQt6.QtGui import QPixmap, QTransform, QPainter
-from PyQt6.QtCore import QTimer, Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal
 
 import matplotlib
 matplotlib.use("QtAgg")
@@ -12,24 +12,26 @@ import cartopy.crs as ccrs
 import cartopy.feature as cfeature
 import pyqtgraph as pg
 import numpy as np
-import time
+from helper_classes import FrameClock
+from rate_history import RateHistory
 
 # McMurdo Station coordinates
 MC_MURDO_LAT = -77.8455
 MC_MURDO_LON = 166.6698
 
 class RotatingArrowWidget(QWidget):
-    def __init__(self, image_path="arrow.png", interval_ms=10, parent=None):
+    def __init__(self, image_path="arrow.png", degrees_per_second=100, parent=None):
         super().__init__(parent)
         self.pixmap = QPixmap(image_path)
         self.angle = 0
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.rotate_arrow)
-        self.timer.start(interval_ms)
+        self.degrees_per_second = degrees_per_second
+        # Animated from the shared frame clock instead of a private timer.
+        self.render_target = FrameClock.instance().register(self.rotate_arrow, continuous=True, name='arrow')
+        self.destroyed.connect(lambda: FrameClock.instance().unregister(self.render_target))
         self.setMinimumSize(32, 32)  # Set a reasonable minimum size
 
-    def rotate_arrow(self):
-        self.angle = (self.angle + 1) % 360
+    def rotate_arrow(self, dt):
+        self.angle = (self.angle + self.degrees_per_second * dt) % 360
         self.update()
 
     def paintEvent(self, event):
@@ -119,29 +121,35 @@ class CartopyCanvas(FigureCanvas):
 
 
 class ScrollingRatePlotWidget(QWidget):
-    def __init__(self, array_size=100, parent=None):
+    def __init__(self, array_size=100, parent=None, store=None, column=None):
         super().__init__(parent)
         self.array_size = array_size
-        self.data = np.zeros(self.array_size)
-        now = time.time()
-        now_sub_one = now - 1
-        self.times = np.linspace(now_sub_one, now, self.array_size)
+        # With a HistoryStore the plot starts with the column's whole recorded past.
+        self.history = RateHistory(recent=self.array_size, store=store, column=column)
         self.plot_widget = pg.PlotWidget(axisItems = {'bottom': pg.DateAxisItem()})
         self.plot_widget.setLabel('left', 'Rate')
         self.plot_widget.setLabel('bottom', 'Time')
         self.plot_widget.showGrid(x=True, y=True)
-        self.curve = self.plot_widget.plot(self.times, self.data, pen='y')
+        self.curve = self.plot_widget.plot(pen='y')
         layout = QVBoxLayout(self)
         layout.addWidget(self.plot_widget)
         self.setLayout(layout)
+        self.render_target = FrameClock.instance().register(self.render, name='rate plot')
+        self.destroyed.connect(lambda: FrameClock.instance().unregister(self.render_target))
+        # Zooming or panning asks the history for a different range and resolution.
+        self.plot_widget.getViewBox().sigXRangeChanged.connect(self.render_target.mark_dirty)
 
-    def update_plot(self, time, value):
+    def update_plot(self, timestamp, value):
         """Add a new value to the plot, scrolling the data."""
-        self.data = np.roll(self.data, -1)
-        self.times = np.roll(self.times, -1)
-        self.times[-1] = time
-        self.data[-1] = value
-        print(self.times, self.data)
-        self.curve.setData(x=self.times, y=self.data)
-        print("self.curve is type:", type(self.curve))
-        print(f"Updated plot with value: {value}")
+        self.history.append(timestamp, value)
+        self.render_target.mark_dirty()
+
+    def render(self):
+        """Frame clock callback: draw the visible part of the history at about 2 points per pixel."""
+        view = self.plot_widget.getViewBox()
+        if view.autoRangeEnabled()[0]:
+            t_min, t_max = -np.inf, np.inf
+        else:
+            t_min, t_max = view.viewRange()[0]
+        times, values = self.history.visible(t_min, t_max, 2 * max(int(view.width()), 1))
+        self.curve.setData(x=times, y=values)
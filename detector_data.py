@@ -0,0 +1,74 @@
+import numpy as np
+from colormaps import ColorLUT, ColorScale
+
+
+class DetectorDataModel:
+    """
+    The one copy of the current detector frame that every view draws from.
+
+    Owns the per-channel intensity vector, the waveform matrix (one
+    contiguous float32 row per channel, refilled in place each frame) and its
+    time axis, plus the color bin of every channel from the
+    shared ColorScale and the ColorLUT all views draw with. Views subscribe
+    with the channel indices they draw and a callback; update() compares the
+    new color bins with the previous ones and calls back only the subscribers
+    that have a changed channel in their slice. A rescale changes the bins
+    everywhere, so it reaches every view.
+    """
+
+    def __init__(self, n_channels, n_samples=100, lut=None, scale=None):
+        self.n_channels = n_channels
+        self.t = np.linspace(0, 2, n_samples)
+        self.waveforms = np.zeros((n_channels, n_samples), dtype=np.float32)
+        self.intensities = np.zeros(n_channels, dtype=np.float32)
+        self.lut = lut if lut is not None else ColorLUT.get()
+        self.scale = scale if scale is not None else ColorScale(n_bins=len(self.lut))
+        self.bins = np.zeros(n_channels, dtype=np.intp)
+        self.images = {}  # optional per-view images made off the GUI thread (raster mode), by key
+        self.frames = 0
+        self.changed_fraction = 0.0  # share of channels whose color bin changed in the last update
+        self._subscribers = []
+
+    def subscribe(self, channels, callback):
+        """Call callback(model) whenever one of `channels` changes; it is called once right away."""
+        channels = np.asarray(channels, dtype=np.intp)
+        self._subscribers.append((channels, callback))
+        callback(self)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(channels, cb) for channels, cb in self._subscribers if cb is not callback]
+
+    def time_series(self, channel):
+        """(t, waveform) of one channel; the waveform is a row view of the shared matrix, valid until the next update."""
+        return self.t, self.waveforms[channel]
+
+    def update(self, t, waveforms, intensities, images=None, bins=None):
+        """
+        Take a new frame and notify the subscribers whose channels changed. Returns how many were.
+        `bins` are the frame's color bins if they were already computed (by the frame worker, with
+        this model's scale); otherwise the scale is applied here.
+        """
+        intensities = np.asarray(intensities, dtype=np.float32)
+        if bins is None:
+            bins = self.scale.bins(intensities)
+        n = min(len(intensities), self.n_channels)
+        changed = np.zeros(self.n_channels, dtype=bool)
+        changed[:n] = bins[:n] != self.bins[:n]
+        self.changed_fraction = float(changed.mean()) if self.n_channels else 0.0
+        self.intensities[:n] = intensities[:n]
+        self.bins[:n] = bins[:n]
+        self.t = t
+        # Copy into the model's own matrix; it is only reallocated if the frame shape changes.
+        waveforms = np.asarray(waveforms)
+        if self.waveforms.shape != waveforms.shape:
+            self.waveforms = np.empty(waveforms.shape, dtype=np.float32)
+        np.copyto(self.waveforms, waveforms, casting='unsafe')
+        self.images = images or {}
+        self.frames += 1
+        notified = 0
+        for channels, callback in list(self._subscribers):
+            if changed[channels].any():
+                callback(self)
+                notified += 1
+        return notified
@@ -1,18 +1,13 @@
 import os
 import sys
 import time
-import threading
 import json
+from fifo_ingest import FifoChannel, FifoMultiplexer
 
-def read_fifo(path, label):
-    while True:
-        try:
-            with open(path, 'r') as f:
-                for line in f:
-                    print(f"[{label}] {line.strip()}")
-        except Exception as e:
-            print(f"[{label}] Error: {e}")
-            time.sleep(1)
+def echo_callback(label):
+    def echo(message):
+        print(f"[{label}] {message}")
+    return echo
 
 def main():
     import argparse
@@ -34,21 +29,18 @@ def main():
 
     fifo_paths = [os.path.join(base_path, name) for name in fifo_names]
 
-    print("Waiting for FIFOs to exist...")
-    while not all(os.path.exists(p) for p in fifo_paths):
-        time.sleep(0.5)
-
-    threads = []
+    # All FIFOs are serviced from one non-blocking loop; ones that don't exist
+    # yet are picked up as soon as they appear.
+    multiplexer = FifoMultiplexer()
     for path, label in zip(fifo_paths, fifo_names):
-        t = threading.Thread(target=read_fifo, args=(path, label), daemon=True)
-        t.start()
-        threads.append(t)
+        multiplexer.add(FifoChannel(path, echo_callback(label), name=label))
 
     print("Watching FIFOs. Press Ctrl+C to exit.")
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
+        multiplexer.stop()
         print("Exiting.")
         sys.exit(0)
 
@@ -0,0 +1,246 @@
+import os
+import selectors
+import threading
+import time
+from fifo_protocol import FrameDecoder, LineDecoder
+from fifo_stats import ChannelStats
+
+# Upper bound on reads serviced per channel per wakeup, so one busy FIFO can't
+# starve the others sharing the loop.
+MAX_READS_PER_WAKEUP = 16
+# Stream errors of one channel are printed at most once per this many seconds.
+ERROR_REPORT_INTERVAL = 10.0
+
+
+class FifoChannel:
+    """
+    One FIFO serviced by a FifoMultiplexer. Decoded messages are handed to
+    `callback` on the multiplexer thread; the callback must not block.
+    With a `schema` (see fifo_schema) messages are converted to typed values
+    before the callback; ones that don't match are counted as parse failures.
+    Ingest telemetry for the channel is kept in `stats` (see fifo_stats).
+    """
+
+    def __init__(self, fifo_path, callback, protocol='line', poll_interval=0.1, buffer_count=3, name=None,
+                 schema=None):
+        if protocol not in ('line', 'binary'):
+            raise ValueError(f"Unknown FIFO protocol: {protocol}")
+        self.fifo_path = fifo_path
+        self.callback = callback
+        self.protocol = protocol
+        self.poll_interval = poll_interval  # retry interval while the FIFO does not exist yet
+        self.buffer_count = buffer_count
+        self.name = name if name is not None else fifo_path
+        self.schema = schema
+        self.stats = ChannelStats()
+        self.decoder = self.make_decoder()
+        self._next_report = 0.0
+        self._unreported = 0
+
+    def make_decoder(self):
+        if self.schema is not None:
+            decoder = self.schema.make_decoder(on_error=self.stats.parse_failed)
+            if decoder is not None:
+                return decoder
+        if self.protocol == 'binary':
+            return FrameDecoder(self.buffer_count, on_error=self.frame_error)
+        return LineDecoder()
+
+    def frame_error(self, error):
+        # The decoder lost sync and is scanning for the next frame; count it, and print
+        # only now and then so a writer sending garbage can't flood the console.
+        self.stats.frame_error(error)
+        self._unreported += 1
+        now = time.monotonic()
+        if now >= self._next_report:
+            print(f"Bad frame on {self.name}: {error} ({self._unreported} since the last report, "
+                  f"{self.decoder.skipped_bytes} bytes skipped so far)")
+            self._unreported = 0
+            self._next_report = now + ERROR_REPORT_INTERVAL
+
+
+class FifoMultiplexer:
+    """
+    Services any number of FIFOs from a single thread. Every FIFO is opened with
+    O_NONBLOCK and watched through one selectors (epoll on Linux) loop. When a
+    writer closes its end, the FIFO is reopened immediately, so no data is lost
+    waiting out a retry sleep. FIFOs that don't exist yet are retried every
+    `poll_interval` of their channel.
+
+    If `recorder` is set (see fifo_recorder.FifoRecorder), every chunk of raw
+    bytes read is also handed to recorder.record() before decoding.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """Process-wide multiplexer used by FifoWatcher unless one is given."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending = []      # (channel, add?) changes requested from other threads
+        self._open = {}         # channel -> (fd, inode)
+        self._missing = {}      # channel -> next retry time
+        self._next_inode_check = 0.0
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._running = False
+        self._thread = None
+        self.recorder = None
+
+    def add(self, channel):
+        with self._lock:
+            self._pending.append((channel, True))
+            if not self._running:
+                self._running = True
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def remove(self, channel):
+        with self._lock:
+            self._pending.append((channel, False))
+        self._wake()
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+        self._wake()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass  # a wakeup is already pending
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._running:
+                    break
+                pending, self._pending = self._pending, []
+            for channel, add in pending:
+                if add:
+                    self._open_channel(channel)
+                else:
+                    self._close_channel(channel)
+                    self._missing.pop(channel, None)
+            timeout = self._retry_missing()
+            for key, _ in self._selector.select(timeout):
+                if key.data is None:
+                    self._drain_wakeups()
+                elif self._open.get(key.data, (None,))[0] == key.fd:
+                    self._service(key.data)
+        for channel in list(self._open):
+            self._close_channel(channel)
+        self._missing.clear()
+
+    def _drain_wakeups(self):
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _retry_missing(self):
+        """Open FIFOs that have appeared and catch FIFOs recreated under us; return the select timeout."""
+        now = time.monotonic()
+        for channel, retry_at in list(self._missing.items()):
+            if now >= retry_at:
+                del self._missing[channel]
+                self._open_channel(channel)
+        intervals = [channel.poll_interval for channel in self._open]
+        if intervals and now >= self._next_inode_check:
+            self._next_inode_check = now + min(intervals)
+            for channel, (fd, inode) in list(self._open.items()):
+                try:
+                    if os.stat(channel.fifo_path).st_ino != inode:
+                        self._reopen(channel)
+                except FileNotFoundError:
+                    pass  # keep draining the old FIFO until its writer goes away
+        if self._missing:
+            return max(0.0, min(self._missing.values()) - now)
+        return min(intervals) if intervals else None
+
+    def _open_fd(self, channel):
+        try:
+            fd = os.open(channel.fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+        except OSError:
+            self._missing[channel] = time.monotonic() + channel.poll_interval
+            return None
+        return fd, os.fstat(fd).st_ino
+
+    def _open_channel(self, channel):
+        if channel in self._open:
+            return
+        opened = self._open_fd(channel)
+        if opened is not None:
+            self._open[channel] = opened
+            self._selector.register(opened[0], selectors.EVENT_READ, channel)
+
+    def _close_channel(self, channel):
+        entry = self._open.pop(channel, None)
+        if entry is not None:
+            self._selector.unregister(entry[0])
+            os.close(entry[0])
+        channel.decoder.reset()
+
+    def _reopen(self, channel):
+        # Open the new descriptor before closing the old one, so the FIFO never
+        # has zero readers in between (that would discard a new writer's data).
+        opened = self._open_fd(channel)
+        self._close_channel(channel)
+        channel.stats.reopens += 1
+        if opened is not None:
+            self._open[channel] = opened
+            self._selector.register(opened[0], selectors.EVENT_READ, channel)
+
+    def _service(self, channel):
+        fd = self._open[channel][0]
+        decoder = channel.decoder
+        for _ in range(MAX_READS_PER_WAKEUP):
+            buf = decoder.next_buffer()
+            try:
+                n = os.readv(fd, [buf])
+            except BlockingIOError:
+                return
+            except OSError:
+                self._reopen(channel)
+                return
+            # Decoders may reuse their buffer, so take the raw bytes first.
+            recorder = self.recorder
+            raw = bytes(buf[:n]) if recorder is not None else None
+            if n == 0:
+                # Writer closed its end: reconnect right away for the next writer.
+                messages = decoder.flush()
+                self._reopen(channel)
+            else:
+                # A binary decoder that finds garbage resyncs on the next frame by itself.
+                messages = decoder.advance(n)
+            if recorder is not None and n:
+                recorder.record(channel, raw, len(messages))
+            channel.stats.received(n, messages)
+            for message in messages:
+                if channel.schema is not None:
+                    try:
+                        message = channel.schema.decode(message)
+                    except ValueError:
+                        channel.stats.parse_failed()
+                        continue
+                try:
+                    channel.callback(message)
+                except Exception as e:
+                    print(f"Error delivering data from {channel.name}: {e}")
+            if n == 0:
+                return
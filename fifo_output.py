@@ -0,0 +1,223 @@
+import os
+import stat
+import time
+import errno
+import select
+
+FULL_POLICIES = ('drop', 'block', 'coalesce')
+IOV_BATCH = 512  # stay well below IOV_MAX per writev call
+
+
+def is_fifo(path):
+    try:
+        return stat.S_ISFIFO(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def create_fifos(paths):
+    """
+    mkfifo every path that doesn't exist yet; return the ones created. Existing
+    FIFOs are used as they are (a reader may already have them open), and
+    paths taken by anything else are left alone with a message.
+    """
+    created = []
+    for path in paths:
+        if os.path.exists(path):
+            if not is_fifo(path):
+                print(f"{path} exists and is not a FIFO; its data will be skipped.")
+            continue
+        try:
+            os.mkfifo(path)
+        except FileExistsError:
+            continue  # someone else created it in the meantime
+        created.append(path)
+    return created
+
+
+def remove_fifos(paths):
+    """Remove the FIFOs at `paths` (those create_fifos() returned); anything else there is left alone."""
+    for path in paths:
+        if is_fifo(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class PersistentFifoWriter:
+    """
+    Producer end of a FIFO that keeps one non-blocking descriptor open instead
+    of reopening the FIFO for every message, so a slow or restarting reader
+    never stalls the producer.
+
+    Messages passed to write() are batched and sent with writev once
+    `max_batch_bytes` is reached (immediately if batching is off) or on
+    flush(). Messages are never split across a reconnect: a partially sent
+    message is finished before anything else goes out. When the pipe is full
+    (or no reader is attached) the `policy` decides what happens to messages
+    that could not be sent:
+      'drop'     - discard them
+      'block'    - wait up to `timeout` seconds for room, then discard
+      'coalesce' - keep only the newest one and send it when there is room
+    Discarded messages are counted in `dropped`.
+    """
+
+    def __init__(self, path, policy='drop', timeout=0.1, batching=False, max_batch_bytes=65536,
+                 reconnect_interval=0.5):
+        if policy not in FULL_POLICIES:
+            raise ValueError(f"Unknown full-pipe policy: {policy}")
+        self.path = path
+        self.policy = policy
+        self.timeout = timeout
+        self.batching = batching
+        self.max_batch_bytes = max_batch_bytes
+        self.reconnect_interval = reconnect_interval
+        self.sent = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+        self.reconnects = 0
+        self._fd = None
+        self._next_open = 0.0
+        self._batch = []
+        self._batch_bytes = 0
+        self._pending = None   # unsent tail of a partially written message
+        self._backlog = []     # whole messages held back by the coalesce policy
+
+    @property
+    def connected(self):
+        return self._fd is not None
+
+    def stats(self):
+        return {'sent': self.sent, 'dropped': self.dropped, 'bytes_sent': self.bytes_sent,
+                'reconnects': self.reconnects}
+
+    def write(self, data):
+        """Queue one message (bytes-like); it is sent with the current batch."""
+        view = memoryview(data).cast('B')
+        self._batch.append(view)
+        self._batch_bytes += len(view)
+        if not self.batching or self._batch_bytes >= self.max_batch_bytes:
+            self.flush()
+
+    def flush(self):
+        """Try to send everything queued; apply the full-pipe policy to what doesn't fit."""
+        messages = self._backlog + self._batch
+        self._backlog = []
+        self._batch = []
+        self._batch_bytes = 0
+        deadline = time.monotonic() + self.timeout if self.policy == 'block' else None
+        if not self._ensure_open():
+            self._hold(messages)
+            return
+        if self._pending is not None:
+            self._pending = self._send_tail(self._pending, deadline)
+            if self._pending is not None or self._fd is None:
+                # Still no room for the tail, or the reader went away with it.
+                self._hold(messages)
+                return
+        self._hold(self._send(messages, deadline))
+
+    def drain(self, timeout):
+        """Block for at most `timeout` seconds pushing out any partial/coalesced message."""
+        deadline = time.monotonic() + timeout
+        while (self._pending is not None or self._backlog or self._batch) and self._fd is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            select.select([], [self._fd], [], remaining)
+            self.flush()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _ensure_open(self):
+        if self._fd is not None:
+            return True
+        now = time.monotonic()
+        if now < self._next_open:
+            return False
+        try:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            # ENXIO: nobody has the FIFO open for reading yet.
+            if e.errno not in (errno.ENXIO, errno.ENOENT):
+                raise
+            self._next_open = now + self.reconnect_interval
+            return False
+        self.reconnects += 1
+        return True
+
+    def _disconnect(self):
+        # Reader went away: whatever was half sent is meaningless to the next reader.
+        self.close()
+        self._pending = None
+        self._next_open = 0.0
+
+    def _wait_writable(self, deadline):
+        if deadline is None:
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        _, writable, _ = select.select([], [self._fd], [], remaining)
+        return bool(writable)
+
+    def _send_tail(self, tail, deadline):
+        while tail:
+            try:
+                n = os.write(self._fd, tail)
+            except BlockingIOError:
+                if self._wait_writable(deadline):
+                    continue
+                return tail
+            except BrokenPipeError:
+                self._disconnect()
+                self.dropped += 1
+                return None
+            self.bytes_sent += n
+            tail = tail[n:]
+        self.sent += 1
+        return None
+
+    def _send(self, messages, deadline):
+        """Send whole messages; return the ones not started. A partial one becomes _pending."""
+        i = 0
+        while i < len(messages):
+            chunk = messages[i:i + IOV_BATCH]
+            try:
+                n = os.writev(self._fd, chunk)
+            except BlockingIOError:
+                if self._wait_writable(deadline):
+                    continue
+                return messages[i:]
+            except BrokenPipeError:
+                self._disconnect()
+                return messages[i:]
+            self.bytes_sent += n
+            for message in chunk:
+                if n >= len(message):
+                    n -= len(message)
+                    self.sent += 1
+                    i += 1
+                    continue
+                if n > 0:
+                    # Copy: the caller may reuse its buffer once write() returns.
+                    self._pending = self._send_tail(memoryview(bytes(message[n:])), deadline)
+                    if self._pending is None and self._fd is not None:
+                        i += 1
+                        break
+                    return messages[i + 1:]
+                break
+        return []
+
+    def _hold(self, messages):
+        if not messages:
+            return
+        if self.policy == 'coalesce':
+            self.dropped += len(messages) - 1
+            self._backlog = [memoryview(bytes(messages[-1]))]
+        else:
+            self.dropped += len(messages)
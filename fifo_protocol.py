@@ -0,0 +1,362 @@
+import struct
+import time
+import threading
+import warnings
+from functools import partial
+import numpy as np
+
+# Binary frame layout (little endian), followed immediately by the raw payload:
+#   magic (4s) | seq (uint64) | timestamp (float64, epoch seconds) |
+#   dtype (8s, numpy dtype string e.g. b'<f4') | ndim (uint8) | 3 pad bytes |
+#   shape (4 x uint32, unused dims are 0)
+FRAME_MAGIC = b'ADPT'
+MAX_DIMS = 4
+HEADER = struct.Struct('<4sQd8sB3x4I')
+HEADER_SIZE = HEADER.size
+SEQ_TIME = struct.Struct('<Qd')  # the seq/timestamp fields, right after the magic
+MAX_PAYLOAD_BYTES = 1 << 31  # sanity limit so a corrupt header can't allocate forever
+
+# Text lines may start with '@<send time, epoch seconds> ' so readers can
+# measure latency; the prefix is stripped by LineDecoder.
+LINE_STAMP = '@'
+
+
+class FrameError(ValueError):
+    """Raised when a binary frame header is malformed."""
+
+
+class FrameHeader:
+    """Decoded fixed-size frame header."""
+    __slots__ = ('seq', 'timestamp', 'dtype', 'shape', 'nbytes')
+
+    def __init__(self, seq, timestamp, dtype, shape):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.dtype = dtype
+        self.shape = shape
+        self.nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+
+
+class Frame(np.ndarray):
+    """
+    ndarray view over a received payload, tagged with the sequence number and
+    send timestamp from its header. Behaves exactly like a normal ndarray.
+
+    A frame decoded by FrameDecoder owns its receive buffer until release()
+    hands it back to the decoder for reuse; release() is for the last consumer,
+    once it has copied what it needs, and the frame (and any view of it) must
+    not be used afterwards. Frames that are never released are simply freed.
+    """
+    seq = None
+    timestamp = None
+    _release = None
+
+    def __array_finalize__(self, obj):
+        if obj is not None:
+            self.seq = getattr(obj, 'seq', None)
+            self.timestamp = getattr(obj, 'timestamp', None)
+
+    def release(self):
+        """Give the receive buffer back to its decoder (no-op for other frames or a second call)."""
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+
+class StampedLine(str):
+    """A received text line that carried a send timestamp (see stamp_line)."""
+    timestamp = None
+
+
+def stamp_line(text, timestamp=None):
+    """Prefix a text message with its send time."""
+    return f"{LINE_STAMP}{time.time() if timestamp is None else timestamp:.6f} {text}"
+
+
+def unstamp_line(line):
+    """Strip an optional send-time prefix; stamped lines come back as StampedLine."""
+    if not line.startswith(LINE_STAMP):
+        return line
+    stamp, _, text = line[len(LINE_STAMP):].partition(' ')
+    try:
+        timestamp = float(stamp)
+    except ValueError:
+        return line
+    line = StampedLine(text)
+    line.timestamp = timestamp
+    return line
+
+
+def pack_header(array, seq, timestamp=None):
+    """Build the header bytes for sending `array` as one frame."""
+    if array.ndim > MAX_DIMS:
+        raise FrameError(f"Frames support at most {MAX_DIMS} dimensions, got {array.ndim}")
+    if timestamp is None:
+        timestamp = time.time()
+    shape = tuple(array.shape) + (0,) * (MAX_DIMS - array.ndim)
+    return HEADER.pack(FRAME_MAGIC, seq, timestamp, array.dtype.str.encode('ascii'),
+                       array.ndim, *shape)
+
+
+def encode_frame(array, seq, timestamp=None):
+    """Return header + payload as a single bytes object."""
+    array = np.ascontiguousarray(array)
+    return pack_header(array, seq, timestamp) + array.tobytes()
+
+
+def stamp_header(buf, seq, timestamp=None):
+    """Rewrite seq/timestamp of an already packed header in place (e.g. a pre-built frame)."""
+    SEQ_TIME.pack_into(buf, len(FRAME_MAGIC), seq, time.time() if timestamp is None else timestamp)
+
+
+def decode_header(buf):
+    """Parse a HEADER_SIZE buffer into a FrameHeader."""
+    magic, seq, timestamp, dtype_str, ndim, *shape = HEADER.unpack(buf)
+    if magic != FRAME_MAGIC:
+        raise FrameError(f"Bad frame magic {magic!r}")
+    if ndim > MAX_DIMS:
+        raise FrameError(f"Bad frame ndim {ndim}")
+    try:
+        dtype = np.dtype(dtype_str.rstrip(b'\x00').decode('ascii'))
+    except (TypeError, UnicodeDecodeError) as e:
+        raise FrameError(f"Bad frame dtype {dtype_str!r}") from e
+    header = FrameHeader(seq, timestamp, dtype, tuple(shape[:ndim]))
+    if header.nbytes > MAX_PAYLOAD_BYTES:
+        raise FrameError(f"Frame payload of {header.nbytes} bytes exceeds limit")
+    return header
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for binary frames. The caller asks for the buffer to
+    read into with next_buffer(), fills it (e.g. with readinto), and reports how
+    many bytes arrived with advance(). Each payload is read into a buffer of its
+    own and handed out as a zero-copy Frame view that owns it. A buffer is only
+    reused after the consumer gives it back with Frame.release() (from any
+    thread); up to `buffer_count` released buffers are kept for reuse, and a
+    new one is allocated whenever none is free.
+
+    A malformed header doesn't end the stream: the decoder drops bytes until
+    the next FRAME_MAGIC and carries on from there. Each loss of sync is
+    reported once to `on_error` with the FrameError; dropped bytes are counted
+    in `skipped_bytes`.
+    """
+
+    def __init__(self, buffer_count=3, on_error=None):
+        self._header_buf = bytearray(HEADER_SIZE)
+        self.buffer_count = max(1, buffer_count)
+        self.on_error = on_error
+        self.skipped_bytes = 0
+        self._in_sync = True
+        self._free = []
+        self._free_lock = threading.Lock()
+        self.reset()
+
+    def _take_buffer(self, nbytes):
+        with self._free_lock:
+            for i, buf in enumerate(self._free):
+                if len(buf) >= nbytes:
+                    del self._free[i]
+                    return buf
+        return bytearray(nbytes)
+
+    def _give_back(self, buf):
+        with self._free_lock:
+            if len(self._free) < self.buffer_count:
+                self._free.append(buf)
+
+    def reset(self):
+        """Discard any partially received frame (e.g. after the writer went away)."""
+        self._header = None
+        self._buffer = None
+        self._target = memoryview(self._header_buf)
+        self._filled = 0
+
+    def next_buffer(self):
+        return self._target[self._filled:]
+
+    def flush(self):
+        """Called when the writer goes away; a partial frame can't be used."""
+        self.reset()
+        return ()
+
+    def advance(self, n):
+        """Account for `n` new bytes; return a list of completed Frames (at most one)."""
+        self._filled += n
+        if self._filled < len(self._target):
+            return ()
+        if self._header is None:
+            try:
+                self._header = decode_header(self._header_buf)
+            except FrameError as e:
+                self._resync(e)
+                return ()
+            self._in_sync = True
+            self._buffer = self._take_buffer(self._header.nbytes)
+            self._target = memoryview(self._buffer)[:self._header.nbytes]
+            self._filled = 0
+            if self._header.nbytes:
+                return ()
+        return [self._finish()]
+
+    def _resync(self, error):
+        # Drop header bytes up to the next possible frame start: a later FRAME_MAGIC, or a
+        # tail that could be the beginning of one. The rest of the header is read after it.
+        data = self._header_buf
+        start = data.find(FRAME_MAGIC, 1)
+        if start < 0:
+            start = next((HEADER_SIZE - k for k in range(len(FRAME_MAGIC) - 1, 0, -1)
+                          if data.endswith(FRAME_MAGIC[:k])), HEADER_SIZE)
+        self.skipped_bytes += start
+        data[:HEADER_SIZE - start] = data[start:]
+        self._filled = HEADER_SIZE - start
+        if self._in_sync:
+            self._in_sync = False
+            if self.on_error is not None:
+                self.on_error(error)
+
+    def _finish(self):
+        header = self._header
+        frame = np.frombuffer(self._target, dtype=header.dtype).reshape(header.shape).view(Frame)
+        frame.seq = header.seq
+        frame.timestamp = header.timestamp
+        frame._release = partial(self._give_back, self._buffer)
+        self.reset()
+        return frame
+
+    def read_frame(self, f):
+        """Read one complete frame from a binary file object, or None on EOF."""
+        while True:
+            n = f.readinto(self.next_buffer())
+            if not n:
+                self.reset()
+                return None
+            frames = self.advance(n)
+            if frames:
+                return frames[0]
+
+
+class LineDecoder:
+    """
+    Incremental decoder for the newline-delimited text protocol, with the same
+    next_buffer()/advance() interface as FrameDecoder. Bytes are read straight
+    into one reusable bytearray; each complete line is emitted as a stripped str
+    (a StampedLine if it carried a send-time prefix).
+    """
+
+    def __init__(self, chunk_size=65536, encoding='utf-8'):
+        self.encoding = encoding
+        self._buf = bytearray(chunk_size)
+        self._view = memoryview(self._buf)
+        self.reset()
+
+    def reset(self):
+        self._filled = 0
+
+    def flush(self):
+        """Called when the writer goes away; return a final unterminated line, if any."""
+        lines = [self._decode(0, self._filled)] if self._filled else []
+        self.reset()
+        return lines
+
+    def _decode(self, start, end):
+        return unstamp_line(self._buf[start:end].decode(self.encoding, errors='replace').strip())
+
+    def next_buffer(self):
+        if self._filled == len(self._buf):
+            # A single line is longer than the buffer: grow it. A new bytearray
+            # is used because views handed out earlier may still be alive.
+            grown = bytearray(2 * len(self._buf))
+            grown[:self._filled] = self._buf
+            self._buf = grown
+            self._view = memoryview(grown)
+        return self._view[self._filled:]
+
+    def advance(self, n):
+        """Account for `n` new bytes; return the list of completed lines."""
+        start = self._filled
+        self._filled += n
+        buf = self._buf
+        if buf.find(b'\n', start, self._filled) < 0:
+            return ()
+        lines = []
+        pos = 0
+        while True:
+            end = buf.find(b'\n', pos, self._filled)
+            if end < 0:
+                break
+            lines.append(self._decode(pos, end))
+            pos = end + 1
+        # Move the trailing partial line to the front for the next read.
+        remaining = self._filled - pos
+        buf[:remaining] = buf[pos:self._filled]
+        self._filled = remaining
+        return lines
+
+
+class CsvDecoder(LineDecoder):
+    """
+    LineDecoder for lines of comma-separated numbers (the legacy text frames
+    of hardware/sim_fifo_writer.py). Each complete line is converted straight
+    from the receive buffer to an ndarray of `dtype` with one vectorized parse,
+    reshaped to `shape` if given, and emitted as a Frame carrying the send
+    timestamp if the line had one. Malformed lines are skipped and reported
+    to `on_error`.
+    """
+
+    def __init__(self, dtype=np.float32, shape=None, on_error=None, chunk_size=65536):
+        super().__init__(chunk_size)
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape) if shape is not None else None
+        self.size = int(np.prod(self.shape)) if self.shape is not None else None
+        self.on_error = on_error
+
+    def flush(self):
+        values = self._parse(0, self._filled) if self._filled else None
+        self.reset()
+        return [] if values is None else [values]
+
+    def advance(self, n):
+        """Account for `n` new bytes; return the list of parsed arrays."""
+        start = self._filled
+        self._filled += n
+        buf = self._buf
+        if buf.find(b'\n', start, self._filled) < 0:
+            return ()
+        arrays = []
+        pos = 0
+        while True:
+            end = buf.find(b'\n', pos, self._filled)
+            if end < 0:
+                break
+            values = self._parse(pos, end)
+            if values is not None:
+                arrays.append(values)
+            pos = end + 1
+        remaining = self._filled - pos
+        buf[:remaining] = buf[pos:self._filled]
+        self._filled = remaining
+        return arrays
+
+    def _parse(self, start, end):
+        timestamp = None
+        try:
+            if self._buf[start:start + 1] == LINE_STAMP.encode():
+                space = self._buf.find(b' ', start, end)
+                timestamp = float(self._buf[start + 1:space])
+                start = space + 1
+            with warnings.catch_warnings():
+                # Older numpy only warns about unparsable text; treat it as an error.
+                warnings.simplefilter('error', DeprecationWarning)
+                values = np.fromstring(bytes(self._view[start:end]), dtype=self.dtype, sep=',')
+            if self.size is not None:
+                if values.size != self.size:
+                    raise ValueError(f"Expected {self.size} values, got {values.size}")
+                values = values.reshape(self.shape)
+        except (ValueError, DeprecationWarning):
+            if self.on_error is not None:
+                self.on_error()
+            return None
+        values = values.view(Frame)
+        values.timestamp = timestamp
+        return values
@@ -6,12 +6,22 @@ import signal
 import threading
 import json
 import string  # <-- for random string generation
+import multiprocessing
+import numpy as np
+from fifo_protocol import encode_frame, stamp_header, stamp_line
+from fifo_output import PersistentFifoWriter, create_fifos, is_fifo, remove_fifos
 
 class FifoWriter:
-    def __init__(self, base_path, interval=1.0, array_length=100, fifo_names=None):
+    def __init__(self, base_path, interval=1.0, array_length=100, fifo_names=None, array_protocol='line',
+                 full_policy='drop', timestamps=False):
         self.base_path = base_path
         self.interval = interval
         self.array_length = array_length
+        self.array_protocol = array_protocol  # 'line' (CSV text) or 'binary' (framed, see fifo_protocol)
+        self.full_policy = full_policy  # what to do when a reader falls behind (see fifo_output)
+        # Prefix text lines with their send time for latency telemetry: True for every FIFO,
+        # or a list of the FIFO names to stamp. Off by default, since it changes the wire format.
+        self.timestamps = timestamps
         if fifo_names is None:
             self.fifo_names = [
                 'float1.fifo',
@@ -26,35 +36,24 @@ class FifoWriter:
         self.fifo_paths = [os.path.join(self.base_path, name) for name in self.fifo_names]
         self.running = False
         self.threads = []
+        self.writers = {}
+        self.created_fifos = []  # only these are removed again on stop()
 
     def create_fifos(self):
-        for path in self.fifo_paths:
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-                os.mkfifo(path)
-            except FileExistsError:
-                pass
+        # Existing FIFOs are kept, so readers that already opened them stay connected.
+        self.created_fifos = create_fifos(self.fifo_paths)
 
     def remove_fifos(self):
-        for path in self.fifo_paths:
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-            except Exception:
-                pass
+        remove_fifos(self.created_fifos)
+        self.created_fifos = []
 
     def start(self):
         self.running = True
         self.create_fifos()
-        self.threads = [
-            threading.Thread(target=self.write_float_fifo, args=(self.fifo_paths[0],)),
-            threading.Thread(target=self.write_float_fifo, args=(self.fifo_paths[1],)),
-            threading.Thread(target=self.write_int_fifo, args=(self.fifo_paths[2],)),
-            threading.Thread(target=self.write_int_fifo, args=(self.fifo_paths[3],)),
-            threading.Thread(target=self.write_array_fifo, args=(self.fifo_paths[4],)),
-            threading.Thread(target=self.write_string_fifo, args=(self.fifo_paths[5],)),  # <-- add string thread
-        ]
+        targets = [self.write_float_fifo, self.write_float_fifo, self.write_int_fifo, self.write_int_fifo,
+                   self.write_array_fifo, self.write_string_fifo]  # <-- add string thread
+        self.threads = [threading.Thread(target=target, args=(path,))
+                        for target, path in zip(targets, self.fifo_paths) if is_fifo(path)]
         for t in self.threads:
             t.daemon = True
             t.start()
@@ -62,50 +61,225 @@ class FifoWriter:
     def stop(self):
         self.running = False
         time.sleep(self.interval + 0.1)  # Let threads finish
+        for path, writer in self.writers.items():
+            writer.close()
+            print(f"{os.path.basename(path)}: {writer.stats()}")
         self.remove_fifos()
 
+    def writer_for(self, path):
+        """One persistent non-blocking writer per FIFO, kept open across messages."""
+        writer = self.writers.get(path)
+        if writer is None:
+            writer = self.writers[path] = PersistentFifoWriter(path, policy=self.full_policy,
+                                                               timeout=self.interval)
+        return writer
+
+    def stamps(self, path):
+        """True if lines written to `path` get a send-time prefix."""
+        if isinstance(self.timestamps, (list, tuple, set)):
+            return path is not None and os.path.basename(path) in self.timestamps
+        return bool(self.timestamps)
+
+    def encode_line(self, text, path=None):
+        if self.stamps(path):
+            text = stamp_line(text)
+        return f"{text}\n".encode()
+
     def write_float_fifo(self, path):
+        writer = self.writer_for(path)
         while self.running:
-            with open(path, 'w') as f:
-                value = random.uniform(-1000, 1000)
-                f.write(f"{value}\n")
-                f.flush()
+            value = random.uniform(-1000, 1000)
+            writer.write(self.encode_line(value, path))
             time.sleep(self.interval)
 
     def write_int_fifo(self, path):
+        writer = self.writer_for(path)
         while self.running:
-            with open(path, 'w') as f:
-                value = random.randint(-1000, 1000)
-                f.write(f"{value}\n")
-                f.flush()
+            value = random.randint(-1000, 1000)
+            writer.write(self.encode_line(value, path))
             time.sleep(self.interval)
 
     def write_array_fifo(self, path):
+        if self.array_protocol == 'binary':
+            self.write_array_frames(path)
+            return
+        writer = self.writer_for(path)
+        while self.running:
+            arr = [random.uniform(-1000, 1000) for _ in range(self.array_length)]
+            arr_str = ','.join(f"{x}" for x in arr)
+            writer.write(self.encode_line(arr_str, path))
+            time.sleep(self.interval)
+
+    def write_array_frames(self, path):
+        writer = self.writer_for(path)
+        seq = 0
         while self.running:
-            with open(path, 'w') as f:
-                arr = [random.uniform(-1000, 1000) for _ in range(self.array_length)]
-                arr_str = ','.join(f"{x}" for x in arr)
-                f.write(f"{arr_str}\n")
-                f.flush()
+            arr = np.random.uniform(-1000, 1000, self.array_length).astype(np.float32)
+            writer.write(encode_frame(arr, seq))
+            seq += 1
             time.sleep(self.interval)
 
     def write_string_fifo(self, path):
+        writer = self.writer_for(path)
         while self.running:
-            with open(path, 'w') as f:
-                rand_str = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
-                f.write(f"{rand_str}\n")
-                f.flush()
+            rand_str = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
+            writer.write(self.encode_line(rand_str, path))
             time.sleep(self.interval)
 
+# Payload shapes (channels, samples) for load generation.
+LOAD_PROFILES = {
+    'scalar': (1, 1),
+    'array': (1, 30),
+    'flight': (80000, 256),  # full detector readout
+}
+POOL_BYTES = 256 * 1024 * 1024  # cap on pre-generated payload memory per process
+
+
+class LoadGenerator:
+    """
+    Writes pre-generated (channels x samples) float32 payloads to one FIFO at
+    `rate` messages per second (0 = as fast as possible) for `duration`
+    seconds. Payloads are built once, vectorized, into a small pool that is
+    cycled, so the generator itself is not the bottleneck: binary frames only
+    get their seq/timestamp patched in place before each send. Text payloads
+    are one CSV line per message, like the array FIFO.
+    """
+
+    def __init__(self, path, rate=1000.0, shape=(1, 30), encoding='binary', duration=10.0,
+                 pool_size=8, policy='drop', seed=None):
+        if encoding not in ('binary', 'text'):
+            raise ValueError(f"Unknown encoding: {encoding}")
+        self.path = path
+        self.rate = rate
+        self.shape = tuple(shape)
+        self.encoding = encoding
+        self.duration = duration
+        self.policy = policy
+        self.rng = np.random.default_rng(seed)
+        frame_bytes = int(np.prod(self.shape)) * 4
+        self.pool_size = max(1, min(pool_size, POOL_BYTES // max(1, frame_bytes)))
+        self.pool = self._make_pool()
+
+    def _make_pool(self):
+        pool = []
+        for _ in range(self.pool_size):
+            data = self.rng.uniform(-1000, 1000, self.shape).astype(np.float32)
+            if self.encoding == 'binary':
+                pool.append(bytearray(encode_frame(data, 0)))
+            else:
+                text = ','.join(np.char.mod('%.3f', data.ravel()))
+                pool.append((text + '\n').encode('ascii'))
+        return pool
+
+    def run(self):
+        """Generate load until `duration` elapses (or Ctrl+C); return the writer stats."""
+        period = 1.0 / self.rate if self.rate else 0.0
+        writer = PersistentFifoWriter(self.path, policy=self.policy, timeout=period or 1.0,
+                                      reconnect_interval=0.01)
+        seq = 0
+        start = next_send = time.monotonic()
+        end = start + self.duration
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= end:
+                    break
+                if now < next_send:
+                    time.sleep(next_send - now)
+                payload = self.pool[seq % self.pool_size]
+                if self.encoding == 'binary':
+                    stamp_header(payload, seq)
+                writer.write(payload)
+                seq += 1
+                next_send += period
+            writer.drain(min(1.0, self.duration))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            writer.close()
+        stats = writer.stats()
+        stats['attempted'] = seq
+        stats['elapsed'] = time.monotonic() - start
+        return stats
+
+
+def _load_worker(path, options, results):
+    results.put((path, LoadGenerator(path, **options).run()))
+
+
+def run_load(base_path, processes=1, **options):
+    """Run one LoadGenerator process per FIFO (load_0.fifo, load_1.fifo, ...) and report rates."""
+    names = [f'load_{i}.fifo' for i in range(processes)]
+    writer = FifoWriter(base_path, fifo_names=names)
+    writer.create_fifos()
+    results = multiprocessing.Queue()
+    workers = []
+    for i, path in enumerate(writer.fifo_paths):
+        worker_options = dict(options, seed=i)
+        workers.append(multiprocessing.Process(target=_load_worker, args=(path, worker_options, results)))
+    print(f"Generating load on {', '.join(writer.fifo_paths)} for {options.get('duration')} s...")
+    for w in workers:
+        w.start()
+    collected = []
+    try:
+        for _ in workers:
+            collected.append(results.get())
+    except KeyboardInterrupt:
+        pass
+    for w in workers:
+        w.join(timeout=2)
+    writer.remove_fifos()
+
+    total_msgs = total_bytes = 0
+    elapsed = 1e-9
+    for path, stats in sorted(collected):
+        rate = stats['sent'] / max(stats['elapsed'], 1e-9)
+        print(f"{os.path.basename(path)}: sent {stats['sent']}/{stats['attempted']} "
+              f"(dropped {stats['dropped']}), {rate:.1f} msg/s, "
+              f"{stats['bytes_sent'] / max(stats['elapsed'], 1e-9) / 1e6:.2f} MB/s")
+        total_msgs += stats['sent']
+        total_bytes += stats['bytes_sent']
+        elapsed = max(elapsed, stats['elapsed'])
+    print(f"Total: {total_msgs / elapsed:.1f} msg/s, {total_bytes / elapsed / 1e6:.2f} MB/s "
+          f"over {elapsed:.2f} s")
+    return collected
+
+
+def parse_shape(text):
+    """'80000x256' -> (80000, 256); a single number means one channel."""
+    dims = tuple(int(x) for x in text.lower().split('x'))
+    return dims if len(dims) == 2 else (1,) + dims
+
+
+def load_main(args, config):
+    shape = parse_shape(args.shape) if args.shape else LOAD_PROFILES[args.profile]
+    run_load(config.get('base_path', '.'), processes=args.processes, rate=args.rate, shape=shape,
+             encoding=args.encoding, duration=args.duration, pool_size=args.pool,
+             policy=args.policy or config.get('full_policy', 'drop'))
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Test program to fill FIFOs with random data.")
     parser.add_argument('--config', type=str, default='fifo_writer_config.json', help='Path to config JSON file')
+    load = parser.add_argument_group('load generation (instead of the random test FIFOs)')
+    load.add_argument('--load', action='store_true', help='Run the high-rate load generator')
+    load.add_argument('--rate', type=float, default=1000.0, help='Messages per second per process (0 = unlimited)')
+    load.add_argument('--profile', choices=sorted(LOAD_PROFILES), default='array', help='Payload shape preset')
+    load.add_argument('--shape', type=str, help='Payload shape CHANNELSxSAMPLES (overrides --profile)')
+    load.add_argument('--encoding', choices=['binary', 'text'], default='binary', help='Framed binary or CSV lines')
+    load.add_argument('--processes', type=int, default=1, help='Writer processes, one FIFO each')
+    load.add_argument('--duration', type=float, default=10.0, help='Seconds to run')
+    load.add_argument('--pool', type=int, default=8, help='Number of pre-generated payloads to cycle')
+    load.add_argument('--policy', choices=['drop', 'block', 'coalesce'], help='Full-pipe policy (default: config)')
     args = parser.parse_args()
 
     # Load config from JSON
     with open(args.config, 'r') as f:
         config = json.load(f)
+    if args.load:
+        load_main(args, config)
+        return
     base_path = config.get('base_path', '.')
     interval = config.get('interval', 1.0)
     array_length = config.get('array_length', 100)
@@ -117,8 +291,11 @@ def main():
         'array.fifo',
         'string.fifo'  # <-- include string fifo in config
     ])
+    array_protocol = config.get('array_protocol', 'line')
+    full_policy = config.get('full_policy', 'drop')
+    timestamps = config.get('timestamps', False)
 
-    writer = FifoWriter(base_path, interval, array_length, fifo_names)
+    writer = FifoWriter(base_path, interval, array_length, fifo_names, array_protocol, full_policy, timestamps)
 
     def cleanup(signum=None, frame=None):
         print("\nCleaning up FIFOs...")
@@ -0,0 +1,277 @@
+import os
+import time
+import json
+import struct
+import threading
+from fifo_ingest import FifoChannel, FifoMultiplexer
+from fifo_output import create_fifos, is_fifo, remove_fifos
+
+# Capture file layout: FILE_MAGIC followed by records of
+#   RECORD header | payload
+# RECORD = receive time (float64 epoch) | channel id (uint16) | kind (uint16) |
+#          message count (uint32) | payload length (uint32)
+# A KIND_CHANNEL record (JSON name/path/protocol) precedes a channel's first
+# KIND_DATA record. Data payloads are the raw bytes exactly as read from the FIFO.
+FILE_MAGIC = b'ADPTCAP1'
+RECORD = struct.Struct('<dHHII')
+KIND_CHANNEL = 0
+KIND_DATA = 1
+
+
+class FifoRecorder:
+    """
+    Append-only capture of the raw bytes read from each FIFO channel. Attach it
+    to a FifoMultiplexer (multiplexer.recorder = recorder) to tee everything the
+    ingest loop reads, including while the GUI is running.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.bytes_written = 0
+        self.records_written = 0
+        self._ids = {}
+        self._lock = threading.Lock()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'ab')
+        if new_file:
+            self._file.write(FILE_MAGIC)
+        self._next_flush = time.monotonic() + flush_interval
+
+    @classmethod
+    def in_directory(cls, directory, prefix='capture'):
+        """Start a new timestamped capture file in `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        name = f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}.adcap"
+        return cls(os.path.join(directory, name))
+
+    def record(self, channel, data, n_messages=0):
+        with self._lock:
+            if self._file is None:
+                return
+            now = time.time()
+            channel_id = self._ids.get(channel.name)
+            if channel_id is None:
+                channel_id = self._ids[channel.name] = len(self._ids)
+                decl = json.dumps({'name': channel.name, 'path': channel.fifo_path,
+                                   'protocol': channel.protocol}).encode('utf-8')
+                self._file.write(RECORD.pack(now, channel_id, KIND_CHANNEL, 0, len(decl)))
+                self._file.write(decl)
+            self._file.write(RECORD.pack(now, channel_id, KIND_DATA, n_messages, len(data)))
+            self._file.write(data)
+            self.bytes_written += len(data)
+            self.records_written += 1
+            if time.monotonic() >= self._next_flush:
+                self._file.flush()
+                self._next_flush = time.monotonic() + self.flush_interval
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_capture(path):
+    """Yield (time, channel declaration dict, kind, message count, payload) for every record."""
+    channels = {}
+    with open(path, 'rb') as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a FIFO capture file")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return  # end of file (or a record cut short by a crash)
+            t, channel_id, kind, n_messages, length = RECORD.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            if kind == KIND_CHANNEL:
+                channels[channel_id] = json.loads(payload.decode('utf-8'))
+                continue
+            yield t, channels[channel_id], kind, n_messages, payload
+
+
+class FifoReplayer:
+    """
+    Recreates the FIFOs named in a capture and writes the recorded bytes back
+    into them, preserving the recorded timing scaled by `speed` (speed=None
+    replays as fast as the readers accept data). FIFOs that already exist are
+    used as they are; only the ones the replay had to create are removed again
+    afterwards.
+    """
+
+    def __init__(self, capture_path, fifo_config=None, speed=1.0, reader_wait=10.0):
+        self.capture_path = capture_path
+        self.fifo_config = fifo_config or {}
+        self.speed = speed
+        self.reader_wait = reader_wait
+        self.messages = 0
+        self.bytes = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+
+    def output_path(self, decl):
+        """Replay into the configured path for the channel name, else the recorded path."""
+        entry = self.fifo_config.get(decl['name'])
+        if isinstance(entry, dict) and 'path' in entry:
+            return entry['path']
+        return decl['path']
+
+    def _channel_paths(self):
+        paths = []
+        for _, decl, _, _, _ in read_capture(self.capture_path):
+            path = self.output_path(decl)
+            if path not in paths:
+                paths.append(path)
+        return paths
+
+    def _open_writers(self, paths):
+        """Open each FIFO once a reader is attached; channels without a reader are skipped."""
+        fds = {}
+        deadline = time.monotonic() + self.reader_wait
+        waiting = list(paths)
+        while waiting and time.monotonic() < deadline:
+            for path in list(waiting):
+                try:
+                    fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+                except OSError:
+                    continue  # ENXIO: no reader yet
+                os.set_blocking(fd, True)  # replay is lossless once a reader is there
+                fds[path] = fd
+                waiting.remove(path)
+            time.sleep(0.05)
+        for path in waiting:
+            print(f"No reader on {path}; its data will be skipped.")
+        return fds
+
+    def run(self):
+        paths = self._channel_paths()
+        created = create_fifos(paths)
+        paths = [path for path in paths if is_fifo(path)]
+        fds = {}
+        try:
+            print(f"Waiting up to {self.reader_wait:.0f} s for readers on {len(paths)} FIFOs...")
+            fds = self._open_writers(paths)
+            start_wall = time.monotonic()
+            first_t = None
+            for t, decl, _, n_messages, payload in read_capture(self.capture_path):
+                fd = fds.get(self.output_path(decl))
+                if fd is None:
+                    continue
+                if first_t is None:
+                    first_t = t
+                if self.speed:
+                    delay = start_wall + (t - first_t) / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                try:
+                    view = memoryview(payload)
+                    while view:
+                        view = view[os.write(fd, view):]
+                except BrokenPipeError:
+                    print(f"Reader closed {self.output_path(decl)}; skipping the rest of it.")
+                    os.close(fds.pop(self.output_path(decl)))
+                    continue
+                self.chunks += 1
+                self.messages += n_messages
+                self.bytes += len(payload)
+            self.elapsed = time.monotonic() - start_wall
+        finally:
+            for fd in fds.values():
+                os.close(fd)
+            remove_fifos(created)
+        return self
+
+    def report(self):
+        elapsed = max(self.elapsed, 1e-9)
+        print(f"Replayed {self.messages} messages / {self.chunks} chunks / {self.bytes} bytes "
+              f"in {self.elapsed:.2f} s: {self.messages / elapsed:.1f} msg/s, "
+              f"{self.bytes / elapsed / 1e6:.2f} MB/s")
+
+
+def start_recording(directory, multiplexer=None):
+    """Tee every FIFO read by `multiplexer` (the shared one by default) into a new capture."""
+    recorder = FifoRecorder.in_directory(directory)
+    (multiplexer or FifoMultiplexer.shared()).recorder = recorder
+    print(f"Recording FIFO traffic to {recorder.path}")
+    return recorder
+
+
+def has_reader(path):
+    """True if some process has `path` (a FIFO) open for reading."""
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError:
+        return False  # ENXIO: no reader (or no FIFO there at all)
+    os.close(fd)
+    return True
+
+
+def record_main(args, fifo_config):
+    # A FIFO's data is split between its readers, so a second reader would steal
+    # messages from the GUI rather than tee them. Use the viewers' --record for that.
+    channels = []
+    for name, entry in fifo_config.items():
+        if 'path' not in entry:
+            continue  # not a FIFO channel (e.g. a shared-memory source)
+        if has_reader(entry['path']):
+            print(f"{entry['path']} already has a reader; not recording {name}. "
+                  f"Start the viewer with --record to capture alongside it.")
+            continue
+        channels.append((name, entry))
+    if not channels:
+        print("Nothing to record.")
+        return
+    print("This recorder must be the only reader of these FIFOs; start viewers with --record instead.")
+    multiplexer = FifoMultiplexer()
+    recorder = start_recording(args.out, multiplexer)
+    for name, entry in channels:
+        multiplexer.add(FifoChannel(entry['path'], lambda message: None,
+                                    protocol=entry.get('protocol', 'line'),
+                                    poll_interval=entry.get('poll_interval', 0.1), name=name))
+    print("Recording. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    multiplexer.stop()
+    recorder.close()
+    print(f"Wrote {recorder.records_written} chunks / {recorder.bytes_written} bytes to {recorder.path}")
+
+
+def replay_main(args, fifo_config):
+    speed = None if args.fast else args.speed
+    replayer = FifoReplayer(args.capture, fifo_config, speed=speed, reader_wait=args.wait)
+    try:
+        replayer.run()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    replayer.report()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Record FIFO traffic to a capture file and replay it.")
+    parser.add_argument('--config', type=str, default='fifo_config.json', help='Path to FIFO config JSON file')
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record', help='Capture every configured FIFO channel no other process is reading')
+    rec.add_argument('--out', default='captures', help='Directory for the timestamped capture file')
+    rep = sub.add_parser('replay', help='Recreate the FIFOs and play a capture back')
+    rep.add_argument('capture', help='Capture file to replay')
+    rep.add_argument('--speed', type=float, default=1.0, help='Playback rate multiplier (1 = real time)')
+    rep.add_argument('--fast', action='store_true', help='Replay as fast as the readers accept data')
+    rep.add_argument('--wait', type=float, default=10.0, help='Seconds to wait for readers to attach')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        fifo_config = json.load(f)
+    if args.command == 'record':
+        record_main(args, fifo_config)
+    else:
+        replay_main(args, fifo_config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import numpy as np
+from fifo_protocol import CsvDecoder
+
+CHANNEL_TYPES = ('float', 'int', 'string', 'array', 'struct')
+FIELD_TYPES = {'float': float, 'int': int, 'string': str}
+
+
+class ChannelSchema:
+    """
+    Declared value type of a FIFO channel, compiled once into a decode
+    function so the receivers get typed values instead of strings:
+      float / int  - one scalar per message
+      string       - the text line as is
+      array        - an ndarray of `dtype`, optionally checked against
+                     `shape` (or a 1D `length`); arrays keep the message's
+                     send timestamp as Frame views. Text arrays are parsed
+                     by a CsvDecoder straight from the receive buffer
+                     (see make_decoder)
+      struct       - comma-separated `fields` ([name, float|int|string]
+                     pairs), emitted as a dict
+    decode() raises ValueError for a message that doesn't match.
+    Over the binary protocol only float, int and array are supported.
+    """
+
+    def __init__(self, kind='string', dtype='float32', shape=None, fields=None, protocol='line'):
+        if kind not in CHANNEL_TYPES:
+            raise ValueError(f"Unknown channel type: {kind}")
+        self.kind = kind
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape) if shape is not None else None
+        self.fields = [(name, FIELD_TYPES[field_type]) for name, field_type in (fields or [])]
+        self.protocol = protocol
+        if kind == 'struct' and not self.fields:
+            raise ValueError("A struct channel needs 'fields'")
+        self.decode = self._compile()
+
+    def make_decoder(self, on_error=None):
+        """A specialised stream decoder for this schema, or None to use the protocol's default."""
+        if self.protocol == 'line' and self.kind == 'array':
+            return CsvDecoder(self.dtype, self.shape, on_error=on_error)
+        return None
+
+    @classmethod
+    def from_config(cls, channel_config):
+        """Schema for a fifo_config.json entry, or None if it doesn't declare a 'type'."""
+        kind = channel_config.get('type')
+        if kind is None:
+            return None
+        shape = channel_config.get('shape')
+        if shape is None and 'length' in channel_config:
+            shape = (channel_config['length'],)
+        return cls(kind, dtype=channel_config.get('dtype', 'float32'), shape=shape,
+                   fields=channel_config.get('fields'), protocol=channel_config.get('protocol', 'line'))
+
+    def _compile(self):
+        if self.protocol == 'binary':
+            if self.kind == 'array':
+                return self._decode_frame
+            if self.kind in ('float', 'int'):
+                scalar = FIELD_TYPES[self.kind]
+                return lambda frame: scalar(self._check_size(frame, 1).reshape(-1)[0])
+            raise ValueError(f"Channel type {self.kind!r} is not supported over the binary protocol")
+        if self.kind == 'float':
+            return float
+        if self.kind == 'int':
+            return int
+        if self.kind == 'string':
+            return lambda line: line
+        if self.kind == 'array':
+            return lambda values: values  # already parsed by the CsvDecoder
+        return self._decode_struct
+
+    def _check_size(self, values, size):
+        if values.size != size:
+            raise ValueError(f"Expected {size} values, got {values.size}")
+        return values
+
+    def _shaped(self, values):
+        if self.shape is None:
+            return values
+        return self._check_size(values, int(np.prod(self.shape))).reshape(self.shape)
+
+    def _decode_frame(self, frame):
+        if frame.dtype != self.dtype:
+            frame = frame.astype(self.dtype)
+        return self._shaped(frame)
+
+    def _decode_struct(self, line):
+        parts = line.split(',')
+        if len(parts) != len(self.fields):
+            raise ValueError(f"Expected {len(self.fields)} fields, got {len(parts)}")
+        return {name: convert(part.strip()) for (name, convert), part in zip(self.fields, parts)}
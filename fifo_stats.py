@@ -0,0 +1,115 @@
+import time
+import bisect
+import numpy as np
+
+# Latency histogram bin edges in seconds: log spaced from 10 us to 100 s.
+LATENCY_EDGES = np.logspace(-5, 2, 71)
+
+
+class LatencyHistogram:
+    """Fixed log-spaced histogram of latencies (seconds); cheap enough to update per message."""
+
+    def __init__(self, edges=LATENCY_EDGES):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self._edge_list = self.edges.tolist()
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)  # + overflow bin
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, latency):
+        self.counts[bisect.bisect_left(self._edge_list, latency)] += 1
+        self.count += 1
+        if latency > self.max:
+            self.max = latency
+
+    def percentile(self, q):
+        """Upper edge of the bin holding the q-th percentile, or None if empty."""
+        if not self.count:
+            return None
+        idx = int(np.searchsorted(np.cumsum(self.counts), q / 100.0 * self.count))
+        return self.max if idx >= len(self.edges) else min(float(self.edges[idx]), self.max)
+
+    def clear(self):
+        self.counts[:] = 0
+        self.count = 0
+        self.max = 0.0
+
+
+class ChannelStats:
+    """
+    Ingest telemetry for one channel: message/byte counts, reopens, errors,
+    and latency histograms from the producer's send timestamp (Frame.timestamp
+    for binary frames, an '@<epoch> ' prefix for text lines) to receipt and
+    to paint. Receive-side counters are updated on the ingest thread and the
+    rest on the GUI thread; small races only blur the numbers, so no lock.
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.reopens = 0
+        self.frame_errors = 0     # stream errors found by the decoder
+        self.parse_failures = 0   # messages the consumer could not interpret
+        self.receive_latency = LatencyHistogram()
+        self.paint_latency = LatencyHistogram()
+        self.last_timestamp = None  # send time of the newest stamped message
+        self.last_error = None      # the newest decoder error
+        self._last_time = time.monotonic()
+        self._last_messages = 0
+        self._last_bytes = 0
+
+    def received(self, n_bytes, messages):
+        self.bytes += n_bytes
+        self.messages += len(messages)
+        now = None
+        for message in messages:
+            timestamp = getattr(message, 'timestamp', None)
+            if timestamp is not None:
+                if now is None:
+                    now = time.time()
+                self.receive_latency.add(now - timestamp)
+                self.last_timestamp = timestamp
+
+    def painted(self, message=None):
+        """
+        Record write-to-paint latency for a message that has just been displayed.
+        Typed scalars can't carry their timestamp, so without one the newest
+        received send time is used.
+        """
+        timestamp = getattr(message, 'timestamp', None)
+        if timestamp is None:
+            timestamp = self.last_timestamp
+        if timestamp is not None:
+            self.paint_latency.add(time.time() - timestamp)
+
+    def parse_failed(self):
+        self.parse_failures += 1
+
+    def frame_error(self, error=None):
+        """The decoder lost sync with the stream (it resynchronizes by itself)."""
+        self.frame_errors += 1
+        self.last_error = error
+
+    def snapshot(self):
+        """
+        Totals plus rates and latency percentiles (ms) since the previous
+        snapshot; the latency histograms restart after each call.
+        """
+        now = time.monotonic()
+        elapsed = max(now - self._last_time, 1e-9)
+        messages, n_bytes = self.messages, self.bytes
+        snap = {
+            'messages': messages,
+            'bytes': n_bytes,
+            'msg_rate': (messages - self._last_messages) / elapsed,
+            'byte_rate': (n_bytes - self._last_bytes) / elapsed,
+            'reopens': self.reopens,
+            'errors': self.frame_errors + self.parse_failures,
+        }
+        for key, hist in (('receive', self.receive_latency), ('paint', self.paint_latency)):
+            for q in (50, 99):
+                value = hist.percentile(q)
+                snap[f'{key}_p{q}'] = None if value is None else value * 1000
+            hist.clear()
+        self._last_time, self._last_messages, self._last_bytes = now, messages, n_bytes
+        return snap
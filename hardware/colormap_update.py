@@ -1,10 +1,16 @@
+import os
+import sys
 import time
 
 import numpy as np
 import pyqtgraph as pg
-from pyqtgraph.Qt import QtWidgets, QtCore, QtGui
+from pyqtgraph.Qt import QtWidgets, QtCore
 from time import perf_counter
 
+# Allow importing the shared colormap tables from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from colormaps import ColorLUT
+
 
 # This function generates the hexgonal array x's and y's in the required ordering.
 # It is ugly, but works for now.
@@ -119,12 +125,10 @@ w4, s4, spots1, xs, ys = createArray(w4)
 # Create the color map.
 # Adapted from https://github.com/pyqtgraph/pyqtgraph/issues/1712#issuecomment-819745370
 nPts = 255
-colormap = pg.colormap.get('cividis')
 valueRange = np.linspace(0, 255, num=nPts)
-colors = colormap.getLookupTable(0, 1, nPts=nPts)
 
-# *** Create brushes lookup table
-brushes_table = [QtGui.QBrush(QtGui.QColor(*color)) for color in colors]
+# *** Brushes lookup table, shared with the detector views (see colormaps.ColorLUT)
+brushes_table = ColorLUT.get('cividis', nPts).brushes
 
 fps = None
 lastTime = perf_counter()
@@ -1,9 +1,17 @@
+import io
 import os
+import sys
 import numpy as np
 import time
-import errno
+
+# Allow importing the shared transport modules from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shm_ring import ShmFrameRing
+from fifo_output import PersistentFifoWriter
+from fifo_protocol import stamp_line
 
 FIFO_PATH = '/tmp/adapt_sim_fifo'
+SHM_NAME = 'adapt_sim_ring'
 N_ELEMENTS = 10
 NUM_PIXELS = 12 * 6 * 32  # match the simulation layout
 
@@ -15,45 +23,80 @@ def create_fifo(path):
     print(f"FIFO created at {path}")
 
 
-def generate_simulation_data():
-    """Generate random data for all pixels."""
-    return [np.random.rand(N_ELEMENTS).tolist() for _ in range(NUM_PIXELS)]
+def generate_simulation_data(rng=np.random.default_rng()):
+    """Generate random data for all pixels, as a (NUM_PIXELS, N_ELEMENTS) float32 array."""
+    return rng.random((NUM_PIXELS, N_ELEMENTS), dtype=np.float32)
 
 
-def flush_fifo(path):
-    """Flush the FIFO by reading all available data."""
-    try:
-        with open(path, 'rb', buffering=0) as fifo:
-            while True:
-                try:
-                    data = fifo.read(4096)
-                    if not data:
-                        break
-                except BlockingIOError:
-                    break
-    except Exception:
-        pass
+def format_frame(data):
+    """All values as one CSV line (without the newline); '%.9g' round-trips float32."""
+    text = io.StringIO()
+    np.savetxt(text, np.reshape(data, (1, -1)), fmt='%.9g', delimiter=',', newline='')
+    return text.getvalue()
 
 
-def write_data_to_fifo(path, data):
-    """Write the simulation data to the FIFO as a single line of text."""
-    # Flatten and convert to CSV string
-    flat = [str(x) for arr in data for x in arr]
-    line = ','.join(flat) + '\n'
-    with open(path, 'w') as fifo:
-        fifo.write(line)
-        fifo.flush()
+def write_data_to_fifo(writer, data, timestamps=False):
+    """Write the simulation data to the FIFO as a single line of text, prefixed with the send time if `timestamps`."""
+    line = format_frame(data)
+    if timestamps:
+        line = stamp_line(line)
+    writer.write((line + '\n').encode())
 
 
-def main():
+def run_fifo(interval, timestamps=False):
     create_fifo(FIFO_PATH)
+    # Coalesce: if the reader falls behind, only the newest frame is kept, so
+    # the display never shows stale data (this replaces draining the FIFO).
+    writer = PersistentFifoWriter(FIFO_PATH, policy='coalesce')
     print("Starting simulation data writer. Press Ctrl+C to stop.")
-    while True:
-        flush_fifo(FIFO_PATH)
-        data = generate_simulation_data()
-        write_data_to_fifo(FIFO_PATH, data)
-        print("Wrote new data to FIFO.")
-        time.sleep(1)  # Write new data every second
+    try:
+        while True:
+            start = time.monotonic()
+            data = generate_simulation_data()
+            write_data_to_fifo(writer, data, timestamps)
+            print(f"Wrote new data to FIFO ({writer.dropped} frames dropped).")
+            # A CSV frame is far larger than the pipe buffer: keep pushing it out
+            # while the reader consumes it instead of just sleeping.
+            writer.drain(interval)
+            time.sleep(max(0.0, interval - (time.monotonic() - start)))
+    finally:
+        writer.close()
+
+
+def run_shm(interval, name, n_slots):
+    """Fill ring slots in place; readers map the latest committed slot directly."""
+    ring = ShmFrameRing.create(name, (NUM_PIXELS, N_ELEMENTS), np.float32, n_slots=n_slots)
+    rng = np.random.default_rng()
+    print(f"Shared-memory ring '{name}' created ({n_slots} slots). Press Ctrl+C to stop.")
+    try:
+        while True:
+            rng.random(dtype=np.float32, out=ring.begin_write())
+            seq = ring.commit()
+            print(f"Committed frame {seq}.")
+            time.sleep(interval)
+    finally:
+        ring.close()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Write simulated detector frames.")
+    parser.add_argument('--transport', choices=['fifo', 'shm'], default='fifo',
+                        help="CSV lines to a FIFO, or frames into a shared-memory ring")
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between frames')
+    parser.add_argument('--shm-name', default=SHM_NAME, help='Shared-memory ring name')
+    parser.add_argument('--slots', type=int, default=8, help='Number of frames in the ring')
+    parser.add_argument('--timestamps', action='store_true',
+                        help='Prefix each CSV line with its send time (changes the wire format)')
+    args = parser.parse_args()
+
+    try:
+        if args.transport == 'shm':
+            run_shm(args.interval, args.shm_name, args.slots)
+        else:
+            run_fifo(args.interval, args.timestamps)
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == '__main__':
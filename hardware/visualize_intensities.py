@@ -1,9 +1,15 @@
+import os
 import sys
 from PyQt6 import QtWidgets, QtCore, QtGui
 import pyqtgraph as pg
 import pyqtgraph.dockarea
 import numpy as np
 
+# Allow importing the shared transport modules from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helper_classes import ShmFrameWatcher, FrameClock
+from colormaps import ColorLUT, ColorScale
+
 N_ELEMENTS = 10
 
 class CustomScatterPlotItem(pg.ScatterPlotItem):
@@ -278,11 +284,24 @@ class IntensityScatterPlotWidget(QtWidgets.QWidget):
         y_range = [min(all_y) - 1, max(all_y) + 1]
         self.plot_widget.setRange(xRange=x_range, yRange=y_range)
 
-        # Create colormap and brush lookup table
-        self.nPts = 256
-        colormap = pg.colormap.get("viridis")
-        colors = colormap.getLookupTable(0, 1, nPts=self.nPts)
-        self.brushes_table = [QtGui.QBrush(QtGui.QColor(*color)) for color in colors]
+        # Shared colormap tables; intensities are normalized to 0..N_ELEMENTS.
+        self.lut = ColorLUT.get("viridis")
+        self.color_scale = ColorScale('fixed', 0, N_ELEMENTS, n_bins=len(self.lut))
+        self.brushes_table = np.array(self.lut.brushes, dtype=object)
+
+        # Brushes of everything but the pixels never change; keep them in point order
+        # and only fill in the pixel slice on each update.
+        types = [p['type'] for p in self.point_map]
+        self.pixel_slice = slice(types.index('px'), types.index('px') + self.num_pixels)
+        self.all_brushes = np.empty(len(types), dtype=object)
+        self.all_brushes[[t == 'mb' for t in types]] = pg.mkBrush(50, 50, 50, 150)
+        self.all_brushes[[t == 'db' for t in types]] = pg.mkBrush(100, 100, 100, 150)
+        self.all_brushes[[t == 'label' for t in types]] = pg.mkBrush('w')
+
+        # Color bin of every pixel as last drawn; only pixels whose bin changes get restyled.
+        self.pixel_spots = self.scatter.points()[self.pixel_slice]
+        self.prev_bins = None
+        self.changed_fraction = 1.0
 
     def on_spot_right_clicked(self, spot):
         menu = QtWidgets.QMenu()
@@ -296,15 +315,15 @@ class IntensityScatterPlotWidget(QtWidgets.QWidget):
 
             if point_info['type'] == 'px':
                 waveform_idx = point_info['waveform_idx']
-                if self.waveforms and 0 <= waveform_idx < len(self.waveforms):
+                if 0 <= waveform_idx < len(self.waveforms):
                     waveform = self.waveforms[waveform_idx]
                     self.waveform_selected.emit(waveform_idx, waveform)
             elif point_info['type'] == 'db' or point_info['type'] == 'mb':
                 # Collect all waveforms associated with the clicked board
                 waveforms_to_show = []
                 start_idx, end_idx = self.get_waveform_indices_for_board(point_info)
-                if self.waveforms:
-                    waveforms_to_show = self.waveforms[start_idx:end_idx]
+                if len(self.waveforms):
+                    waveforms_to_show = list(self.waveforms[start_idx:end_idx])
                 
                 self.all_waveforms_selected.emit(waveforms_to_show)
 
@@ -342,39 +361,33 @@ class IntensityScatterPlotWidget(QtWidgets.QWidget):
         """Generates random N_ELEMENTS-element arrays for each pixel."""
         return [np.random.rand(N_ELEMENTS) for _ in range(self.num_pixels)]
 
-    def update_plot(self):
-        """Generates new data and updates the plot."""
-        self.waveforms = self.generate_waveforms()
-        intensities = [np.sum(wf) for wf in self.waveforms]
-
-        # Normalize intensities to be between 0 and 1 for the colormap
-        min_intensity = 0
-        max_intensity = N_ELEMENTS * 1
-        
-        # Create array of brushes from lookup table for pixels
-        brush_indices = [
-            int(((i - min_intensity) / (max_intensity - min_intensity)) * (self.nPts - 1))
-            for i in intensities
-        ]
-        pixel_brushes = [self.brushes_table[i] for i in brush_indices]
-
-        # Construct the full list of brushes in the correct order
-        all_brushes = []
-        # Motherboard brushes
-        all_brushes.extend([pg.mkBrush(50, 50, 50, 150)] * len([p for p in self.point_map if p['type'] == 'mb']))
-        # Daughterboard brushes
-        all_brushes.extend([pg.mkBrush(100, 100, 100, 150)] * len([p for p in self.point_map if p['type'] == 'db']))
-        # Pixel brushes
-        all_brushes.extend(pixel_brushes)
-        # Label brushes
-        num_labels = len([p for p in self.point_map if p['type'] == 'label'])
-        all_brushes.extend([pg.mkBrush('w')] * num_labels)
-
-        self.scatter.setBrush(all_brushes)
+    def update_plot(self, waveforms=None):
+        """Updates the plot from a (num_pixels, N_ELEMENTS) array, or new random data if None."""
+        if waveforms is None:
+            waveforms = self.generate_waveforms()
+        self.waveforms = waveforms
+        intensities = np.asarray(self.waveforms).sum(axis=1)
+
+        # Color bins for every pixel in one expression, then brushes by table lookup.
+        bins = self.color_scale.bins(intensities)
+        self.all_brushes[self.pixel_slice] = self.brushes_table[bins]
+        if self.prev_bins is None or len(bins) != len(self.prev_bins):
+            self.scatter.setBrush(self.all_brushes.tolist())
+            self.changed_fraction = 1.0
+        else:
+            changed = np.flatnonzero(bins != self.prev_bins)
+            self.changed_fraction = len(changed) / len(bins) if len(bins) else 0.0
+            if len(changed) > len(bins) // 4:
+                # Restyling spot by spot only pays off while few pixels change.
+                self.scatter.setBrush(self.all_brushes.tolist())
+            else:
+                for i in changed.tolist():
+                    self.pixel_spots[i].setBrush(self.brushes_table[bins[i]])
+        self.prev_bins = bins
 
 
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    def __init__(self, shm_name=None):
         super().__init__()
 
         self.setWindowTitle("Waveform Intensity Visualization")
@@ -390,7 +403,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.next_button = QtWidgets.QPushButton("Next Data")
         layout.addWidget(self.next_button)
 
-        self.next_button.clicked.connect(self.update_all_plots)
+        self.next_button.clicked.connect(lambda: self.set_waveforms(None))
         self.scatter_widget.waveform_selected.connect(self.show_waveform)
         self.scatter_widget.all_waveforms_selected.connect(self.show_all_waveforms)
 
@@ -398,16 +411,55 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.scatter_widget.update_plot()
 
-        # Add a timer to update data automatically every 1 second
-        self.timer = QtCore.QTimer(self)
-        self.timer.timeout.connect(self.update_all_plots)
-        self.timer.start(10)  # 1000 ms = 1 second
+        # Arriving frames are only stored; the shared frame clock draws the latest one.
+        self.latest_waveforms = None
+        # Ring frames are drawn from copies (see update_all_plots): the one shown and a spare.
+        self.shown_buffer = None
+        self.spare_buffer = None
+        clock = FrameClock.instance()
+        self.frame_watcher = None
+        if shm_name is not None:
+            # Frames come from the simulator's shared-memory ring.
+            self.render_target = clock.register(self.update_all_plots, name='intensities')
+            self.frame_watcher = ShmFrameWatcher(shm_name, parent=self)
+            self.frame_watcher.data_received.connect(self.set_waveforms)
+            self.frame_watcher.start()
+        else:
+            # Demo mode: new random data on every tick of the frame clock.
+            self.render_target = clock.register(lambda dt: self.update_all_plots(), continuous=True,
+                                                name='intensities')
+
+    def set_waveforms(self, waveforms):
+        self.latest_waveforms = waveforms
+        self.render_target.mark_dirty()
 
     def update_all_plots(self):
-        self.scatter_widget.update_plot()
+        waveforms, self.latest_waveforms = self.latest_waveforms, None
+        ring = self.frame_watcher.ring if self.frame_watcher is not None else None
+        if waveforms is not None and ring is not None:
+            # The writer reuses the zero-copy slot, but clicks and the open waveform docks read
+            # scatter_widget.waveforms long after this tick, so draw from a copy.
+            waveforms = self.copy_frame(ring, waveforms)
+            if waveforms is None:
+                return
+        self.scatter_widget.update_plot(waveforms)
+        self.statusBar().showMessage(f"Changed pixels: {100 * self.scatter_widget.changed_fraction:.1f}%")
         if self.waveform_window:
             self.waveform_window.update_open_waveforms(self.scatter_widget.waveforms)
 
+    def copy_frame(self, ring, frame):
+        """Copy a ring frame into the spare buffer, which becomes the shown one; None if unavailable."""
+        buffer = self.spare_buffer
+        if buffer is None or buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+            buffer = np.empty(frame.shape, dtype=frame.dtype)
+        np.copyto(buffer, frame)
+        if not self.frame_watcher.is_valid(frame) and ring.read_latest(out=buffer) is None:
+            # Lapped before or during the copy, and no newest frame either: keep showing the last one.
+            self.spare_buffer = buffer
+            return None
+        self.spare_buffer, self.shown_buffer = self.shown_buffer, buffer
+        return buffer
+
     def show_all_waveforms(self, waveforms):
         if self.waveform_window is None:
             self.waveform_window = WaveformViewWindow()
@@ -435,8 +487,15 @@ class MainWindow(QtWidgets.QMainWindow):
 
 
 def main():
-    app = QtWidgets.QApplication(sys.argv)
-    window = MainWindow()
+    import argparse
+    parser = argparse.ArgumentParser(description="Waveform intensity visualization.")
+    parser.add_argument('--shm', default=None, metavar='NAME',
+                        help="Read frames from this shared-memory ring (see sim_fifo_writer.py --transport shm)")
+    parser.add_argument('--fps', type=float, default=30, help="Target repaint rate of the frame clock")
+    args, qt_args = parser.parse_known_args()
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    FrameClock.instance().set_fps(args.fps)
+    window = MainWindow(shm_name=args.shm)
     window.show()
     sys.exit(app.exec())
 
@@ -1,44 +1,470 @@
-import os
 import threading
-from PyQt6.QtCore import QObject, pyqtSignal
+import time
+from collections import deque
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView
+from fifo_ingest import FifoChannel, FifoMultiplexer
+from fifo_stats import ChannelStats
+from fifo_schema import ChannelSchema
+from shm_ring import ShmFrameRing
+
+DELIVERY_POLICIES = ('queued', 'conflate', 'bounded', 'batch')
+
+
+def _discard(message):
+    """Drop a message nobody will consume, handing a Frame's receive buffer back to its decoder."""
+    release = getattr(message, 'release', None)
+    if release is not None:
+        release()
+
+
+class DeliveryQueue:
+    """
+    Thread-safe hand-off from the ingest thread to the GUI thread. Holds at most
+    `maxlen` messages, drops the oldest one when full and counts the drops.
+    Dropped frames are released, so their buffers go back to the decoder.
+    """
+
+    def __init__(self, maxlen):
+        self.maxlen = max(1, maxlen)
+        self.dropped = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+
+    def push(self, message):
+        """Add a message; return True if the queue was empty (the consumer needs a wakeup)."""
+        dropped = None
+        with self._lock:
+            if len(self._items) >= self.maxlen:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(message)
+            was_empty = len(self._items) == 1
+        if dropped is not None:
+            _discard(dropped)
+        return was_empty
+
+    def drain(self):
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+        return items
+
 
 class FifoWatcher(QObject):
     """
     Watches a single FIFO file and emits a signal with the new data when available.
-    The data is emitted as a string; parsing is up to the receiver.
+    With protocol='line' (the default) each text line is emitted as a string and
+    parsing is up to the receiver. With protocol='binary' the FIFO carries framed
+    binary messages (see fifo_protocol) and each frame is emitted as a typed
+    Frame that owns its receive buffer; the final consumer may hand the buffer
+    back for reuse with frame.release() once it has copied the data. A `schema` (see fifo_schema;
+    built from the entry's "type" by from_config) makes the watcher emit typed
+    values instead.
+
+    Watchers don't own a thread: all of them are serviced by one shared
+    FifoMultiplexer loop (or the `multiplexer` passed in).
+
+    `delivery` controls how messages reach the GUI thread:
+      'queued'   - one queued signal per message (no dropping, unbounded)
+      'conflate' - only the latest message is delivered, older ones are dropped
+      'bounded'  - up to `queue_size` messages are kept, dropping the oldest
+      'batch'    - data_received is emitted once per `batch_interval` seconds
+                   with a list of the (at most `queue_size`) messages received
+    Messages dropped by a policy are counted in `dropped`. add_tap() sees every
+    message before the policy, on the ingest thread.
+
+    `stats` (a fifo_stats.ChannelStats) counts messages, bytes, reopens and
+    latency on the ingest side; receivers report messages they could not
+    parse with stats.parse_failed() and displayed ones with stats.painted().
     """
-    data_received = pyqtSignal(str)
+    data_received = pyqtSignal(object)
+    _wakeup = pyqtSignal()
 
-    def __init__(self, fifo_path, poll_interval=0.1, parent=None):
+    def __init__(self, fifo_path, poll_interval=0.1, protocol='line', buffer_count=3,
+                 delivery='queued', queue_size=64, batch_interval=1 / 30,
+                 name=None, schema=None, multiplexer=None, parent=None):
         super().__init__(parent)
+        if delivery not in DELIVERY_POLICIES:
+            raise ValueError(f"Unknown delivery policy: {delivery}")
         self.fifo_path = fifo_path
         self.poll_interval = poll_interval
+        self.protocol = protocol
+        self.delivery = delivery
+        if delivery == 'queued':
+            self._queue = None
+            callback = self.data_received.emit
+        else:
+            self._queue = DeliveryQueue(1 if delivery == 'conflate' else queue_size)
+            callback = self._enqueue
+        self._deliver = callback
+        self._taps = []
+        self.channel = FifoChannel(fifo_path, callback, protocol=protocol,
+                                   poll_interval=poll_interval, buffer_count=buffer_count, name=name,
+                                   schema=schema)
+        self._batch_timer = None
+        if delivery == 'batch':
+            self._batch_timer = QTimer(self)
+            self._batch_timer.setInterval(max(1, int(batch_interval * 1000)))
+            self._batch_timer.timeout.connect(self._drain_batch)
+        else:
+            self._wakeup.connect(self._drain, Qt.ConnectionType.QueuedConnection)
+        self._multiplexer = multiplexer
         self._running = False
-        self._thread = None
+
+    @classmethod
+    def from_config(cls, channel_config, name=None, multiplexer=None, parent=None):
+        """Build a watcher from one fifo_config.json entry."""
+        return cls(channel_config['path'],
+                   poll_interval=channel_config.get('poll_interval', 0.1),
+                   protocol=channel_config.get('protocol', 'line'),
+                   buffer_count=channel_config.get('buffer_count', 3),
+                   delivery=channel_config.get('delivery', 'queued'),
+                   queue_size=channel_config.get('queue_size', 64),
+                   batch_interval=channel_config.get('batch_interval', 1 / 30),
+                   name=name, schema=ChannelSchema.from_config(channel_config),
+                   multiplexer=multiplexer, parent=parent)
+
+    @property
+    def multiplexer(self):
+        if self._multiplexer is None:
+            self._multiplexer = FifoMultiplexer.shared()
+        return self._multiplexer
+
+    @property
+    def dropped(self):
+        """Number of messages discarded by the delivery policy."""
+        return self._queue.dropped if self._queue is not None else 0
+
+    @property
+    def stats(self):
+        return self.channel.stats
 
     def start(self):
         if not self._running:
             self._running = True
-            self._thread = threading.Thread(target=self._watch_fifo, daemon=True)
-            self._thread.start()
+            if self._batch_timer is not None:
+                self._batch_timer.start()
+            self.multiplexer.add(self.channel)
 
     def stop(self):
+        if self._running:
+            self._running = False
+            self.multiplexer.remove(self.channel)
+            if self._batch_timer is not None:
+                self._batch_timer.stop()
+
+    def add_tap(self, callback):
+        """
+        Also hand every message to `callback`, on the ingest thread and before the
+        delivery policy can drop it (e.g. to record a conflated channel in full).
+        The callback must not block; with protocol='binary' it must not keep the frame.
+        """
+        self._taps.append(callback)
+        self.channel.callback = self._receive
+
+    def _receive(self, message):
+        for tap in self._taps:
+            tap(message)
+        self._deliver(message)
+
+    def _enqueue(self, message):
+        # Runs on the ingest thread: only wake the GUI thread when the queue
+        # goes from empty to non-empty, so a burst costs one queued event.
+        if self._queue.push(message) and self._batch_timer is None:
+            self._wakeup.emit()
+
+    def _drain(self):
+        for message in self._queue.drain():
+            self.data_received.emit(message)
+
+    def _drain_batch(self):
+        messages = self._queue.drain()
+        if messages:
+            self.data_received.emit(messages)
+
+
+class ShmFrameWatcher(QObject):
+    """
+    Reads detector frames from a shared-memory ShmFrameRing and emits each new
+    frame with the same data_received signal as FifoWatcher. Frames are
+    zero-copy views of the latest committed slot (tagged with seq/timestamp),
+    so only the newest frame is delivered per poll; skipped frames are counted
+    in `dropped`. Attaching is retried every `attach_interval` seconds until
+    the writer has created the ring. If the writer restarts, the old ring is
+    either marked dead or, while no new frames arrive, found replaced under
+    the same name (checked every `attach_interval`), and the watcher attaches
+    to the new one. Telemetry is kept in `stats` as for FifoWatcher (a
+    re-attach counts as a reopen).
+
+    The frames are only valid until the writer laps them: a consumer that
+    copies a frame later (e.g. on a worker thread) checks is_valid() after
+    the copy and drops it if it was overwritten (counted in `overwritten`).
+    """
+    data_received = pyqtSignal(object)
+
+    def __init__(self, shm_name, poll_interval=0.02, attach_interval=1.0, parent=None):
+        super().__init__(parent)
+        self.shm_name = shm_name
+        self.poll_interval = poll_interval
+        self.attach_interval = attach_interval
+        self.ring = None
+        self.dropped = 0
+        self.overwritten = 0
+        self.stats = ChannelStats()
+        self._attached_once = False
+        self._last_seq = -1
+        self._next_replace_check = 0.0
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._poll)
+
+    @classmethod
+    def from_config(cls, channel_config, parent=None):
+        return cls(channel_config['shm_name'],
+                   poll_interval=channel_config.get('poll_interval', 0.02),
+                   attach_interval=channel_config.get('attach_interval', 1.0),
+                   parent=parent)
+
+    def start(self):
+        self._timer.start(max(1, int(self.poll_interval * 1000)))
+
+    def stop(self):
+        self._timer.stop()
+        self._detach()
+
+    def _detach(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def _replaced(self):
+        # Called while no new frames arrive: is a different ring published under our name now?
+        now = time.monotonic()
+        if now < self._next_replace_check:
+            return False
+        self._next_replace_check = now + self.attach_interval
+        created = ShmFrameRing.created_id(self.shm_name)
+        return created is not None and created != self.ring.created
+
+    def is_valid(self, frame):
+        """True if a frame emitted by this watcher has not been overwritten by the writer since."""
+        ring = self.ring
+        if ring is not None and ring.is_valid(frame):
+            return True
+        self.overwritten += 1
+        return False
+
+    def _attach(self):
+        try:
+            self.ring = ShmFrameRing.attach(self.shm_name)
+        except (FileNotFoundError, ValueError):
+            self.ring = None
+            self._timer.setInterval(max(1, int(self.attach_interval * 1000)))
+            return False
+        if self._attached_once:
+            self.stats.reopens += 1
+        self._attached_once = True
+        self._last_seq = -1
+        self._timer.setInterval(max(1, int(self.poll_interval * 1000)))
+        return True
+
+    def _poll(self):
+        if self.ring is not None and not self.ring.alive:
+            self._detach()
+        if self.ring is None and not self._attach():
+            return
+        if self.ring.head == self._last_seq:
+            if self._replaced():
+                self._detach()
+            return
+        self._next_replace_check = time.monotonic() + self.attach_interval
+        frame = self.ring.latest()
+        if frame is None or frame.seq == self._last_seq:
+            return
+        if frame.seq < self._last_seq:
+            self._last_seq = -1  # writer restarted the ring
+        if self._last_seq >= 0:
+            self.dropped += frame.seq - self._last_seq - 1
+        self._last_seq = frame.seq
+        self.stats.received(frame.nbytes, (frame,))
+        self.data_received.emit(frame)
+
+
+class FrameWorker(QObject):
+    """
+    Runs `build_fn(raw)` on a background thread and posts each result to the
+    GUI thread with frame_ready. Only the newest submitted payload is kept:
+    if the worker is still busy when several payloads arrive, the older ones
+    are skipped (counted in `dropped`, and released if they are frames), so
+    the GUI never falls behind the data.
+    """
+    frame_ready = pyqtSignal(object)
+
+    def __init__(self, build_fn, parent=None):
+        super().__init__(parent)
+        self.build_fn = build_fn
+        self.dropped = 0
+        self._pending = None
+        self._has_pending = False
+        self._cond = threading.Condition()
         self._running = False
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
         if self._thread:
             self._thread.join(timeout=1)
             self._thread = None
 
-    def _watch_fifo(self):
-        while self._running:
+    def submit(self, raw):
+        with self._cond:
+            skipped, has_skipped = self._pending, self._has_pending
+            if has_skipped:
+                self.dropped += 1
+            self._pending = raw
+            self._has_pending = True
+            self._cond.notify()
+        if has_skipped:
+            _discard(skipped)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._has_pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                raw, self._pending, self._has_pending = self._pending, None, False
             try:
-                with open(self.fifo_path, 'r') as f:
-                    for line in f:
-                        if not self._running:
-                            break
-                        self.data_received.emit(line.strip())
-            except Exception:
-                # If FIFO doesn't exist or is not open for writing, wait and retry
-                pass
-            # Sleep before retrying
-            import time
-            time.sleep(self.poll_interval)
+                frame = self.build_fn(raw)
+            except Exception as e:
+                print(f"Error building frame: {e}")
+                continue
+            if frame is not None:
+                self.frame_ready.emit(frame)
+
+
+class RenderTarget:
+    """A render callback registered with a FrameClock; mark_dirty() schedules it for the next tick."""
+    __slots__ = ('callback', 'continuous', 'dirty', 'name')
+
+    def __init__(self, callback, continuous=False, name=None):
+        self.callback = callback
+        self.continuous = continuous
+        self.dirty = True
+        self.name = name
+
+    def mark_dirty(self):
+        self.dirty = True
+
+
+class FrameClock(QObject):
+    """
+    Application-wide render tick. Ingest handlers only update state and mark
+    their RenderTarget dirty; once per tick, at `fps`, the clock runs every
+    dirty callback (and every continuous one, e.g. animations, which get the
+    seconds since the previous tick) in registration order. GUI cost is then
+    bounded by the frame rate however fast the FIFOs deliver, and all
+    widgets repaint in phase. instance() is the shared clock of the process.
+    """
+    tick = pyqtSignal(float)
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, fps=30, parent=None):
+        super().__init__(parent)
+        self.targets = []
+        self.ticks = 0
+        self.renders = 0
+        self._last = time.monotonic()
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        self.fps = max(0.1, float(fps))
+        self._timer.start(max(1, int(round(1000 / self.fps))))
+
+    def register(self, callback, continuous=False, name=None):
+        target = RenderTarget(callback, continuous, name)
+        self.targets.append(target)
+        return target
+
+    def unregister(self, target):
+        if target in self.targets:
+            self.targets.remove(target)
+
+    def _tick(self):
+        now = time.monotonic()
+        dt, self._last = now - self._last, now
+        self.ticks += 1
+        for target in list(self.targets):
+            if target.continuous:
+                target.callback(dt)
+            elif target.dirty:
+                target.dirty = False
+                target.callback()
+            else:
+                continue
+            self.renders += 1
+        self.tick.emit(dt)
+
+
+class IngestStatsWidget(QWidget):
+    """
+    Table of ingest health for a set of watchers (FifoWatcher or
+    ShmFrameWatcher), refreshed every `refresh_interval` seconds: message and
+    byte rates, totals, reopens, parse/frame errors, delivery drops and
+    write-to-receipt / write-to-paint latency percentiles.
+    """
+    COLUMNS = ('Channel', 'msg/s', 'MB/s', 'Messages', 'Reopens', 'Errors', 'Dropped',
+               'Recv p50 ms', 'Recv p99 ms', 'Paint p50 ms', 'Paint p99 ms')
+
+    def __init__(self, refresh_interval=1.0, parent=None):
+        super().__init__(parent)
+        self.sources = []
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.table)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start(max(1, int(refresh_interval * 1000)))
+
+    def add_source(self, name, watcher):
+        self.sources.append((name, watcher))
+        self.table.setRowCount(len(self.sources))
+        self.table.setItem(len(self.sources) - 1, 0, QTableWidgetItem(name))
+
+    def refresh(self):
+        for row, (name, watcher) in enumerate(self.sources):
+            snap = watcher.stats.snapshot()
+            values = (f"{snap['msg_rate']:.1f}", f"{snap['byte_rate'] / 1e6:.3f}", str(snap['messages']),
+                      str(snap['reopens']), str(snap['errors']), str(watcher.dropped))
+            values += tuple('-' if snap[key] is None else f"{snap[key]:.2f}"
+                            for key in ('receive_p50', 'receive_p99', 'paint_p50', 'paint_p99'))
+            for col, text in enumerate(values, start=1):
+                item = self.table.item(row, col)
+                if item is None:
+                    self.table.setItem(row, col, QTableWidgetItem(text))
+                else:
+                    item.setText(text)
@@ -0,0 +1,255 @@
+import os
+import json
+import numpy as np
+
+# Store layout: DIRECTORY/schema.json ({"columns": {name: dtype}, "chunk_rows": n}) and, per
+# chunk, one raw file per column, chunk_NNNNNN.<column>.col, preallocated to chunk_rows
+# entries and memory-mapped. The shared timestamp column is "time" (float64 epoch
+# seconds, non-decreasing); a chunk's rows end at its first zero time, so the row count
+# survives a restart without a separate header. A channel that had no sample in a row
+# holds its column's missing value (NaN, or the smallest integer).
+TIME_COLUMN = 'time'
+SCHEMA_FILE = 'schema.json'
+SCALAR_DTYPES = {'float': 'float64', 'int': 'int64'}
+
+
+def scalar_columns(config):
+    """{channel name: dtype} for every scalar (float/int) channel in a fifo_config dict."""
+    return {name: SCALAR_DTYPES[entry['type']] for name, entry in config.items()
+            if isinstance(entry, dict) and entry.get('type') in SCALAR_DTYPES}
+
+
+def missing_value(dtype):
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind in 'iu':
+        return np.iinfo(dtype).min if dtype.kind == 'i' else np.iinfo(dtype).max
+    raise ValueError(f"History columns must be numeric, got {dtype}")
+
+
+def _present(values, dtype):
+    if np.dtype(dtype).kind == 'f':
+        return ~np.isnan(values)
+    return values != missing_value(dtype)
+
+
+class _Chunk:
+    """The memory-mapped columns of one chunk plus its sparse time index (every index_stride-th time)."""
+
+    def __init__(self, directory, number, columns, chunk_rows, index_stride):
+        self.number = number
+        self.chunk_rows = chunk_rows
+        self.index_stride = index_stride
+        self.columns = {}
+        for name, dtype in columns.items():
+            self.add_column(directory, name, dtype)
+        self.time = self.columns[TIME_COLUMN]
+        self.rows = self._count_rows()
+        self.index = np.zeros(-(-chunk_rows // index_stride), dtype=np.float64)
+        self.index[:self._n_index()] = self.time[:self.rows:index_stride]
+
+    def add_column(self, directory, name, dtype):
+        path = os.path.join(directory, f"chunk_{self.number:06d}.{name}.col")
+        if os.path.exists(path):
+            column = np.memmap(path, dtype=dtype, mode='r+', shape=(self.chunk_rows,))
+        else:
+            column = np.memmap(path, dtype=dtype, mode='w+', shape=(self.chunk_rows,))
+            if name != TIME_COLUMN:
+                column.fill(missing_value(dtype))
+        self.columns[name] = column
+
+    def _count_rows(self):
+        # Binary search for the first unwritten (zero) time.
+        lo, hi = 0, self.chunk_rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.time[mid] > 0:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _n_index(self):
+        return -(-self.rows // self.index_stride)
+
+    @property
+    def full(self):
+        return self.rows == self.chunk_rows
+
+    @property
+    def first_time(self):
+        return float(self.time[0]) if self.rows else None
+
+    def locate(self, t, side):
+        """searchsorted over this chunk's times: the sparse index finds the block, then one block is searched."""
+        block = int(np.searchsorted(self.index[:self._n_index()], t, side=side)) - 1
+        if block < 0:
+            return 0
+        start = block * self.index_stride
+        stop = min(start + self.index_stride, self.rows)
+        return start + int(np.searchsorted(self.time[start:stop], t, side=side))
+
+    def append(self, t, values):
+        row = self.rows
+        for name, value in values.items():
+            self.columns[name][row] = value
+        # The time goes in last: it is what marks the row as written.
+        self.time[row] = t
+        if row % self.index_stride == 0:
+            self.index[row // self.index_stride] = t
+        self.rows += 1
+
+    def flush(self):
+        for column in self.columns.values():
+            column.flush()
+
+
+class HistoryStore:
+    """
+    Append-only, memory-mapped columnar history of scalar telemetry.
+
+    One fixed-dtype column per channel plus the shared "time" column, split into
+    chunk files of chunk_rows rows, so RAM use stays flat however long the
+    flight and the whole past is there again when the store is reopened. Each
+    chunk keeps a sparse in-memory index of every index_stride-th time, so a
+    range query is a bisect over chunks, one over the index and one over a
+    single block: O(log n) and a handful of pages. Rows are appended on one
+    thread (e.g. the FIFO ingest thread) and may be queried from another: a
+    row's time is written last and the row count only then advanced, so a
+    reader never sees a partial row. Pass only the channels that have a new
+    sample; the others are stored as missing and skipped by query().
+    """
+
+    def __init__(self, directory, columns, chunk_rows=1 << 20, index_stride=1024, flush_interval=1000):
+        self.directory = directory
+        self.index_stride = index_stride
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+        schema_path = os.path.join(directory, SCHEMA_FILE)
+        schema = {'columns': {}, 'chunk_rows': chunk_rows}
+        if os.path.exists(schema_path):
+            with open(schema_path, 'r') as f:
+                schema = json.load(f)
+        self.chunk_rows = schema['chunk_rows']
+        stored = schema['columns']
+        for name, dtype in columns.items():
+            if name in stored and np.dtype(stored[name]) != np.dtype(dtype):
+                raise ValueError(f"History column {name!r} is stored as {stored[name]}, not {dtype}")
+            stored.setdefault(name, np.dtype(dtype).name)
+        # New channels may be added to an existing store; older chunks then read as missing.
+        with open(schema_path, 'w') as f:
+            json.dump(schema, f, indent=2)
+        self.columns = {name: np.dtype(dtype) for name, dtype in stored.items()}
+        self._all_columns = {TIME_COLUMN: np.dtype(np.float64), **self.columns}
+        self.chunks = []
+        number = 0
+        while os.path.exists(self._time_path(number)):
+            self.chunks.append(self._open_chunk(number))
+            number += 1
+        if not self.chunks or self.chunks[-1].full:
+            self.chunks.append(self._open_chunk(len(self.chunks)))
+        self._last_time = self._latest_time()
+        self._last = {}
+        self._unflushed = 0
+
+    def _time_path(self, number):
+        return os.path.join(self.directory, f"chunk_{number:06d}.{TIME_COLUMN}.col")
+
+    def _open_chunk(self, number):
+        return _Chunk(self.directory, number, self._all_columns, self.chunk_rows, self.index_stride)
+
+    def _latest_time(self):
+        for chunk in reversed(self.chunks):
+            if chunk.rows:
+                return float(chunk.time[chunk.rows - 1])
+        return 0.0
+
+    def __len__(self):
+        return sum(chunk.rows for chunk in self.chunks)
+
+    def append(self, t, **values):
+        """Append one row at time t (epoch seconds) with the given channel values."""
+        unknown = values.keys() - self.columns.keys()
+        if unknown:
+            raise KeyError(f"Unknown history columns: {sorted(unknown)}")
+        t = max(float(t), self._last_time)  # keep the time column sorted
+        chunk = self.chunks[-1]
+        if chunk.full:
+            chunk.flush()
+            chunk = self._open_chunk(len(self.chunks))
+            self.chunks.append(chunk)
+        chunk.append(t, values)
+        self._last_time = t
+        self._last.update((name, (t, value)) for name, value in values.items())
+        self._unflushed += 1
+        if self._unflushed >= self.flush_interval:
+            self.flush()
+
+    def _spans(self, t_min, t_max):
+        # (chunk, first row, end row) for every chunk overlapping [t_min, t_max].
+        firsts = [chunk.first_time for chunk in self.chunks if chunk.rows]
+        first = max(int(np.searchsorted(firsts, t_min, side='right')) - 1, 0)
+        for chunk in self.chunks[first:len(firsts)]:
+            if chunk.first_time > t_max:
+                break
+            start, stop = chunk.locate(t_min, 'left'), chunk.locate(t_max, 'right')
+            if stop > start:
+                yield chunk, start, stop
+
+    def count(self, t_min=-np.inf, t_max=np.inf):
+        """Rows (of any channel) with t_min <= time <= t_max."""
+        return sum(stop - start for _, start, stop in self._spans(t_min, t_max))
+
+    def query(self, column, t_min=-np.inf, t_max=np.inf):
+        """(times, values) of one channel's samples with t_min <= time <= t_max, oldest first."""
+        times, values = [np.zeros(0)], [np.zeros(0, dtype=self.columns[column])]
+        for chunk_times, chunk_values in self.iter_query(column, t_min, t_max):
+            times.append(chunk_times)
+            values.append(chunk_values)
+        return np.concatenate(times), np.concatenate(values)
+
+    def iter_query(self, column, t_min=-np.inf, t_max=np.inf):
+        """query() one chunk at a time, so a long range never has to fit in memory at once."""
+        dtype = self.columns[column]
+        for chunk, start, stop in self._spans(t_min, t_max):
+            chunk_values = chunk.columns[column][start:stop]
+            present = _present(chunk_values, dtype)
+            yield chunk.time[start:stop][present], np.asarray(chunk_values[present])
+
+    def tail(self, column, n):
+        """(times, values) of a channel's newest n samples (or all, if fewer), oldest first."""
+        dtype = self.columns[column]
+        times, values = [np.zeros(0)], [np.zeros(0, dtype=dtype)]
+        found = 0
+        for chunk in reversed(self.chunks):
+            if found >= n:
+                break
+            present = np.flatnonzero(_present(chunk.columns[column][:chunk.rows], dtype))[found - n:]
+            times.insert(1, chunk.time[present])
+            values.insert(1, np.asarray(chunk.columns[column][present]))
+            found += len(present)
+        return np.concatenate(times), np.concatenate(values)
+
+    def last(self, column):
+        """(time, value) of a channel's newest sample, or None if it has none."""
+        if column not in self._last:
+            dtype = self.columns[column]
+            for chunk in reversed(self.chunks):
+                present = np.flatnonzero(_present(chunk.columns[column][:chunk.rows], dtype))
+                if len(present):
+                    row = present[-1]
+                    self._last[column] = (float(chunk.time[row]), chunk.columns[column][row].item())
+                    break
+            else:
+                return None
+        return self._last[column]
+
+    def flush(self):
+        self.chunks[-1].flush()
+        self._unflushed = 0
+
+    def close(self):
+        for chunk in self.chunks:
+            chunk.flush()
+        self.chunks = []
@@ -0,0 +1,127 @@
+import numpy as np
+from colormaps import ColorLUT
+
+BACKGROUND = -1
+OUTLINE_RGBA = (0, 0, 0, 255)
+
+
+class LabelRaster:
+    """
+    A layer view's layout rasterized once into an int32 label image.
+
+    labels[y, x] is the channel index drawn at that screen pixel, or -1 for
+    background. Shapes are given as (n, 4) x, y, w, h rects in item
+    coordinates (DetectorLayerItem.rects) with an ellipse flag each; later
+    shapes are drawn over earlier ones, and a one pixel outline is kept
+    around every shape like the vector path draws. colorize() turns a
+    per-channel color-bin vector into an RGBA image with two gathers, so the
+    cost of a frame depends on the image size only, and pick() is a single
+    array lookup. recolor() is the incremental form: it keeps the previous
+    bins and image and rewrites only the scanlines that hold a channel whose
+    bin changed. Only NumPy is used, so both can run on a worker thread.
+    """
+
+    def __init__(self, rects, ellipse, channels, n_channels, origin=(0, 0)):
+        self.origin = (int(np.floor(origin[0])), int(np.floor(origin[1])))
+        self.n_channels = n_channels
+        rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        x0 = rects[:, 0] - self.origin[0]
+        y0 = rects[:, 1] - self.origin[1]
+        width = int(np.ceil((x0 + rects[:, 2]).max())) + 1 if len(rects) else 0
+        height = int(np.ceil((y0 + rects[:, 3]).max())) + 1 if len(rects) else 0
+        self.labels = np.full((height, width), BACKGROUND, dtype=np.int32)
+        outline = np.zeros((height, width), dtype=bool)
+        # Rows [row_lo, row_hi) spanned by each channel (empty for channels not drawn here).
+        self.row_lo = np.full(n_channels, height, dtype=np.intp)
+        self.row_hi = np.zeros(n_channels, dtype=np.intp)
+        for left, top, (w, h), is_ellipse, channel in zip(x0, y0, rects[:, 2:], ellipse, channels):
+            c0, c1 = int(np.floor(left)), int(np.ceil(left + w))
+            r0, r1 = int(np.floor(top)), int(np.ceil(top + h))
+            # Pixel centres, in units of the shape's half axes from its centre.
+            dx = (np.arange(c0, c1) + 0.5 - (left + w / 2)) / (w / 2)
+            dy = (np.arange(r0, r1) + 0.5 - (top + h / 2)) / (h / 2)
+            if is_ellipse:
+                inside = dy[:, None] ** 2 + dx[None, :] ** 2 <= 1
+            else:
+                inside = (np.abs(dy[:, None]) <= 1) & (np.abs(dx[None, :]) <= 1)
+            self.labels[r0:r1, c0:c1][inside] = channel
+            self.row_lo[channel] = min(self.row_lo[channel], r0)
+            self.row_hi[channel] = max(self.row_hi[channel], r1)
+            edge = inside.copy()
+            edge[1:-1, 1:-1] &= ~(inside[:-2, 1:-1] & inside[2:, 1:-1] & inside[1:-1, :-2] & inside[1:-1, 2:])
+            outline[r0:r1, c0:c1] &= ~inside
+            outline[r0:r1, c0:c1] |= edge
+        # Gather index per screen pixel: channel, n_channels for background, n_channels + 1 for outline.
+        self.slots = np.where(self.labels >= 0, self.labels, n_channels).astype(np.intp)
+        self.slots[outline] = n_channels + 1
+        self.drawn = np.flatnonzero(self.row_hi > 0)
+        self._lut_key = None
+        self._lut = None
+        self._prev_bins = None
+        self._prev_image = None
+        self._prev_lut = None
+        self.changed_fraction = 0.0
+
+    @property
+    def shape(self):
+        return self.labels.shape
+
+    def pick(self, x, y):
+        """Channel at item coordinates (x, y), or None."""
+        col, row = int(np.floor(x)) - self.origin[0], int(np.floor(y)) - self.origin[1]
+        if 0 <= row < self.labels.shape[0] and 0 <= col < self.labels.shape[1]:
+            channel = self.labels[row, col]
+            if channel >= 0:
+                return int(channel)
+        return None
+
+    def colorize(self, bins, lut_rgba=None, out=None):
+        """(h, w, 4) uint8 RGBA image for per-channel color bins into lut_rgba (ColorLUT.rgba)."""
+        lut = self._extended_lut(ColorLUT.get().rgba if lut_rgba is None else lut_rgba)
+        slot_bins = np.empty(self.n_channels + 2, dtype=np.intp)
+        slot_bins[:self.n_channels] = bins[:self.n_channels]
+        slot_bins[self.n_channels:] = (len(lut) - 2, len(lut) - 1)
+        return np.take(lut, slot_bins[self.slots], axis=0, out=out)
+
+    def recolor(self, bins, lut_rgba=None):
+        """
+        (image, rows) for the next frame. Only scanlines holding a channel whose bin changed
+        since the previous call are rewritten, into a copy of the previous image (which may
+        still be on screen); rows lists them. If nothing changed the previous image is
+        returned again with no rows. changed_fraction is the share of this raster's
+        channels that changed.
+        """
+        bins = np.asarray(bins)[:self.n_channels]
+        lut_rgba = ColorLUT.get().rgba if lut_rgba is None else lut_rgba
+        if self._prev_bins is None or lut_rgba is not self._prev_lut:
+            self._prev_image = self.colorize(bins, lut_rgba)
+            self._prev_bins = bins.copy()
+            self._prev_lut = lut_rgba
+            self.changed_fraction = 1.0
+            return self._prev_image, np.arange(self.labels.shape[0])
+        changed = self.drawn[bins[self.drawn] != self._prev_bins[self.drawn]]
+        self.changed_fraction = len(changed) / len(self.drawn) if len(self.drawn) else 0.0
+        if not len(changed):
+            return self._prev_image, changed
+        # Mark the changed channels' row spans and recolor those rows only.
+        marks = np.zeros(self.labels.shape[0] + 1, dtype=np.int32)
+        np.add.at(marks, self.row_lo[changed], 1)
+        np.add.at(marks, self.row_hi[changed], -1)
+        rows = np.flatnonzero(np.cumsum(marks[:-1]) > 0)
+        lut = self._extended_lut(lut_rgba)
+        slot_bins = np.empty(self.n_channels + 2, dtype=np.intp)
+        slot_bins[:self.n_channels] = bins
+        slot_bins[self.n_channels:] = (len(lut) - 2, len(lut) - 1)
+        image = self._prev_image.copy()
+        image[rows] = np.take(lut, slot_bins[self.slots[rows]], axis=0)
+        self._prev_image = image
+        self._prev_bins[:] = bins
+        return image, rows
+
+    def _extended_lut(self, lut_rgba):
+        # The colormap plus a transparent background row and the outline row.
+        if self._lut_key is not lut_rgba:
+            self._lut = np.concatenate((np.asarray(lut_rgba, dtype=np.uint8),
+                                        np.array([(0, 0, 0, 0), OUTLINE_RGBA], dtype=np.uint8)))
+            self._lut_key = lut_rgba
+        return self._lut
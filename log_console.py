@@ -0,0 +1,232 @@
+import os
+import re
+import mmap
+import bisect
+from array import array
+from PyQt6.QtGui import QTextCursor
+from helper_classes import FrameClock
+
+# On-disk log layout: DIRECTORY/<prefix>_NNNNNN.log segments of UTF-8 lines, each with
+# a <prefix>_NNNNNN.idx next to it holding the byte offset of every line start as
+# native uint64 (array 'Q'). A segment is closed once it passes max_bytes; lines are
+# numbered across segments from the first line ever written.
+
+
+class _Segment:
+    def __init__(self, path, first_line):
+        self.path = path
+        self.index_path = path[:-len('.log')] + '.idx'
+        self.first_line = first_line
+        self.offsets = array('Q')
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                self.offsets.frombytes(f.read())
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        self._reindex_tail()
+
+    def _reindex_tail(self):
+        # Index lines written after the index was last saved (e.g. a crash between the two writes).
+        indexed = len(self.offsets)
+        while self.offsets and self.offsets[-1] >= self.size:
+            self.offsets.pop()
+        start = self.offsets[-1] if self.offsets else 0
+        with open(self.path, 'ab+') as f:
+            if self.size:
+                f.seek(self.size - 1)
+                if f.read(1) != b'\n':
+                    # A crash cut the last line short: end it, so the next write starts a new line.
+                    f.write(b'\n')
+                    self.size += 1
+            f.seek(start)
+            tail = f.read()
+        pos = 0
+        if self.offsets:
+            # Skip the last indexed line itself (all of the tail if it is still unterminated).
+            pos = tail.find(b'\n') + 1 or len(tail)
+        while pos < len(tail):
+            self.offsets.append(start + pos)
+            end = tail.find(b'\n', pos)
+            pos = len(tail) if end < 0 else end + 1
+        if len(self.offsets) != indexed:
+            with open(self.index_path, 'wb') as f:
+                self.offsets.tofile(f)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def read(self, start, stop):
+        """Lines start..stop-1 of this segment (segment-local numbers)."""
+        if start >= stop:
+            return []
+        begin = self.offsets[start]
+        end = self.offsets[stop] if stop < len(self.offsets) else self.size
+        with open(self.path, 'rb') as f:
+            f.seek(begin)
+            data = f.read(end - begin)
+        return data.decode('utf-8', errors='replace').rstrip('\n').split('\n')
+
+
+class RotatingLog:
+    """
+    The full text log of a flight on disk, in segments of at most about max_bytes.
+
+    write_lines() appends a batch with one write per file. Every segment keeps
+    the byte offset of each line in an index file (loaded into memory as a
+    uint64 array, 8 bytes per line), so reading any range of lines for
+    scroll-back is one seek, and search() maps each regex match in a
+    memory-mapped segment to its line with a bisect. With max_files set, the
+    oldest segments are deleted beyond that count; by default all are kept.
+    """
+
+    def __init__(self, directory, prefix='log', max_bytes=64 << 20, max_files=None):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+        pattern = re.compile(rf'{re.escape(prefix)}_(\d{{6}})\.log$')
+        numbers = sorted(int(m.group(1)) for m in map(pattern.match, os.listdir(directory)) if m)
+        self.segments = []
+        self._next_number = 0
+        first_line = 0
+        for number in numbers:
+            segment = _Segment(self._path(number), first_line)
+            self.segments.append(segment)
+            first_line += len(segment)
+            self._next_number = number + 1
+        if not self.segments:
+            self._rotate()
+
+    def _path(self, number):
+        return os.path.join(self.directory, f"{self.prefix}_{number:06d}.log")
+
+    def _rotate(self):
+        first_line = len(self)
+        self.segments.append(_Segment(self._path(self._next_number), first_line))
+        self._next_number += 1
+        if self.max_files is not None:
+            while len(self.segments) > self.max_files:
+                old = self.segments.pop(0)
+                for path in (old.path, old.index_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    @property
+    def first_line(self):
+        """Number of the oldest line still on disk."""
+        return self.segments[0].first_line
+
+    def __len__(self):
+        last = self.segments[-1] if self.segments else None
+        return last.first_line + len(last) if last is not None else 0
+
+    def write_lines(self, lines):
+        if self.segments[-1].size >= self.max_bytes:
+            self._rotate()
+        segment = self.segments[-1]
+        offsets = array('Q')
+        chunks = []
+        size = segment.size
+        for line in lines:
+            data = line.replace('\n', ' ').encode('utf-8') + b'\n'
+            offsets.append(size)
+            chunks.append(data)
+            size += len(data)
+        with open(segment.path, 'ab') as f:
+            f.write(b''.join(chunks))
+        with open(segment.index_path, 'ab') as f:
+            offsets.tofile(f)
+        segment.offsets.extend(offsets)
+        segment.size = size
+
+    def lines(self, start, stop):
+        """Lines with numbers in [start, stop), oldest first."""
+        start, stop = max(start, self.first_line), min(stop, len(self))
+        firsts = [segment.first_line for segment in self.segments]
+        result = []
+        i = max(bisect.bisect_right(firsts, start) - 1, 0)
+        while start < stop and i < len(self.segments):
+            segment = self.segments[i]
+            local_stop = min(stop - segment.first_line, len(segment))
+            result += segment.read(start - segment.first_line, local_stop)
+            start = segment.first_line + local_stop
+            i += 1
+        return result
+
+    def search(self, pattern, limit=100, before=None):
+        """
+        (line number, text) of up to `limit` lines matching the regex `pattern`, newest
+        first, starting below line number `before` (default: the end of the log).
+        """
+        regex = re.compile(pattern.encode('utf-8') if isinstance(pattern, str) else pattern)
+        before = len(self) if before is None else before
+        found = []
+        for segment in reversed(self.segments):
+            if segment.first_line >= before or not segment.size:
+                continue
+            end = segment.offsets[before - segment.first_line] if before - segment.first_line < len(segment) else segment.size
+            with open(segment.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                matched = []
+                for match in regex.finditer(data, 0, end):
+                    line = bisect.bisect_right(segment.offsets, match.start()) - 1
+                    if not matched or matched[-1] != line:
+                        matched.append(line)
+            for line in reversed(matched):
+                found.append((segment.first_line + line, segment.read(line, line + 1)[0]))
+                if len(found) >= limit:
+                    return found
+        return found
+
+
+class LogConsole:
+    """
+    Feeds a read-only QTextEdit/QPlainTextEdit from a message stream at frame-clock rate.
+
+    write() only queues the line. Once per tick the queued lines go to the
+    RotatingLog (if any) and are appended to the document in one cursor insert,
+    which keeps at most max_blocks lines; older ones are only on disk, where
+    search() and scrollback() reach the whole flight. The view follows new
+    lines only while it is scrolled to the bottom. `stats` is the source's
+    ChannelStats, for paint latency.
+    """
+
+    def __init__(self, text_edit, max_blocks=5000, log=None, stats=None, name='log console'):
+        self.text_edit = text_edit
+        self.max_blocks = max_blocks
+        self.log = log
+        self.stats = stats
+        text_edit.document().setMaximumBlockCount(max_blocks)
+        self._pending = []
+        self.render_target = FrameClock.instance().register(self.flush, name=name)
+        text_edit.destroyed.connect(lambda: FrameClock.instance().unregister(self.render_target))
+
+    def write(self, line):
+        self._pending.append(str(line))
+        self.render_target.mark_dirty()
+
+    def flush(self):
+        """Frame clock callback: append everything written since the last tick."""
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        if self.log is not None:
+            self.log.write_lines(lines)
+        document = self.text_edit.document()
+        bar = self.text_edit.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum()
+        text = '\n'.join(lines[-self.max_blocks:])
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text if document.isEmpty() else '\n' + text)
+        if at_bottom:
+            bar.setValue(bar.maximum())
+        if self.stats is not None:
+            self.stats.painted(lines[-1])
+
+    def search(self, pattern, limit=100, before=None):
+        """Matching lines of the whole on-disk log, newest first (empty without a log)."""
+        return self.log.search(pattern, limit, before) if self.log is not None else []
+
+    def scrollback(self, start, stop):
+        """Lines [start, stop) of the whole on-disk log (empty without a log)."""
+        return self.log.lines(start, stop) if self.log is not None else []
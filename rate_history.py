@@ -0,0 +1,285 @@
+import numpy as np
+from ring_series import RingSeries
+
+
+class _Level:
+    """
+    Growable (n, 2) time and value arrays: each bin's extremes as two points in time order.
+    A rolling level keeps only its last two bins, which is all merging needs. With
+    max_bins, the oldest half of the bins is discarded whenever a level grows past it
+    (an even number, so the pairing of the remaining bins doesn't change).
+    """
+
+    def __init__(self, capacity=1024, rolling=False, max_bins=None):
+        self.rolling = rolling
+        self.max_bins = None if rolling or max_bins is None else max(max_bins, 4)
+        capacity = 2 if rolling else capacity
+        self.t = np.empty((capacity, 2), dtype=np.float64)
+        self.v = np.empty((capacity, 2), dtype=np.float64)
+        self.n = 0
+        self.dropped = 0  # bins discarded from the front
+
+    def row(self, i):
+        return i % 2 if self.rolling else i
+
+    def push(self, t, v):
+        if self.n == len(self.t) and not self.rolling:
+            self.t = np.concatenate((self.t, np.empty_like(self.t)))
+            self.v = np.concatenate((self.v, np.empty_like(self.v)))
+        self.t[self.row(self.n)] = t
+        self.v[self.row(self.n)] = v
+        self.n += 1
+        self._trim()
+
+    def extend(self, t, v):
+        """Push complete (n, 2) arrays of bins."""
+        n = len(t)
+        if self.rolling:
+            for i in range(max(n - 2, 0), n):
+                self.t[self.row(self.n + i)], self.v[self.row(self.n + i)] = t[i], v[i]
+        else:
+            if self.max_bins is not None and self.n + n > self.max_bins:
+                # Trim before copying (old bins first, then new ones), so the arrays don't grow.
+                drop = self.n + n - self.max_bins // 2
+                drop -= drop % 2
+                kept = max(self.n - drop, 0)
+                self.t[:kept], self.v[:kept] = self.t[self.n - kept:self.n], self.v[self.n - kept:self.n]
+                skip = drop - (self.n - kept)
+                t, v = t[skip:], v[skip:]
+                n = len(t)
+                self.n = kept
+                self.dropped += drop
+            if self.n + n > len(self.t):
+                capacity = 1 << int(self.n + n).bit_length()
+                self.t = np.concatenate((self.t[:self.n], np.empty((capacity - self.n, 2))))
+                self.v = np.concatenate((self.v[:self.n], np.empty((capacity - self.n, 2))))
+            self.t[self.n:self.n + n], self.v[self.n:self.n + n] = t, v
+        self.n += n
+
+    def _trim(self):
+        if self.max_bins is None or self.n <= self.max_bins:
+            return
+        drop = self.n - self.max_bins // 2
+        drop -= drop % 2
+        self.t[:self.n - drop] = self.t[drop:self.n]
+        self.v[:self.n - drop] = self.v[drop:self.n]
+        self.n -= drop
+        self.dropped += drop
+
+    def covers(self, t):
+        """Whether the level still has its bins from time t on."""
+        return not self.dropped or self.t[0, 0] <= t
+
+    @property
+    def starts(self):
+        return self.t[:self.n, 0]
+
+
+def _merge(t_a, v_a, t_b, v_b):
+    # Min and max of two adjacent bins (a before b), as two points in time order.
+    a_lo, b_lo = int(v_a[1] < v_a[0]), int(v_b[1] < v_b[0])
+    lo = (t_a[a_lo], v_a[a_lo]) if v_a[a_lo] <= v_b[b_lo] else (t_b[b_lo], v_b[b_lo])
+    hi = (t_a[1 - a_lo], v_a[1 - a_lo]) if v_a[1 - a_lo] >= v_b[1 - b_lo] else (t_b[1 - b_lo], v_b[1 - b_lo])
+    if hi[0] < lo[0]:
+        lo, hi = hi, lo
+    return (lo[0], hi[0]), (lo[1], hi[1])
+
+
+def _merge_pairs(t, v):
+    # _merge of bins (0, 1), (2, 3), ... of (n, 2) arrays, vectorized.
+    m = len(t) // 2
+    t_a, v_a, t_b, v_b = t[0:2 * m:2], v[0:2 * m:2], t[1:2 * m:2], v[1:2 * m:2]
+    rows = np.arange(m)
+    a_lo, b_lo = (v_a[:, 1] < v_a[:, 0]).astype(np.intp), (v_b[:, 1] < v_b[:, 0]).astype(np.intp)
+    take_a = v_a[rows, a_lo] <= v_b[rows, b_lo]
+    lo_t = np.where(take_a, t_a[rows, a_lo], t_b[rows, b_lo])
+    lo_v = np.where(take_a, v_a[rows, a_lo], v_b[rows, b_lo])
+    take_a = v_a[rows, 1 - a_lo] >= v_b[rows, 1 - b_lo]
+    hi_t = np.where(take_a, t_a[rows, 1 - a_lo], t_b[rows, 1 - b_lo])
+    hi_v = np.where(take_a, v_a[rows, 1 - a_lo], v_b[rows, 1 - b_lo])
+    swap = hi_t < lo_t
+    return (np.stack((np.where(swap, hi_t, lo_t), np.where(swap, lo_t, hi_t)), axis=1),
+            np.stack((np.where(swap, hi_v, lo_v), np.where(swap, lo_v, hi_v)), axis=1))
+
+
+class MinMaxPyramid:
+    """
+    Peak-preserving min/max decimation of a whole (time, value) history, built as samples arrive.
+
+    levels[k] holds one bin per 2**(k + 1) consecutive samples, stored as the
+    bin's minimum and maximum as two points in time order. Level 0 is just the
+    samples paired up, so it is lossless; every second completed bin of a level
+    is merged with its neighbour into the next level, so append() costs O(1)
+    amortized and the whole pyramid is about twice the size of the raw data.
+    query() serves a time range from the coarsest level that still gives about
+    max_points points, so a spike is always drawn no matter how far out the
+    view is zoomed. Times must be non-decreasing.
+
+    Levels below base_level are not kept (only the bins still waiting for a
+    partner), which divides the memory by 2**base_level; a caller with the raw
+    samples at hand serves such fine ranges from those instead. With max_bins,
+    every level keeps at most that many of its newest bins, so memory grows only
+    with the number of levels (log2 of the sample count); a range older than a
+    level's oldest bin is served from the finest coarser level that still has it.
+    """
+
+    def __init__(self, base_level=0, max_bins=None):
+        self.base_level = base_level
+        self.max_bins = max_bins
+        self.levels = []
+        self.count = 0
+        self._odd = None  # the newest sample, while it has no partner yet
+
+    def __len__(self):
+        return self.count
+
+    def append(self, t, value):
+        self.count += 1
+        if self._odd is None:
+            self._odd = (float(t), float(value))
+            return
+        (t0, v0), self._odd = self._odd, None
+        bin_t, bin_v = (t0, float(t)), (v0, float(value))
+        k = 0
+        while True:
+            if k == len(self.levels):
+                self.levels.append(_Level(rolling=k < self.base_level, max_bins=self.max_bins))
+            level = self.levels[k]
+            level.push(bin_t, bin_v)
+            if level.n % 2:
+                return
+            first, second = level.row(level.n - 2), level.row(level.n - 1)
+            bin_t, bin_v = _merge(level.t[first], level.v[first], level.t[second], level.v[second])
+            k += 1
+
+    def extend(self, times, values):
+        """Append many samples, built into the levels with whole-array merges (same result as append())."""
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(times):
+            return
+        self.count += len(times)
+        if self._odd is not None:
+            times = np.concatenate(((self._odd[0],), times))
+            values = np.concatenate(((self._odd[1],), values))
+            self._odd = None
+        n = len(times)
+        if n % 2:
+            self._odd = (float(times[-1]), float(values[-1]))
+        t, v = times[:n - n % 2].reshape(-1, 2), values[:n - n % 2].reshape(-1, 2)
+        k = 0
+        while len(t):
+            if k == len(self.levels):
+                self.levels.append(_Level(rolling=k < self.base_level, max_bins=self.max_bins))
+            level = self.levels[k]
+            if level.n % 2:
+                # The level's last bin is still waiting for a partner: the first new one.
+                last = level.row(level.n - 1)
+                pending_t, pending_v = level.t[last:last + 1].copy(), level.v[last:last + 1].copy()
+                level.extend(t, v)
+                t, v = np.concatenate((pending_t, t)), np.concatenate((pending_v, v))
+            else:
+                level.extend(t, v)
+            # An odd bin left over stays in the level until the next batch.
+            t, v = _merge_pairs(t, v)
+            k += 1
+
+    def _tail(self, k):
+        # The newest samples not yet covered by a complete bin of level k, coarsest first.
+        times, values = [], []
+        for level in reversed(self.levels[:k]):
+            if level.n % 2:
+                times.append(level.t[level.row(level.n - 1)])
+                values.append(level.v[level.row(level.n - 1)])
+        if self._odd is not None:
+            times.append(self._odd[:1])
+            values.append(self._odd[1:])
+        return times, values
+
+    def query(self, t_min, t_max, max_points):
+        """
+        (times, values) covering [t_min, t_max] with about max_points points or fewer
+        (2 per bin), plus one bin beyond each end so the curve runs off the view.
+        """
+        if len(self.levels) <= self.base_level:
+            # Too few samples for a kept level: the pending bins cover everything.
+            times, values = self._tail(len(self.levels))
+            return (np.concatenate([np.zeros(0)] + [np.asarray(t, dtype=np.float64) for t in times]),
+                    np.concatenate([np.zeros(0)] + [np.asarray(v, dtype=np.float64) for v in values]))
+        k = min(max(self.level_for(t_min, t_max, max_points), self.base_level), len(self.levels) - 1)
+        k = self._covering(k, t_min)
+        level = self.levels[k]
+        starts = level.starts
+        lo = max(int(np.searchsorted(starts, t_min, side='right')) - 1, 0)
+        hi = min(int(np.searchsorted(starts, t_max, side='right')) + 1, level.n)
+        times, values = [level.t[lo:hi].ravel()], [level.v[lo:hi].ravel()]
+        if hi == level.n:
+            tail_t, tail_v = self._tail(k)
+            times += tail_t
+            values += tail_v
+        return np.concatenate(times), np.concatenate(values)
+
+    def _covering(self, k, t):
+        # The first level from k up that still has its bins from time t on (else the coarsest).
+        while k < len(self.levels) - 1 and not self.levels[k].covers(t):
+            k += 1
+        return k
+
+    def level_for(self, t_min, t_max, max_points):
+        """The level query() would want for this range: 0 means raw samples would do."""
+        if len(self.levels) <= self.base_level:
+            return 0
+        # Count the samples in the range on the finest kept level that still covers it.
+        k = self._covering(self.base_level, t_min)
+        starts = self.levels[k].starts
+        bins = np.searchsorted(starts, t_max, side='right') - np.searchsorted(starts, t_min, side='left')
+        samples = int(bins) << (k + 1)
+        return int(np.ceil(np.log2(max(samples / max(max_points, 2), 1))))
+
+
+class RateHistory:
+    """
+    A rate stream for plotting: the newest `recent` samples in a RingSeries and the whole
+    history in a MinMaxPyramid. visible() hands out a copy of the raw ring samples when the
+    range is recent and sparse enough to draw as is, and the pyramid's decimation otherwise.
+    The pyramid keeps only levels from base_level up, each with at most `max_bins` bins, so
+    its memory stays bounded however long the stream runs; older history is kept at
+    coarser resolution only.
+
+    With a HistoryStore, the pyramid is built from the past of `column` on creation, one
+    chunk at a time, and ranges finer than base_level are read back from the store. Only
+    the newest `recent` samples are loaded into the ring. Samples are written to the store
+    by its owner, not by append(). Without a store, such fine ranges are drawn at the
+    resolution of base_level once they are older than the ring.
+    """
+
+    def __init__(self, recent=20000, store=None, column=None, base_level=5, max_bins=1 << 14):
+        self.recent = RingSeries(recent)
+        self.store = store
+        self.column = column
+        self.pyramid = MinMaxPyramid(base_level, max_bins)
+        if store is not None:
+            for times, values in store.iter_query(column):
+                self.pyramid.extend(times, values)
+            self.recent.extend(*store.tail(column, self.recent.capacity))
+
+    def __len__(self):
+        return len(self.pyramid)
+
+    def append(self, t, value):
+        self.recent.append(t, value)
+        self.pyramid.append(t, value)
+
+    def last(self):
+        return self.recent.last()
+
+    def visible(self, t_min, t_max, max_points):
+        """(times, values) to draw for the x range [t_min, t_max] on a plot max_points / 2 pixels wide."""
+        if len(self.recent) and t_min >= self.recent.times[0]:
+            times, values = self.recent.since(t_min)
+            if len(times) <= max_points:
+                # The ring views change under the next append; the plot keeps what it is given.
+                return times.copy(), values.copy()
+        if self.store is not None and self.pyramid.level_for(t_min, t_max, max_points) < self.pyramid.base_level:
+            return self.store.query(self.column, t_min, t_max)
+        return self.pyramid.query(t_min, t_max, max_points)
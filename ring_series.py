@@ -0,0 +1,85 @@
+import numpy as np
+
+
+class RingSeries:
+    """
+    The newest `capacity` (time, value) samples of a scalar stream, with O(1) append.
+
+    Every sample is stored twice, at slot i and i + capacity of buffers twice
+    the capacity long, so the retained samples are always one contiguous
+    slice: times and values are zero-copy, read-only views, oldest first.
+    Later appends overwrite them in place, so copy them before keeping them
+    past the next append (PlotDataItem.setData keeps its arrays).
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError(f"RingSeries capacity must be at least 1, got {capacity}")
+        self.capacity = int(capacity)
+        self._t = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._v = np.zeros(2 * self.capacity, dtype=dtype)
+        self._next = 0  # slot the next sample goes to
+        self.count = 0
+        self.total = 0  # samples appended since creation or clear()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, t, value):
+        i, j = self._next, self._next + self.capacity
+        self._t[i] = self._t[j] = t
+        self._v[i] = self._v[j] = value
+        self._next = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.total += 1
+
+    def extend(self, times, values):
+        """Append a batch of samples; only the last `capacity` of them can be kept."""
+        times = np.asarray(times, dtype=np.float64)
+        self.total += len(times)
+        times = times[-self.capacity:]
+        values = np.asarray(values)[-self.capacity:]
+        n = len(times)
+        if not n:
+            return
+        slots = (self._next + np.arange(n)) % self.capacity
+        self._t[slots] = self._t[slots + self.capacity] = times
+        self._v[slots] = self._v[slots + self.capacity] = values
+        self._next = int(slots[-1] + 1) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def _span(self):
+        end = self._next + self.capacity
+        return end - self.count, end
+
+    def _view(self, buffer, start, stop):
+        view = buffer[start:stop]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def times(self):
+        return self._view(self._t, *self._span())
+
+    @property
+    def values(self):
+        return self._view(self._v, *self._span())
+
+    def last(self):
+        """(time, value) of the newest sample, or None if empty."""
+        if not self.count:
+            return None
+        i = self._next + self.capacity - 1
+        return float(self._t[i]), self._v[i]
+
+    def since(self, t_min):
+        """(times, values) views of the samples with time >= t_min (times must be non-decreasing)."""
+        start, stop = self._span()
+        start += int(np.searchsorted(self._t[start:stop], t_min, side='left'))
+        return self._view(self._t, start, stop), self._view(self._v, start, stop)
+
+    def clear(self):
+        self._next = 0
+        self.count = 0
+        self.total = 0
@@ -0,0 +1,232 @@
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from fifo_protocol import Frame, MAX_DIMS
+
+# Shared-memory layout:
+#   header   : 16 x int64 (see HDR_* indices) followed by a 16-byte dtype string
+#   slot_gen : n_slots x int64   per-slot seqlock counter, odd while being written
+#   slot_seq : n_slots x int64   frame sequence number stored in the slot
+#   slot_time: n_slots x float64 writer timestamp of the slot
+#   data     : n_slots x frame bytes, 64-byte aligned
+RING_MAGIC = 0x41445054524E4731  # 'ADPTRNG1'
+HDR_MAGIC, HDR_NSLOTS, HDR_NDIM, HDR_SHAPE, HDR_HEAD = 0, 1, 2, 3, 3 + MAX_DIMS
+HDR_CREATED = HDR_HEAD + 1  # creation id (time_ns) of this ring, new for every writer start
+HEADER_INTS = 16
+DTYPE_BYTES = 16
+ALIGN = 64
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class ShmFrameRing:
+    """
+    Ring of preallocated detector frames in POSIX shared memory.
+
+    The writer fills the next slot in place (begin_write/commit) and then
+    publishes its sequence number as the ring head. Each slot is guarded by a
+    seqlock counter that is odd while the slot is being written, so a reader
+    can tell whether the data it looked at was overwritten underneath it.
+    latest() hands out a zero-copy view of the newest complete slot; it stays
+    valid until the writer laps the ring (n_slots - 1 further frames), which
+    is_valid() checks. read_latest() copies and retries if the read was torn.
+
+    A restarted writer replaces the segment: the old one is marked dead (alive
+    turns False for readers still mapping it) and the new one gets a new
+    `created` id, which created_id() reads by name to spot a replacement.
+    """
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        buf = shm.buf
+        self._header = np.ndarray((HEADER_INTS,), dtype=np.int64, buffer=buf)
+        if self._header[HDR_MAGIC] != RING_MAGIC:
+            raise ValueError(f"Shared memory {shm.name!r} is not a frame ring")
+        n_slots = int(self._header[HDR_NSLOTS])
+        ndim = int(self._header[HDR_NDIM])
+        self.shape = tuple(int(x) for x in self._header[HDR_SHAPE:HDR_SHAPE + ndim])
+        offset = HEADER_INTS * 8
+        self.dtype = np.dtype(bytes(buf[offset:offset + DTYPE_BYTES]).rstrip(b'\x00').decode('ascii'))
+        offset += DTYPE_BYTES
+        self.n_slots = n_slots
+        self.created = int(self._header[HDR_CREATED])
+        self._slot_gen = np.ndarray((n_slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8 * n_slots
+        self._slot_seq = np.ndarray((n_slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8 * n_slots
+        self._slot_time = np.ndarray((n_slots,), dtype=np.float64, buffer=buf, offset=offset)
+        offset = _aligned(offset + 8 * n_slots)
+        self._data = np.ndarray((n_slots,) + self.shape, dtype=self.dtype, buffer=buf, offset=offset)
+        self._writing = None
+
+    @classmethod
+    def create(cls, name, shape, dtype=np.float32, n_slots=8):
+        """Create (or replace) a ring; used by the writer process."""
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        if len(shape) > MAX_DIMS:
+            raise ValueError(f"Frames support at most {MAX_DIMS} dimensions")
+        meta = HEADER_INTS * 8 + DTYPE_BYTES + 24 * n_slots
+        size = _aligned(meta) + n_slots * int(np.prod(shape)) * dtype.itemsize
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            pass
+        else:
+            if stale.size >= HEADER_INTS * 8:
+                cls._mark_dead(stale)
+            stale.close()
+            stale.unlink()
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_INTS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[HDR_NSLOTS] = n_slots
+        header[HDR_NDIM] = len(shape)
+        header[HDR_SHAPE:HDR_SHAPE + len(shape)] = shape
+        header[HDR_HEAD] = -1
+        header[HDR_CREATED] = time.time_ns()
+        dtype_str = dtype.str.encode('ascii')
+        shm.buf[HEADER_INTS * 8:HEADER_INTS * 8 + DTYPE_BYTES] = dtype_str.ljust(DTYPE_BYTES, b'\x00')
+        np.ndarray((n_slots * 3,), dtype=np.int64, buffer=shm.buf, offset=HEADER_INTS * 8 + DTYPE_BYTES)[:] = 0
+        header[HDR_MAGIC] = RING_MAGIC  # written last: the ring is now valid
+        del header
+        return cls(shm, owner=True)
+
+    @staticmethod
+    def _mark_dead(shm):
+        header = np.ndarray((HEADER_INTS,), dtype=np.int64, buffer=shm.buf)
+        header[HDR_MAGIC] = 0
+        del header
+
+    @staticmethod
+    def _open(name):
+        shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the writer's segment when they exit.
+        try:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+    @classmethod
+    def attach(cls, name):
+        """Map an existing ring; raises FileNotFoundError if the writer hasn't created it."""
+        shm = cls._open(name)
+        try:
+            return cls(shm, owner=False)
+        except ValueError:
+            shm.close()
+            raise
+
+    @classmethod
+    def created_id(cls, name):
+        """Creation id of the ring currently published under `name`, or None if there is none."""
+        try:
+            shm = cls._open(name)
+        except FileNotFoundError:
+            return None
+        try:
+            if shm.size < HEADER_INTS * 8:
+                return None
+            header = np.ndarray((HEADER_INTS,), dtype=np.int64, buffer=shm.buf)
+            created = int(header[HDR_CREATED]) if header[HDR_MAGIC] == RING_MAGIC else None
+            del header
+            return created
+        finally:
+            shm.close()
+
+    @property
+    def alive(self):
+        """False once the writer has replaced or closed this ring."""
+        return self._header is not None and int(self._header[HDR_MAGIC]) == RING_MAGIC
+
+    @property
+    def head(self):
+        """Sequence number of the newest committed frame, or -1 if none yet."""
+        return int(self._header[HDR_HEAD])
+
+    # Writer side
+
+    def begin_write(self):
+        """Return a writable view of the next slot; fill it in place, then call commit()."""
+        seq = self.head + 1
+        slot = seq % self.n_slots
+        self._slot_gen[slot] += 1  # odd: slot is being written
+        self._writing = (seq, slot)
+        return self._data[slot]
+
+    def commit(self, timestamp=None):
+        seq, slot = self._writing
+        self._slot_seq[slot] = seq
+        self._slot_time[slot] = time.time() if timestamp is None else timestamp
+        self._slot_gen[slot] += 1  # even again: slot is complete
+        self._header[HDR_HEAD] = seq
+        self._writing = None
+        return seq
+
+    def write(self, array, timestamp=None):
+        self.begin_write()[...] = array
+        return self.commit(timestamp)
+
+    # Reader side
+
+    def latest(self):
+        """
+        Return a zero-copy Frame view of the newest complete slot, or None.
+        The frame's `seq` and `timestamp` come from the slot metadata.
+        """
+        for _ in range(self.n_slots):
+            seq = self.head
+            if seq < 0:
+                return None
+            slot = seq % self.n_slots
+            gen = int(self._slot_gen[slot])
+            if gen % 2 or self._slot_seq[slot] != seq:
+                continue  # lapped while we looked; try the new head
+            frame = self._data[slot].view(Frame)
+            frame.seq = seq
+            frame.timestamp = float(self._slot_time[slot])
+            frame._ring_gen = gen
+            frame._ring_created = self.created
+            if int(self._slot_gen[slot]) == gen:
+                return frame
+        return None
+
+    def is_valid(self, frame):
+        """True if a frame returned by latest() has not been overwritten since."""
+        if getattr(frame, '_ring_created', self.created) != self.created or not self.alive:
+            return False
+        slot = frame.seq % self.n_slots
+        return int(self._slot_gen[slot]) == frame._ring_gen and self._slot_seq[slot] == frame.seq
+
+    def read_latest(self, out=None, retries=10):
+        """Copy the newest complete frame into `out` (allocated if None); None if unavailable."""
+        for _ in range(retries):
+            frame = self.latest()
+            if frame is None:
+                return None
+            if out is None:
+                out = np.empty(self.shape, dtype=self.dtype).view(Frame)
+            np.copyto(out, frame)
+            if self.is_valid(frame):
+                if isinstance(out, Frame):
+                    out.seq = frame.seq
+                    out.timestamp = frame.timestamp
+                return out
+        return None
+
+    def close(self):
+        if self.owner and self._header is not None:
+            self._header[HDR_MAGIC] = 0  # tell readers still attached that the ring is gone
+        # Drop our numpy views first so the mapping can be released.
+        self._header = self._slot_gen = self._slot_seq = self._slot_time = self._data = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # frames handed out are still alive; the mapping goes away with them
+        if self.owner:
+            self._shm.unlink()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules under test live at the top of the repository, next to the GUI scripts.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
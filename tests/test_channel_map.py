@@ -0,0 +1,97 @@
+import copy
+import json
+import os
+
+import numpy as np
+import pytest
+
+from channel_map import COMPONENTS, ChannelMap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def config():
+    with open(os.path.join(ROOT, 'sensor_config.json')) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='module')
+def cmap(config):
+    return ChannelMap(config)
+
+
+def legacy_maps(config):
+    """The list-based generateDataMap / mixedDataIndicies the map replaced (flattened where they nested)."""
+    def odd_even(length, offset):
+        numbers = list(range(offset, offset + length))
+        return [n for n in numbers if n % 2] + [n for n in numbers if not n % 2]
+
+    def top_first(cols, offset):
+        return [val for pair in zip(range(offset, offset + cols), range(offset + cols, offset + 2 * cols))
+                for val in pair]
+
+    cols = config["hodo_front"]["num_cols"]
+    hodo = cols * config["hodo_front"]["num_rows"]
+    wls = config["wls_front"]["num_cols"]
+    tail = config["tail_counters"]["num_cols"] * config["tail_counters"]["num_rows"]
+    per_layer = 2 * hodo + 2 * wls + 2 + tail
+    data_map, index_map = {}, []
+    for layer in range(config["icc"]["num_layers"]):
+        hodo1 = layer * per_layer
+        hodo2 = hodo1 + hodo
+        wls1 = hodo2 + hodo
+        csi = wls1 + wls
+        wls2 = csi + 2
+        tail_offset = wls2 + wls
+        end = tail_offset + tail
+        data_map[layer] = {
+            0: {'hodo_front': odd_even(hodo, hodo1), 'hodo_side': odd_even(hodo, hodo2)[-2:],
+                'wls_side': [csi - 1], 'csi': [csi], 'wls_front': list(range(wls2, tail_offset)),
+                'tail': list(range(tail_offset, end))},
+            1: {'hodo_side': odd_even(hodo, hodo1)[-2:], 'hodo_front': odd_even(hodo, hodo2),
+                'wls_front': list(range(wls1, csi)), 'csi': [csi + 1], 'wls_side': [wls2],
+                'tail': list(range(tail_offset, end))},
+        }
+        index_map += top_first(cols, hodo1) + top_first(cols, hodo2) + list(range(wls1, end))
+    return data_map, index_map
+
+
+def test_matches_the_legacy_lists(config, cmap):
+    data_map, index_map = legacy_maps(config)
+    assert cmap.data_map() == data_map
+    assert cmap.display_order.tolist() == index_map
+    assert sorted(index_map) == list(range(cmap.total_pixels))
+
+
+def test_gathers_are_shared_and_read_only(config, cmap):
+    gather = cmap.gather(1, True, 'hodo_front')
+    assert gather is cmap.indices[(1, 1, 'hodo_front')]
+    assert gather.dtype == np.int32 and gather.flags.c_contiguous
+    for array in (gather, cmap.display_order, cmap.axis_lut):
+        with pytest.raises(ValueError):
+            array[0] = 0
+    assert ChannelMap.for_config(copy.deepcopy(config)) is ChannelMap.for_config(config)
+    changed = copy.deepcopy(config)
+    changed["icc"]["num_layers"] += 1
+    assert ChannelMap.for_config(changed).num_layers == cmap.num_layers + 1
+
+
+def test_lookup_inverts_the_gathers(cmap):
+    for (layer, rotated, component), gather in cmap.indices.items():
+        for position, pixel in enumerate(gather):
+            assert cmap.lookup(pixel, rotated) == (layer, rotated, component, position)
+    drawn = {(rotated, int(pixel)) for (_, rotated, _), gather in cmap.indices.items() for pixel in gather}
+    for rotated in (0, 1):
+        for pixel in range(cmap.total_pixels):
+            assert (cmap.lookup(pixel, rotated) is not None) == ((rotated, pixel) in drawn)
+    assert set(cmap.component_of.ravel()) <= set(range(-1, len(COMPONENTS)))
+
+
+def test_axis_lut_rows(cmap):
+    for layer in range(cmap.num_layers):
+        for rotated in (0, 1):
+            row = cmap.axis_lut[layer, rotated]
+            ids = np.concatenate((cmap.gather(layer, rotated, 'hodo_front'), cmap.gather(layer, rotated, 'wls_front')))
+            np.testing.assert_array_equal(row[:len(ids)], ids)
+            assert np.all(row[len(ids):] == -1)
@@ -0,0 +1,22 @@
+import numpy as np
+
+from colormaps import ColorLUT, ColorScale
+
+
+def test_color_scale_modes():
+    intensities = np.linspace(0, 10, 101)
+    # 'frame' is the per-item mapping the layer views always used: int(255 * norm).
+    norm = (intensities - 0) / (10 - 0 + 1e-6)
+    np.testing.assert_array_equal(ColorScale('frame').bins(intensities), (255 * norm).astype(np.intp))
+    fixed = ColorScale('fixed', vmin=0, vmax=5).bins(intensities)
+    assert fixed[0] == 0 and np.all(fixed[51:] == 255)  # clipped above vmax
+    out = np.empty(101, dtype=np.intp)
+    assert ColorScale('percentile').bins(intensities, out=out) is out
+
+
+def test_color_lut_is_shared():
+    lut = ColorLUT.get('blue-red', 256)
+    assert ColorLUT.get('blue-red', 256) is lut
+    assert lut.rgba.shape == (256, 4) and len(lut) == 256
+    # Blue at the bottom, red at the top, like the per-item colours.
+    assert tuple(lut.rgba[0][:3]) == (0, 0, 255) and tuple(lut.rgba[-1][:3]) == (255, 0, 0)
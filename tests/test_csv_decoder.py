@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from fifo_protocol import CsvDecoder, stamp_line
+from hardware.sim_fifo_writer import N_ELEMENTS, NUM_PIXELS, format_frame, generate_simulation_data
+
+
+def feed(decoder, raw, chunk):
+    """Hand `raw` to the decoder at most `chunk` bytes per read, as the ingest loop does."""
+    arrays = []
+    pos = 0
+    while pos < len(raw):
+        buf = decoder.next_buffer()
+        n = min(len(buf), chunk, len(raw) - pos)
+        buf[:n] = raw[pos:pos + n]
+        pos += n
+        arrays += decoder.advance(n)
+    return arrays
+
+
+class Errors:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self):
+        self.count += 1
+
+
+@pytest.mark.parametrize('chunk', [7, 4096, 1 << 20])
+def test_writer_frames_round_trip(chunk):
+    frames = [generate_simulation_data() for _ in range(3)]
+    raw = b''.join((format_frame(frame) + '\n').encode() for frame in frames)
+    decoder = CsvDecoder(np.float32, (NUM_PIXELS, N_ELEMENTS), chunk_size=1024)
+    arrays = feed(decoder, raw, chunk)
+    assert len(arrays) == 3
+    for array, frame in zip(arrays, frames):
+        assert array.shape == (NUM_PIXELS, N_ELEMENTS) and array.dtype == np.float32
+        np.testing.assert_array_equal(array, frame)  # '%.9g' round-trips float32
+        assert array.timestamp is None
+
+
+def test_stamped_lines_carry_their_timestamp():
+    decoder = CsvDecoder(np.float32, (2, 2))
+    raw = (stamp_line('1,2,3,4', timestamp=12.5) + '\n' + '5,6,7,8\n').encode()
+    stamped, plain = feed(decoder, raw, 5)
+    np.testing.assert_array_equal(stamped, [[1, 2], [3, 4]])
+    assert stamped.timestamp == 12.5
+    np.testing.assert_array_equal(plain, [[5, 6], [7, 8]])
+    assert plain.timestamp is None
+
+
+def test_bad_lines_are_skipped_and_reported():
+    errors = Errors()
+    decoder = CsvDecoder(np.float32, (4,), on_error=errors)
+    raw = b'1,2,3,4\n1,2,3\n1,2,x,4\n@nan-stamp 1,2,3,4\n5,6,7,8\n'
+    arrays = feed(decoder, raw, 3)
+    assert [a.tolist() for a in arrays] == [[1, 2, 3, 4], [5, 6, 7, 8]]
+    assert errors.count == 3
+
+
+def test_flush_parses_an_unterminated_line():
+    decoder = CsvDecoder(np.int32)
+    assert feed(decoder, b'1,2\n3,4,5', 64)[0].tolist() == [1, 2]
+    (last,) = decoder.flush()
+    assert last.tolist() == [3, 4, 5] and last.dtype == np.int32
+    assert decoder.flush() == []
@@ -0,0 +1,115 @@
+import pytest
+
+from helper_classes import DeliveryQueue, FifoWatcher, FrameWorker
+
+
+class Message:
+    """Stand-in for a fifo_protocol.Frame: counts release() calls."""
+
+    def __init__(self, n):
+        self.n = n
+        self.released = 0
+
+    def release(self):
+        self.released += 1
+
+
+def feed(watcher, messages):
+    # What the multiplexer thread does for every decoded message.
+    for message in messages:
+        watcher.channel.callback(message)
+
+
+def received(watcher):
+    got = []
+    watcher.data_received.connect(got.append)
+    return got
+
+
+def test_queue_drops_oldest_and_releases_it():
+    queue = DeliveryQueue(2)
+    messages = [Message(i) for i in range(5)]
+    wakeups = [queue.push(message) for message in messages]
+    assert wakeups == [True, False, False, False, False]
+    assert queue.dropped == 3
+    assert [m.released for m in messages] == [1, 1, 1, 0, 0]
+    assert queue.drain() == messages[3:]
+    assert queue.drain() == []
+    assert queue.push('line') is True  # plain messages have nothing to release
+
+
+def test_queue_keeps_at_least_one():
+    queue = DeliveryQueue(0)
+    queue.push(1)
+    queue.push(2)
+    assert queue.drain() == [2]
+    assert queue.dropped == 1
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        FifoWatcher('/nonexistent', delivery='latest')
+
+
+def test_queued_delivers_everything():
+    watcher = FifoWatcher('/nonexistent', delivery='queued')
+    got = received(watcher)
+    feed(watcher, range(100))
+    assert got == list(range(100))
+    assert watcher.dropped == 0
+
+
+def test_conflate_delivers_latest():
+    watcher = FifoWatcher('/nonexistent', delivery='conflate')
+    got = received(watcher)
+    messages = [Message(i) for i in range(10)]
+    feed(watcher, messages)
+    watcher._drain()
+    assert got == messages[-1:]
+    assert watcher.dropped == 9
+    assert all(m.released == 1 for m in messages[:-1]) and messages[-1].released == 0
+
+
+def test_bounded_keeps_newest():
+    watcher = FifoWatcher('/nonexistent', delivery='bounded', queue_size=4)
+    got = received(watcher)
+    feed(watcher, range(10))
+    watcher._drain()
+    assert got == [6, 7, 8, 9]
+    assert watcher.dropped == 6
+
+
+def test_batch_emits_one_list():
+    watcher = FifoWatcher('/nonexistent', delivery='batch', queue_size=8)
+    got = received(watcher)
+    watcher._drain_batch()
+    assert got == []  # nothing received: no empty batch
+    feed(watcher, range(3))
+    watcher._drain_batch()
+    feed(watcher, range(20))
+    watcher._drain_batch()
+    assert got == [[0, 1, 2], list(range(12, 20))]
+    assert watcher.dropped == 12
+
+
+def test_taps_see_dropped_messages():
+    watcher = FifoWatcher('/nonexistent', delivery='conflate')
+    tapped = []
+    watcher.add_tap(tapped.append)
+    got = received(watcher)
+    feed(watcher, range(5))
+    watcher._drain()
+    assert tapped == list(range(5))
+    assert got == [4]
+
+
+def test_worker_releases_skipped_payloads():
+    worker = FrameWorker(lambda raw: raw)  # not started: payloads pile up
+    messages = [Message(i) for i in range(3)]
+    for message in messages:
+        worker.submit(message)
+    assert worker.dropped == 2
+    assert [m.released for m in messages] == [1, 1, 0]
+    worker.submit(None)  # a None payload that was pending is still counted
+    worker.submit('raw')
+    assert worker.dropped == 4
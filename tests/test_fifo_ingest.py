@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from fifo_ingest import FifoChannel, FifoMultiplexer
+from fifo_output import PersistentFifoWriter
+from fifo_protocol import encode_frame
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def fifo(tmp_path):
+    path = str(tmp_path / 'test.fifo')
+    os.mkfifo(path)
+    return path
+
+
+@pytest.fixture
+def multiplexer():
+    mux = FifoMultiplexer()
+    yield mux
+    mux.stop()
+
+
+def write_and_close(path, data):
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def test_lines_from_successive_writers(fifo, multiplexer):
+    received = []
+    channel = FifoChannel(fifo, received.append, poll_interval=0.01)
+    multiplexer.add(channel)
+    for writer in range(3):
+        write_and_close(fifo, f"writer {writer} first\nwriter {writer} last\n".encode())
+        assert wait_for(lambda: len(received) == 2 * (writer + 1))
+    assert received == [f"writer {w} {which}" for w in range(3) for which in ('first', 'last')]
+    assert channel.stats.reopens >= 3 and channel.stats.messages == 6
+
+
+def test_unterminated_last_line_is_flushed_on_writer_close(fifo, multiplexer):
+    received = []
+    multiplexer.add(FifoChannel(fifo, received.append, poll_interval=0.01))
+    write_and_close(fifo, b"complete\npartial")
+    assert wait_for(lambda: len(received) == 2)
+    assert received == ['complete', 'partial']
+
+
+def test_fifo_created_after_the_channel_is_picked_up(tmp_path, multiplexer):
+    path = str(tmp_path / 'late.fifo')
+    received = []
+    multiplexer.add(FifoChannel(path, received.append, poll_interval=0.01))
+    time.sleep(0.05)
+    os.mkfifo(path)
+    threading.Thread(target=write_and_close, args=(path, b"hello\n")).start()
+    assert wait_for(lambda: received == ['hello'])
+
+
+def test_binary_stream_resyncs_after_garbage(fifo, multiplexer, capsys):
+    received = []
+    channel = FifoChannel(fifo, received.append, protocol='binary', poll_interval=0.01)
+    multiplexer.add(channel)
+    writer = PersistentFifoWriter(fifo, policy='block', timeout=1.0, reconnect_interval=0.01)
+    assert wait_for(lambda: writer._ensure_open())
+    writer.write(b'0123456789')
+    for seq in range(200):
+        writer.write(encode_frame(np.full(8, seq, dtype=np.float32), seq))
+    writer.write(b'xxADP')
+    writer.write(b'ADPT-not-a-header-' * 4)
+    for seq in range(200, 210):
+        writer.write(encode_frame(np.full(8, seq, dtype=np.float32), seq))
+    assert wait_for(lambda: len(received) == 210)
+    writer.close()
+    assert [frame.seq for frame in received] == list(range(210))
+    assert all(frame[0] == frame.seq for frame in received)
+    # One error per loss of sync, not one per header read, and a single printed report.
+    assert channel.stats.frame_errors == 2
+    assert channel.decoder.skipped_bytes == 10 + 5 + 18 * 4
+    assert len(capsys.readouterr().out.splitlines()) == 1
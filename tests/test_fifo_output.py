@@ -0,0 +1,180 @@
+import fcntl
+import os
+import struct
+import threading
+import time
+
+import pytest
+
+from fifo_output import PersistentFifoWriter
+
+F_SETPIPE_SZ = 1031
+PIPE_SIZE = 4096
+SIZE = struct.Struct('<II')  # message index, message length (header included)
+
+
+def message(i, length):
+    return SIZE.pack(i, length) + bytes([i % 256]) * (length - SIZE.size)
+
+
+def parse(stream):
+    """Indices of the messages in `stream`, checking that each one arrived whole."""
+    indices = []
+    pos = 0
+    while pos < len(stream):
+        i, length = SIZE.unpack_from(stream, pos)
+        assert stream[pos + SIZE.size:pos + length] == bytes([i % 256]) * (length - SIZE.size)
+        indices.append(i)
+        pos += length
+    assert pos == len(stream)
+    return indices
+
+
+@pytest.fixture
+def fifo(tmp_path):
+    path = str(tmp_path / 'out.fifo')
+    os.mkfifo(path)
+    return path
+
+
+def open_reader(path):
+    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    fcntl.fcntl(fd, F_SETPIPE_SZ, PIPE_SIZE)
+    return fd
+
+
+def read_available(fd):
+    chunks = []
+    while True:
+        try:
+            data = os.read(fd, 1 << 16)
+        except BlockingIOError:
+            break
+        if not data:
+            break
+        chunks.append(data)
+    return b''.join(chunks)
+
+
+def test_unknown_policy(fifo):
+    with pytest.raises(ValueError):
+        PersistentFifoWriter(fifo, policy='wait')
+
+
+@pytest.mark.parametrize('policy, kept', [('drop', []), ('block', []), ('coalesce', [2])])
+def test_no_reader(fifo, policy, kept):
+    writer = PersistentFifoWriter(fifo, policy=policy, timeout=0.01, reconnect_interval=0)
+    for i in range(3):
+        writer.write(message(i, 16))
+    assert not writer.connected
+    assert writer.dropped == 3 - len(kept)
+    reader = open_reader(fifo)
+    try:
+        writer.write(message(3, 16))
+        assert writer.connected and writer.reconnects == 1
+        assert parse(read_available(reader)) == kept + [3]
+    finally:
+        writer.close()
+        os.close(reader)
+
+
+def test_partial_message_is_finished_before_the_next(fifo):
+    reader = open_reader(fifo)
+    writer = PersistentFifoWriter(fifo, policy='drop')
+    try:
+        writer.write(message(0, 3000))
+        writer.write(message(1, 5000))  # above PIPE_BUF, so it is sent in part: the rest is pending
+        assert writer._pending is not None
+        writer.write(message(2, 100))   # dropped while the pending tail doesn't fit
+        assert writer.dropped == 1
+        received = read_available(reader)
+        writer.drain(1.0)
+        received += read_available(reader)
+        writer.write(message(3, 100))
+        received += read_available(reader)
+        assert parse(received) == [0, 1, 3]
+        assert writer.sent == 3 and writer.bytes_sent == len(received)
+    finally:
+        writer.close()
+        os.close(reader)
+
+
+def test_coalesce_keeps_only_the_newest(fifo):
+    reader = open_reader(fifo)
+    writer = PersistentFifoWriter(fifo, policy='coalesce')
+    try:
+        for i in range(20):
+            writer.write(message(i, 1000))
+        received = read_available(reader)
+        writer.drain(1.0)
+        received += read_available(reader)
+        indices = parse(received)
+        # The ones that fit (the last of them possibly sent in two parts), then the newest.
+        assert indices[-1] == 19 and indices[:-1] == list(range(len(indices) - 1))
+        assert writer.dropped == 20 - len(indices)
+    finally:
+        writer.close()
+        os.close(reader)
+
+
+def test_block_waits_for_a_slow_reader(fifo):
+    reader = open_reader(fifo)
+    writer = PersistentFifoWriter(fifo, policy='block', timeout=2.0)
+    received = []
+    done = threading.Event()
+
+    def consume():
+        while not done.is_set():
+            received.append(read_available(reader))
+            time.sleep(0.005)
+        received.append(read_available(reader))
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+    try:
+        for i in range(50):
+            writer.write(message(i, 1500))
+    finally:
+        done.set()
+        thread.join()
+        writer.close()
+        os.close(reader)
+    assert parse(b''.join(received)) == list(range(50))
+    assert writer.dropped == 0
+
+
+def test_reader_leaving_mid_message(fifo):
+    reader = open_reader(fifo)
+    writer = PersistentFifoWriter(fifo, policy='drop', reconnect_interval=0)
+    try:
+        writer.write(message(0, PIPE_SIZE + 500))  # half sent, the tail is pending
+        assert writer._pending is not None
+        os.close(reader)
+        writer.write(message(1, 10))  # the tail hits the broken pipe: both are lost
+        assert writer.dropped == 2
+        assert not writer.connected and writer._pending is None
+        reader = open_reader(fifo)
+        writer.write(message(2, 10))
+        # The next reader only ever sees whole messages.
+        assert parse(read_available(reader)) == [2]
+        assert writer.reconnects == 2
+    finally:
+        writer.close()
+        os.close(reader)
+
+
+def test_batching_sends_on_flush_or_size(fifo):
+    reader = open_reader(fifo)
+    writer = PersistentFifoWriter(fifo, batching=True, max_batch_bytes=100)
+    try:
+        writer.write(message(0, 40))
+        writer.write(message(1, 40))
+        assert not writer.connected and read_available(reader) == b''
+        writer.write(message(2, 40))  # 120 bytes: the batch goes out in one writev
+        assert parse(read_available(reader)) == [0, 1, 2]
+        writer.write(message(3, 40))
+        writer.flush()
+        assert parse(read_available(reader)) == [3]
+    finally:
+        writer.close()
+        os.close(reader)
@@ -0,0 +1,106 @@
+import io
+
+import numpy as np
+import pytest
+
+from fifo_protocol import (FRAME_MAGIC, HEADER, HEADER_SIZE, Frame, FrameDecoder, FrameError, decode_header,
+                           encode_frame, pack_header, stamp_header)
+
+
+def feed(decoder, raw, chunk):
+    """Hand `raw` to the decoder at most `chunk` bytes per read, as the ingest loop does."""
+    frames = []
+    pos = 0
+    while pos < len(raw):
+        buf = decoder.next_buffer()
+        n = min(len(buf), chunk, len(raw) - pos)
+        buf[:n] = raw[pos:pos + n]
+        pos += n
+        frames += decoder.advance(n)
+    return frames
+
+
+def address(array):
+    return array.__array_interface__['data'][0]
+
+
+ARRAYS = [np.arange(12, dtype=np.float32).reshape(3, 4),
+          np.array([1, -2, 3], dtype=np.int16),
+          np.zeros((0, 5), dtype=np.float64),
+          np.arange(24, dtype='>u4').reshape(2, 3, 2, 2),
+          np.array([2.5])]
+
+
+@pytest.mark.parametrize('chunk', [1, 5, HEADER_SIZE, HEADER_SIZE + 1, 1 << 16])
+def test_frames_survive_any_fragmentation(chunk):
+    raw = b''.join(encode_frame(array, seq, timestamp=100.0 + seq) for seq, array in enumerate(ARRAYS))
+    frames = feed(FrameDecoder(), raw, chunk)
+    assert len(frames) == len(ARRAYS)
+    for seq, (frame, array) in enumerate(zip(frames, ARRAYS)):
+        assert isinstance(frame, Frame)
+        assert (frame.seq, frame.timestamp) == (seq, 100.0 + seq)
+        assert frame.dtype == array.dtype and frame.shape == np.shape(array)
+        np.testing.assert_array_equal(frame, array)
+
+
+def test_released_buffers_are_reused():
+    decoder = FrameDecoder(buffer_count=2)
+    raw = encode_frame(np.ones(100, dtype=np.float32), 0)
+    first, = feed(decoder, raw, len(raw))
+    kept, = feed(decoder, raw, len(raw))
+    assert address(kept) != address(first)  # nothing released yet: a new buffer
+    first.release()
+    first.release()  # a second release is a no-op
+    reused, = feed(decoder, raw, len(raw))
+    assert address(reused) == address(first)
+    # A smaller frame fits a released larger buffer, too.
+    reused.release()
+    small, = feed(decoder, encode_frame(np.ones(10, dtype=np.float32), 1), 1 << 16)
+    assert address(small) == address(first)
+    np.testing.assert_array_equal(kept, 1)
+
+
+def test_free_list_is_capped():
+    decoder = FrameDecoder(buffer_count=1)
+    raw = encode_frame(np.ones(8), 0)
+    frames = feed(decoder, raw * 3, 1 << 16)
+    for frame in frames:
+        frame.release()
+    assert len(decoder._free) == 1
+
+
+def test_writer_going_away_drops_the_partial_frame():
+    decoder = FrameDecoder()
+    raw = encode_frame(np.arange(50.0), 7)
+    assert feed(decoder, raw[:HEADER_SIZE + 30], 1 << 16) == []
+    assert decoder.flush() == ()
+    frame, = feed(decoder, raw, 3)
+    assert frame.seq == 7
+
+
+def test_malformed_headers():
+    header = bytearray(pack_header(np.zeros(3), 1, timestamp=0.0))
+    assert decode_header(header).shape == (3,)
+    for offset, value in ((0, b'XDPT'), (28, b'\x09'), (20, b'?x\x00\x00\x00\x00\x00\x00')):
+        bad = header.copy()
+        bad[offset:offset + len(value)] = value
+        with pytest.raises(FrameError):
+            decode_header(bad)
+    with pytest.raises(FrameError):  # 2**60 elements
+        decode_header(HEADER.pack(FRAME_MAGIC, 1, 0.0, b'<f8', 2, 1 << 30, 1 << 30, 0, 0))
+
+
+def test_stamp_header_rewrites_seq_and_time():
+    raw = bytearray(encode_frame(np.arange(4, dtype=np.uint8), 0, timestamp=1.0))
+    stamp_header(raw, 42, timestamp=2.0)
+    frame, = feed(FrameDecoder(), bytes(raw), 1 << 16)
+    assert (frame.seq, frame.timestamp) == (42, 2.0)
+    assert raw.startswith(FRAME_MAGIC)
+
+
+def test_read_frame_from_a_file():
+    f = io.BytesIO(encode_frame(np.arange(6).reshape(2, 3), 1) + encode_frame(np.arange(2), 2))
+    decoder = FrameDecoder()
+    assert decoder.read_frame(f).shape == (2, 3)
+    assert decoder.read_frame(f).seq == 2
+    assert decoder.read_frame(f) is None
@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from fifo_output import create_fifos, is_fifo, remove_fifos
+from fifo_recorder import FifoRecorder, FifoReplayer
+
+
+def test_create_and_remove_leave_existing_paths_alone(tmp_path):
+    existing, regular, missing = (str(tmp_path / name) for name in ('existing.fifo', 'file.fifo', 'new.fifo'))
+    os.mkfifo(existing)
+    inode = os.stat(existing).st_ino
+    with open(regular, 'w') as f:
+        f.write('data')
+    assert create_fifos([existing, regular, missing]) == [missing]
+    assert os.stat(existing).st_ino == inode  # not recreated under a reader
+    assert is_fifo(missing) and not is_fifo(regular) and not is_fifo(str(tmp_path / 'none'))
+    remove_fifos([missing, regular])
+    assert not os.path.exists(missing)
+    with open(regular) as f:
+        assert f.read() == 'data'
+
+
+def read_all(path, out):
+    # Wait for the replay to create the FIFO, then read it until the replayer closes it.
+    deadline = time.monotonic() + 5
+    while not is_fifo(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with open(path, 'rb') as f:
+        out[path] = f.read()
+
+
+def test_replay_removes_only_the_fifos_it_created(tmp_path):
+    kept, made = str(tmp_path / 'kept.fifo'), str(tmp_path / 'made.fifo')
+    capture = str(tmp_path / 'test.adcap')
+    recorder = FifoRecorder(capture)
+    for i in range(3):
+        for name, path in (('kept', kept), ('made', made)):
+            recorder.record(SimpleNamespace(name=name, fifo_path=path, protocol='line'),
+                            f'{name} {i}\n'.encode(), 1)
+    recorder.close()
+
+    os.mkfifo(kept)
+    received = {}
+    readers = [threading.Thread(target=read_all, args=(path, received)) for path in (kept, made)]
+    for reader in readers:
+        reader.start()
+    replayer = FifoReplayer(capture, speed=None, reader_wait=5.0).run()
+    for reader in readers:
+        reader.join(timeout=5)
+    assert received == {kept: b'kept 0\nkept 1\nkept 2\n', made: b'made 0\nmade 1\nmade 2\n'}
+    assert (replayer.messages, replayer.chunks) == (6, 6)
+    assert is_fifo(kept) and not os.path.exists(made)
@@ -0,0 +1,95 @@
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+
+from fifo_ingest import FifoChannel, FifoMultiplexer
+from fifo_protocol import CsvDecoder, FrameDecoder, encode_frame
+from fifo_schema import ChannelSchema
+from test_fifo_ingest import wait_for, write_and_close
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fifo_config.json')
+
+
+def binary_frame(array, timestamp=5.0):
+    return FrameDecoder().read_frame(io.BytesIO(encode_frame(array, 3, timestamp=timestamp)))
+
+
+def test_repo_config_compiles():
+    with open(CONFIG) as f:
+        config = json.load(f)
+    for name, entry in config.items():
+        if isinstance(entry, dict) and 'path' in entry:
+            schema = ChannelSchema.from_config(entry)
+            assert schema is None or schema.kind == entry['type'], name
+
+
+def test_from_config():
+    assert ChannelSchema.from_config({'path': 'x'}) is None
+    schema = ChannelSchema.from_config({'type': 'array', 'dtype': 'int16', 'length': 4})
+    assert (schema.kind, schema.dtype, schema.shape) == ('array', np.dtype('int16'), (4,))
+    decoder = schema.make_decoder()
+    assert isinstance(decoder, CsvDecoder) and decoder.shape == (4,) and decoder.dtype == np.int16
+    assert ChannelSchema.from_config({'type': 'float'}).make_decoder() is None
+
+
+@pytest.mark.parametrize('kwargs', [{'kind': 'complex'}, {'kind': 'struct'},
+                                    {'kind': 'string', 'protocol': 'binary'},
+                                    {'kind': 'struct', 'fields': [['a', 'int']], 'protocol': 'binary'}])
+def test_invalid_schemas(kwargs):
+    with pytest.raises(ValueError):
+        ChannelSchema(**kwargs)
+
+
+def test_line_scalars_and_strings():
+    assert ChannelSchema('float').decode('-1.5') == -1.5
+    assert ChannelSchema('int').decode('42') == 42
+    assert ChannelSchema('string').decode('a,b') == 'a,b'
+    for kind, bad in (('float', 'x'), ('int', '1.5')):
+        with pytest.raises(ValueError):
+            ChannelSchema(kind).decode(bad)
+
+
+def test_struct():
+    schema = ChannelSchema('struct', fields=[['lat', 'float'], ['count', 'int'], ['name', 'string']])
+    assert schema.decode('1.5, 3, probe') == {'lat': 1.5, 'count': 3, 'name': 'probe'}
+    for bad in ('1.5,3', '1.5,x,probe', '1,2,3,4'):
+        with pytest.raises(ValueError):
+            schema.decode(bad)
+
+
+def test_binary_arrays():
+    frame = binary_frame(np.arange(6, dtype=np.float64))
+    schema = ChannelSchema('array', dtype='float32', shape=(2, 3), protocol='binary')
+    values = schema.decode(frame)
+    assert values.dtype == np.float32 and values.shape == (2, 3) and values.timestamp == 5.0
+    np.testing.assert_array_equal(values.ravel(), np.arange(6))
+    with pytest.raises(ValueError):
+        ChannelSchema('array', shape=(4,), protocol='binary').decode(frame)
+    unchecked = ChannelSchema('array', dtype='float64', protocol='binary').decode(frame)
+    assert unchecked is frame  # right dtype, no shape: no copy
+
+
+def test_binary_scalars():
+    assert ChannelSchema('int', protocol='binary').decode(binary_frame(np.array([[7]], np.int32))) == 7
+    assert ChannelSchema('float', protocol='binary').decode(binary_frame(np.array([2.5]))) == 2.5
+    with pytest.raises(ValueError):
+        ChannelSchema('float', protocol='binary').decode(binary_frame(np.zeros(2)))
+
+
+def test_channel_delivers_typed_values(tmp_path):
+    path = str(tmp_path / 'int.fifo')
+    os.mkfifo(path)
+    received = []
+    channel = FifoChannel(path, received.append, poll_interval=0.01, schema=ChannelSchema('int'))
+    multiplexer = FifoMultiplexer()
+    try:
+        multiplexer.add(channel)
+        write_and_close(path, b"1\nnot a number\n2\n")
+        assert wait_for(lambda: len(received) == 2)
+    finally:
+        multiplexer.stop()
+    assert received == [1, 2]
+    assert channel.stats.parse_failures == 1
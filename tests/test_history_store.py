@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from history_store import HistoryStore, scalar_columns
+from rate_history import MinMaxPyramid, RateHistory
+from test_rate_history import assert_same_levels, noisy_series
+
+COLUMNS = {'float1': 'float64', 'int1': 'int64'}
+
+
+def fill(store, n, start=1.0):
+    # float1 on every row, int1 on every third; returns the expected samples.
+    expected = {'float1': ([], []), 'int1': ([], [])}
+    for i in range(n):
+        t = start + i * 0.5
+        values = {'float1': t * 2}
+        if i % 3 == 0:
+            values['int1'] = i
+        store.append(t, **values)
+        for name, value in values.items():
+            expected[name][0].append(t)
+            expected[name][1].append(value)
+    return expected
+
+
+def test_range_query_matches_a_scan(tmp_path):
+    store = HistoryStore(str(tmp_path), COLUMNS, chunk_rows=100, index_stride=8)
+    expected = fill(store, 1000)
+    assert len(store) == 1000 and len(store.chunks) == 10
+    times = np.array(expected['int1'][0])
+    values = np.array(expected['int1'][1])
+    for t_min, t_max in ((-np.inf, np.inf), (10.0, 10.0), (10.25, 260.0), (49.5, 50.5), (600.0, 700.0)):
+        t, v = store.query('int1', t_min, t_max)
+        keep = (times >= t_min) & (times <= t_max)
+        np.testing.assert_array_equal(t, times[keep])
+        np.testing.assert_array_equal(v, values[keep])
+        assert v.dtype == np.int64
+    assert store.count(10.0, 59.5) == 100
+    t, v = store.tail('float1', 150)
+    np.testing.assert_array_equal(t, expected['float1'][0][-150:])
+    assert store.last('int1') == (times[-1], values[-1])
+    store.close()
+
+
+def test_reopen_recovers_rows_and_appends_after_them(tmp_path):
+    store = HistoryStore(str(tmp_path), COLUMNS, chunk_rows=64, index_stride=8)
+    fill(store, 150)
+    # No close(): the memory maps are only dropped, as after a crash.
+    del store
+    store = HistoryStore(str(tmp_path), COLUMNS)
+    assert store.chunk_rows == 64 and len(store) == 150
+    assert store.last('float1') == (75.5, 151.0)
+    store.append(80.0, float1=1.0)
+    store.append(70.0, float1=2.0)  # out of order: clamped to keep time sorted
+    t, v = store.query('float1', 75.5)
+    np.testing.assert_array_equal(t, [75.5, 80.0, 80.0])
+    np.testing.assert_array_equal(v, [151.0, 1.0, 2.0])
+    store.close()
+
+
+def test_new_column_on_reopen_reads_missing_in_old_rows(tmp_path):
+    store = HistoryStore(str(tmp_path), {'float1': 'float64'}, chunk_rows=32)
+    fill_times = [1.0, 2.0, 3.0]
+    for t in fill_times:
+        store.append(t, float1=t)
+    store.close()
+    store = HistoryStore(str(tmp_path), {'float1': 'float64', 'int2': 'int64'})
+    store.append(4.0, int2=7)
+    np.testing.assert_array_equal(store.query('int2'), ([4.0], [7]))
+    np.testing.assert_array_equal(store.query('float1')[0], fill_times)
+    with pytest.raises(KeyError):
+        store.append(5.0, unknown=1)
+    store.close()
+    with pytest.raises(ValueError):
+        HistoryStore(str(tmp_path), {'float1': 'int64'})
+
+
+def test_scalar_columns():
+    config = {'float1': {'type': 'float'}, 'int1': {'type': 'int'}, 'array': {'type': 'array'},
+              'shm': {'transport': 'shm'}}
+    assert scalar_columns(config) == {'float1': 'float64', 'int1': 'int64'}
+
+
+def test_rate_history_from_store(tmp_path):
+    times, values = noisy_series(3000)
+    store = HistoryStore(str(tmp_path), {'rate': 'float64'}, chunk_rows=256, index_stride=16)
+    for t, v in zip(times, values):
+        store.append(t, rate=v)
+    history = RateHistory(recent=100, store=store, column='rate', base_level=2)
+    assert len(history) == 3000
+    np.testing.assert_array_equal(history.recent.times, times[-100:])
+    reference = MinMaxPyramid(2)
+    reference.extend(times, values)
+    assert_same_levels(history.pyramid, reference)
+    # Too fine for the pyramid's kept levels: served raw from the store.
+    t, v = history.visible(times[1000], times[1010], 1000)
+    np.testing.assert_array_equal(t, times[1000:1011])
+    store.close()
@@ -0,0 +1,51 @@
+import numpy as np
+
+from colormaps import ColorLUT
+from label_raster import LabelRaster
+
+
+def make_raster():
+    # A row of 20 rects over two rows and a few ellipses, one channel each, plus an unused channel.
+    rects, ellipse, channels = [], [], []
+    for i in range(20):
+        rects.append((5 + 12 * (i % 10), 3 + 15 * (i // 10), 10, 12))
+        ellipse.append(i % 4 == 0)
+        channels.append(i)
+    return LabelRaster(rects, ellipse, channels, n_channels=21, origin=(0, 0))
+
+
+def test_recolor_matches_a_full_colorize():
+    raster = make_raster()
+    rng = np.random.default_rng(0)
+    lut = ColorLUT.get().rgba
+    bins = rng.integers(0, len(lut), 21)
+    image, rows = raster.recolor(bins, lut)
+    np.testing.assert_array_equal(image, raster.colorize(bins, lut))
+    assert len(rows) == raster.shape[0]
+    for step in range(20):
+        changed = rng.choice(21, size=int(rng.integers(0, 4)), replace=False)
+        bins = bins.copy()
+        bins[changed] = rng.integers(0, len(lut), len(changed))
+        previous = image
+        image, rows = raster.recolor(bins, lut)
+        np.testing.assert_array_equal(image, raster.colorize(bins, lut))
+        untouched = np.setdiff1d(np.arange(raster.shape[0]), rows)
+        np.testing.assert_array_equal(image[untouched], previous[untouched])
+
+
+def test_recolor_without_changes_returns_the_same_image():
+    raster = make_raster()
+    bins = np.zeros(21, dtype=np.intp)
+    image, _ = raster.recolor(bins)
+    again, rows = raster.recolor(bins.copy())
+    assert again is image and len(rows) == 0 and raster.changed_fraction == 0.0
+
+
+def test_pick_and_background():
+    raster = make_raster()
+    assert raster.pick(10, 9) == 0
+    assert raster.pick(5 + 12 * 3 + 5, 3 + 15 + 6) == 13
+    assert raster.pick(0, 0) is None
+    assert raster.pick(-5, 1000) is None
+    image = raster.colorize(np.zeros(21, dtype=np.intp))
+    assert tuple(image[0, 0]) == (0, 0, 0, 0)
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+pytest.importorskip('PyQt6')
+from log_console import RotatingLog  # noqa: E402
+
+
+def segment(directory, number=0):
+    return os.path.join(directory, f"string_{number:06d}.log")
+
+
+def test_lines_and_search_across_segments(tmp_path):
+    log = RotatingLog(str(tmp_path), prefix='string', max_bytes=100)
+    for batch in range(20):
+        log.write_lines([f"batch {batch} line {i}" for i in range(3)] + [f"ERROR in {batch}"])
+    assert len(log) == 80 and len(log.segments) > 1
+    assert log.lines(0, 2) == ['batch 0 line 0', 'batch 0 line 1']
+    assert log.lines(78, 200) == ['batch 19 line 2', 'ERROR in 19']
+    assert log.lines(39, 43) == ['ERROR in 9', 'batch 10 line 0', 'batch 10 line 1', 'batch 10 line 2']
+    found = log.search(r'ERROR in 1\d', limit=3)
+    assert found == [(79, 'ERROR in 19'), (75, 'ERROR in 18'), (71, 'ERROR in 17')]
+    assert log.search('ERROR', limit=2, before=71) == [(67, 'ERROR in 16'), (63, 'ERROR in 15')]
+    assert log.search('no such line') == []
+
+
+def test_embedded_newlines_stay_on_one_line(tmp_path):
+    log = RotatingLog(str(tmp_path), prefix='string')
+    log.write_lines(['two\nparts', 'next'])
+    assert log.lines(0, 10) == ['two parts', 'next']
+
+
+def test_reopen_reindexes_lines_missing_from_the_index(tmp_path):
+    log = RotatingLog(str(tmp_path), prefix='string')
+    log.write_lines(['one', 'two'])
+    # A crash after the log write but before the index write.
+    with open(segment(str(tmp_path)), 'ab') as f:
+        f.write(b'three\nfour\n')
+    log = RotatingLog(str(tmp_path), prefix='string')
+    assert len(log) == 4
+    assert log.lines(0, 4) == ['one', 'two', 'three', 'four']
+    assert log.search('f') == [(3, 'four')]
+
+
+def test_reopen_terminates_a_partial_last_line(tmp_path):
+    log = RotatingLog(str(tmp_path), prefix='string')
+    log.write_lines(['one'])
+    with open(segment(str(tmp_path)), 'ab') as f:
+        f.write(b'partial')
+    log = RotatingLog(str(tmp_path), prefix='string')
+    log.write_lines(['after'])
+    assert log.lines(0, 10) == ['one', 'partial', 'after']
+    log = RotatingLog(str(tmp_path), prefix='string')
+    assert len(log) == 3 and log.lines(2, 3) == ['after']
+
+
+def test_max_files_drops_the_oldest_segments(tmp_path):
+    log = RotatingLog(str(tmp_path), prefix='string', max_bytes=10, max_files=2)
+    for i in range(5):
+        log.write_lines([f"line number {i}"])
+    assert len(log.segments) == 2
+    assert log.first_line == 3
+    assert log.lines(0, 10) == ['line number 3', 'line number 4']
+    assert sorted(os.listdir(str(tmp_path))) == ['string_000003.idx', 'string_000003.log',
+                                                 'string_000004.idx', 'string_000004.log']
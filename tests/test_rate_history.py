@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from rate_history import MinMaxPyramid, RateHistory
+
+
+def noisy_series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.cumsum(rng.uniform(0.5, 1.5, n))
+    values = rng.normal(size=n)
+    return times, values
+
+
+def assert_same_levels(a, b):
+    assert (a.count, a._odd, len(a.levels)) == (b.count, b._odd, len(b.levels))
+    for level_a, level_b in zip(a.levels, b.levels):
+        assert level_a.n == level_b.n
+        rows = [level_a.row(i) for i in range(max(level_a.n - 2, 0), level_a.n)] if level_a.rolling \
+            else slice(0, level_a.n)
+        np.testing.assert_array_equal(level_a.t[rows], level_b.t[rows])
+        np.testing.assert_array_equal(level_a.v[rows], level_b.v[rows])
+
+
+@pytest.mark.parametrize('base_level', [0, 3])
+def test_pyramid_keeps_peaks_at_every_zoom(base_level):
+    times, values = noisy_series(100_000)
+    values[54_321], values[12_345] = 1000.0, -1000.0
+    pyramid = MinMaxPyramid(base_level)
+    pyramid.extend(times, values)
+    for max_points in (4, 16, 100, 1000, 10_000):
+        t, v = pyramid.query(times[0], times[-1], max_points)
+        assert v.max() == 1000.0 and t[v.argmax()] == times[54_321]
+        assert v.min() == -1000.0 and t[v.argmin()] == times[12_345]
+        assert np.all(np.diff(t) >= 0)
+        # Zoomed in around the spike, it is still there.
+        t, v = pyramid.query(times[54_000], times[55_000], max_points)
+        assert v.max() == 1000.0
+
+
+def test_pyramid_query_is_bounded():
+    times, values = noisy_series(100_000)
+    pyramid = MinMaxPyramid()
+    pyramid.extend(times, values)
+    t, _ = pyramid.query(times[0], times[-1], 1000)
+    # About max_points plus a bin beyond each end and the pending tail.
+    assert 500 <= len(t) <= 1100
+
+
+@pytest.mark.parametrize('base_level', [0, 2, 5])
+def test_pyramid_extend_matches_append(base_level):
+    times, values = noisy_series(5000, seed=base_level)
+    appended = MinMaxPyramid(base_level)
+    for t, v in zip(times, values):
+        appended.append(t, v)
+    extended = MinMaxPyramid(base_level)
+    rng = np.random.default_rng(1)
+    start = 0
+    while start < len(times):
+        stop = start + int(rng.integers(0, 300))
+        extended.extend(times[start:stop], values[start:stop])
+        start = stop
+    assert_same_levels(appended, extended)
+    for t_min, t_max in ((times[0], times[-1]), (times[100], times[900]), (times[-50], times[-1])):
+        for got, want in zip(extended.query(t_min, t_max, 64), appended.query(t_min, t_max, 64)):
+            np.testing.assert_array_equal(got, want)
+
+
+def test_rate_history_visible_is_a_copy():
+    history = RateHistory(recent=100)
+    for i in range(10):
+        history.append(float(i), float(i))
+    times, values = history.visible(0.0, 10.0, 100)
+    history.append(10.0, 10.0)
+    np.testing.assert_array_equal(times, np.arange(10.0))
+    assert times.flags.writeable
+
+
+@pytest.mark.parametrize('chunk', [1, 1000, 300_000])
+def test_bounded_pyramid_keeps_old_history_coarsely(chunk):
+    times, values = noisy_series(300_000, seed=chunk)
+    values[1_000] = 1000.0
+    pyramid = MinMaxPyramid(base_level=2, max_bins=256)
+    for start in range(0, len(times), chunk):
+        if chunk == 1:
+            pyramid.append(times[start], values[start])
+        else:
+            pyramid.extend(times[start:start + chunk], values[start:start + chunk])
+    assert len(pyramid) == len(times)
+    assert all(level.rolling or (level.n <= 256 and len(level.t) <= 1024) for level in pyramid.levels)
+    assert any(level.dropped for level in pyramid.levels)
+    t, v = pyramid.query(times[0], times[-1], 1000)
+    assert len(t) <= 1100 and v.max() == 1000.0 and t[v.argmax()] == times[1_000]
+    # Zoomed into the start, the trimmed fine levels are skipped but the range is still drawn.
+    t, v = pyramid.query(times[900], times[1_100], 100)
+    assert t[-1] >= times[1_100] and v.max() == 1000.0
+    # The newest samples are still at base level resolution: a bin per 8 samples.
+    t, v = pyramid.query(times[-500], times[-1], 1000)
+    assert 120 <= len(t) <= 140 and np.all(np.diff(t) >= 0)
+
+
+def test_rate_history_without_store_is_bounded():
+    history = RateHistory(recent=1000, base_level=3, max_bins=512)
+    times, values = noisy_series(200_000)
+    values[50] = -1000.0
+    for t, v in zip(times, values):
+        history.append(t, v)
+    pyramid = history.pyramid
+    assert all(len(level.t) == 2 for level in pyramid.levels[:3])  # below base_level
+    assert sum(len(level.t) for level in pyramid.levels) <= 1024 * len(pyramid.levels)
+    t, v = history.visible(times[0], times[200], 100)
+    assert v.min() == -1000.0 and t[-1] >= times[200]
+    t, v = history.visible(times[-100], times[-1], 1000)  # from the ring, raw
+    np.testing.assert_array_equal(t, times[-100:])
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from ring_series import RingSeries
+
+
+def test_ring_series_keeps_newest_in_order():
+    ring = RingSeries(4)
+    ring.extend(np.arange(10.0), np.arange(10.0) * 2)
+    assert (len(ring), ring.total) == (4, 10)
+    np.testing.assert_array_equal(ring.times, [6, 7, 8, 9])
+    ring.append(10.0, 20.0)
+    np.testing.assert_array_equal(ring.values, [14, 16, 18, 20])
+    assert ring.last() == (10.0, 20.0)
+    t, v = ring.since(8.5)
+    np.testing.assert_array_equal(t, [9, 10])
+    with pytest.raises(ValueError):
+        ring.times[0] = 1.0
+
+
+def test_ring_series_extend_counts_the_whole_batch():
+    ring = RingSeries(3)
+    ring.extend(np.arange(2.0), np.arange(2.0))
+    ring.extend(np.arange(2.0, 7.0), np.arange(2.0, 7.0))
+    assert (len(ring), ring.total) == (3, 7)
+    np.testing.assert_array_equal(ring.values, [4, 5, 6])
+    ring.clear()
+    assert (len(ring), ring.total, ring.last()) == (0, 0, None)
@@ -0,0 +1,69 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.schema_translate_benchmark import legacy_translate, make_message
+from channel_map import ChannelMap, SchemaTranslator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def cmap():
+    with open(os.path.join(ROOT, 'sensor_config.json')) as f:
+        return ChannelMap(json.load(f))
+
+
+def legacy(cmap, message):
+    return np.asarray(legacy_translate(message, cmap.total_pixels, cmap.data_map()), dtype=np.float32)
+
+
+@pytest.mark.parametrize('hits', [None, 1, 4])
+def test_matches_the_legacy_translation(cmap, hits):
+    rng = np.random.default_rng(hits)
+    translator = SchemaTranslator(cmap)
+    for _ in range(5):
+        layers = None if hits is None else rng.choice(cmap.num_layers, 2, replace=False)
+        message = make_message(cmap, rng, hits_per_layer=hits, layers=layers)
+        np.testing.assert_array_equal(translator.translate(message), legacy(cmap, message))
+
+
+def test_bad_entries_and_ids_are_ignored(cmap):
+    message = {"layers": [
+        {"layer": 0, "axis": "x", "ids": [0, -1, 10_000, 2], "values": [1.0, 2.0, 3.0, 4.0]},
+        {"layer": 1, "axis": "y", "ids": np.array([3, 5]), "values": [5.0]},  # extra id dropped
+        {"layer": cmap.num_layers, "axis": "x", "ids": [0], "values": [6.0]},
+        {"layer": 0, "axis": "z", "ids": [0], "values": [7.0]},
+        {"axis": "x", "ids": [0], "values": [8.0]},
+    ]}
+    frame = SchemaTranslator(cmap).translate(message)
+    expected = np.zeros(cmap.total_pixels, dtype=np.float32)
+    expected[cmap.axis_lut[0, 0, [0, 2]]] = (1.0, 4.0)
+    expected[cmap.axis_lut[1, 1, 3]] = 5.0
+    # (The legacy loop wrapped id -1 around and read any axis but 'x' as 'y'.)
+    np.testing.assert_array_equal(frame, expected)
+
+
+def test_fills_a_caller_buffer_and_clears_between_messages(cmap):
+    translator = SchemaTranslator(cmap)
+    out = np.full(cmap.total_pixels, 9.0, dtype=np.float32)
+    first = {"layers": [{"layer": 0, "axis": "x", "ids": [0], "values": [1.0]}]}
+    second = {"layers": [{"layer": 1, "axis": "x", "ids": [1], "values": [2.0]}]}
+    assert translator.translate(first, out=out) is out
+    assert translator.translate(second, out=out) is out
+    assert np.flatnonzero(out).tolist() == [cmap.axis_lut[1, 0, 1]]
+    translator.translate(first, out=out, clear=False)
+    assert np.count_nonzero(out) == 2
+    assert not translator.translate({"layers": []}, out=out).any()
+
+
+def test_buffers_grow_for_oversized_messages(cmap):
+    translator = SchemaTranslator(cmap)
+    width = cmap.axis_lut.shape[2]
+    # The same rows repeated: more hits than the buffers were sized for.
+    message = make_message(cmap, np.random.default_rng(0))
+    message["layers"] *= 3
+    np.testing.assert_array_equal(translator.translate(message), legacy(cmap, message))
+    assert len(translator._ids) > cmap.num_layers * 2 * width
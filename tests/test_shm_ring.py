@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+import pytest
+from multiprocessing import resource_tracker
+
+from shm_ring import ShmFrameRing
+
+SHAPE = (16, 4)
+
+
+@pytest.fixture
+def name(request):
+    return f'adapt_test_{os.getpid()}_{request.node.name}'[:30]
+
+
+def attach(name):
+    # A reader unregisters the segment from the resource tracker, which in this
+    # process is the writer's too: register it again so the writer's unlink is expected.
+    ring = ShmFrameRing.attach(name)
+    resource_tracker.register(ring._shm._name, 'shared_memory')
+    return ring
+
+
+@pytest.fixture
+def rings(name):
+    writer = ShmFrameRing.create(name, SHAPE, np.float32, n_slots=4)
+    reader = attach(name)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def write_value(ring, value):
+    ring.begin_write()[...] = value
+    return ring.commit(timestamp=float(value))
+
+
+def test_latest_is_a_view_of_the_newest_slot(rings):
+    writer, reader = rings
+    assert reader.latest() is None
+    for value in range(3):
+        write_value(writer, value)
+    frame = reader.latest()
+    assert frame.shape == SHAPE and frame.dtype == np.float32
+    assert (frame.seq, frame.timestamp) == (2, 2.0)
+    assert np.all(frame == 2)
+    assert reader.is_valid(frame)
+
+
+def test_frame_is_invalid_once_lapped(rings):
+    writer, reader = rings
+    write_value(writer, 0)
+    frame = reader.latest()
+    for value in range(1, writer.n_slots):
+        write_value(writer, value)
+        assert reader.is_valid(frame)  # other slots were written
+    writer.begin_write()[...] = -1  # the writer is back at the frame's slot
+    assert not reader.is_valid(frame)
+    writer.commit()
+    assert not reader.is_valid(frame)
+
+
+def test_read_latest_retries_a_torn_read(rings, monkeypatch):
+    writer, reader = rings
+    write_value(writer, 0)
+    latest = reader.latest
+
+    def lapped_during_copy():
+        frame = latest()
+        if frame.seq == 0:
+            # While the reader copies slot 0, the writer laps the ring and is half way into it again.
+            for value in range(1, writer.n_slots):
+                write_value(writer, value)
+            writer.begin_write()[:SHAPE[0] // 2] = -1
+        return frame
+
+    monkeypatch.setattr(reader, 'latest', lapped_during_copy)
+    out = np.full(SHAPE, np.nan, dtype=np.float32)
+    assert reader.read_latest(out=out) is out
+    assert np.all(out == writer.n_slots - 1)
+    writer.commit()
+
+
+def test_read_latest_gives_up(rings, monkeypatch):
+    writer, reader = rings
+    write_value(writer, 0)
+    monkeypatch.setattr(reader, 'is_valid', lambda frame: False)
+    assert reader.read_latest(retries=3) is None
+
+
+def test_read_latest_allocates_a_frame(rings):
+    writer, reader = rings
+    assert reader.read_latest() is None
+    write_value(writer, 7)
+    frame = reader.read_latest()
+    assert np.all(frame == 7) and (frame.seq, frame.timestamp) == (0, 7.0)
+    write_value(writer, 8)
+    assert np.all(frame == 7)  # a copy, not the slot
+
+
+def test_restarted_writer_invalidates_old_frames(name, rings):
+    writer, reader = rings
+    write_value(writer, 1)
+    frame = reader.latest()
+    created = ShmFrameRing.created_id(name)
+    assert created == reader.created
+    replacement = ShmFrameRing.create(name, SHAPE, np.float32, n_slots=4)
+    try:
+        assert not reader.alive and not reader.is_valid(frame)
+        assert ShmFrameRing.created_id(name) == replacement.created != created
+        write_value(replacement, 1)
+        fresh = attach(name)
+        try:
+            # Same seq and generation in the new ring: the creation id tells them apart.
+            assert not fresh.is_valid(frame)
+            assert fresh.is_valid(fresh.latest())
+        finally:
+            fresh.close()
+    finally:
+        replacement.close()
+    writer.owner = False  # its segment was already unlinked by the replacement